@@ -1,11 +1,20 @@
-from sqladmin import Admin, ModelView, BaseView, expose
+from sqladmin import Admin, ModelView, BaseView, expose, action
 from sqladmin.authentication import AuthenticationBackend
 from fastapi import Request
 from sqlalchemy import func
 from datetime import datetime, timedelta
 from .database import engine, SessionLocal
-from .models import User, Like, Match, Message
+from .models import User, Like, Match, Message, DailyStats, DailyConversion
+from .profiling import request_log, PROFILE_QUERY_PARAM
+from .stats import stats_cache
+from .admin_pagination import KeysetPaginationMixin
+from .search import full_text_search
+from .scoring import snapshot as candidate_snapshot
+from .candidate_index import candidate_index
+from . import crud
 from passlib.context import CryptContext
+from html import escape
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -90,8 +99,39 @@ class AdminAuth(AuthenticationBackend):
         return is_admin
 
 
+def _selected_pks(request: Request) -> list:
+    """ID строк, выбранных в списке админки (параметр pks)"""
+    return [int(pk) for pk in request.query_params.get("pks", "").split(",") if pk.strip().isdigit()]
+
+
+def _user_ids_changed(user_ids: list):
+    """Профили или активность пользователей изменились - обновить индексы ленты"""
+    candidate_snapshot.mark_changed(user_ids)
+    candidate_index.refresh(user_ids)
+
+
+async def _run_bulk_action(request: Request, identity: str, operation, *args):
+    """Выполнить массовую операцию над выбранными строками и вернуться к списку"""
+    from fastapi.concurrency import run_in_threadpool
+    from fastapi.responses import RedirectResponse
+
+    ids = _selected_pks(request)
+    if ids:
+        def run():
+            db = SessionLocal()
+            try:
+                return operation(db, ids, *args)
+            finally:
+                db.close()
+
+        affected = await run_in_threadpool(run)
+        logger.info(f"✅ {operation.__name__}: выбрано {len(ids)}, затронуто строк {affected}")
+
+    return RedirectResponse(request.url_for("admin:list", identity=identity), status_code=302)
+
+
 # Админ-классы с расширенным функционалом
-class UserAdmin(ModelView, model=User):
+class UserAdmin(KeysetPaginationMixin, ModelView, model=User):
     column_list = [
         User.id,
         User.username,
@@ -102,7 +142,7 @@ class UserAdmin(ModelView, model=User):
         User.is_admin,
         User.created_at
     ]
-    column_searchable_list = [User.username, User.email]
+    column_searchable_list = [User.username, User.email, User.bio]
     column_filters = [
         User.specialization,
         User.experience,
@@ -139,8 +179,53 @@ class UserAdmin(ModelView, model=User):
         "bio": "О себе"
     }
 
+    def search_query(self, stmt, term):
+        """Поиск по полнотекстовому индексу (имя, email, о себе) с ранжированием"""
+        result = full_text_search(stmt, User, term)
+        if result is None:
+            return super().search_query(stmt, term)
+        return result
+
+    async def after_model_change(self, data, model, is_created, request):
+        # Правка в форме админки - обновить анкету в индексах ленты
+        _user_ids_changed([model.id])
+
+    # Массовые действия: один UPDATE/DELETE на всю выборку
+    @action(
+        name="deactivate",
+        label="Деактивировать",
+        confirmation_message="Деактивировать выбранных пользователей?"
+    )
+    async def deactivate_users(self, request: Request):
+        response = await _run_bulk_action(request, self.identity, crud.set_users_active, False)
+        _user_ids_changed(_selected_pks(request))
+        return response
+
+    @action(
+        name="reactivate",
+        label="Активировать",
+        confirmation_message="Активировать выбранных пользователей?"
+    )
+    async def reactivate_users(self, request: Request):
+        response = await _run_bulk_action(request, self.identity, crud.set_users_active, True)
+        _user_ids_changed(_selected_pks(request))
+        return response
+
+    @action(
+        name="delete_cascade",
+        label="Удалить со всеми данными",
+        confirmation_message="Удалить пользователей вместе с лайками, совпадениями и сообщениями?",
+        add_in_detail=False
+    )
+    async def delete_users_cascade(self, request: Request):
+        response = await _run_bulk_action(request, self.identity, crud.delete_users)
+        _user_ids_changed(_selected_pks(request))
+        # Вместе с пользователями удалены их лайки
+        candidate_index.forget_seen()
+        return response
+
 
-class LikeAdmin(ModelView, model=Like):
+class LikeAdmin(KeysetPaginationMixin, ModelView, model=Like):
     column_list = [Like.id, Like.from_user_id, Like.to_user_id, Like.created_at]
     column_sortable_list = [Like.created_at, Like.id]
     column_labels = {
@@ -150,8 +235,12 @@ class LikeAdmin(ModelView, model=Like):
         "created_at": "Дата лайка"
     }
 
+    async def after_model_delete(self, model, request):
+        # Удалённый лайк снова открывает анкету в ленте
+        candidate_index.forget_seen(model.from_user_id)
 
-class MatchAdmin(ModelView, model=Match):
+
+class MatchAdmin(KeysetPaginationMixin, ModelView, model=Match):
     column_list = [Match.id, Match.user1_id, Match.user2_id, Match.created_at]
     column_sortable_list = [Match.created_at, Match.id]
     column_labels = {
@@ -162,7 +251,7 @@ class MatchAdmin(ModelView, model=Match):
     }
 
 
-class MessageAdmin(ModelView, model=Message):
+class MessageAdmin(KeysetPaginationMixin, ModelView, model=Message):
     column_list = [
         Message.id,
         Message.match_id,
@@ -190,6 +279,29 @@ class MessageAdmin(ModelView, model=Message):
         "is_read": "Прочитано"
     }
 
+    def search_query(self, stmt, term):
+        """Поиск по полнотекстовому индексу сообщений с ранжированием"""
+        result = full_text_search(stmt, Message, term)
+        if result is None:
+            return super().search_query(stmt, term)
+        return result
+
+    @action(
+        name="delete_by_sender",
+        label="Удалить все сообщения отправителей",
+        confirmation_message="Удалить ВСЕ сообщения отправителей выбранных сообщений?"
+    )
+    async def delete_by_sender(self, request: Request):
+        return await _run_bulk_action(request, self.identity, crud.delete_messages_by_senders)
+
+    @action(
+        name="delete_by_match",
+        label="Удалить все сообщения чатов",
+        confirmation_message="Удалить ВСЕ сообщения в чатах выбранных сообщений?"
+    )
+    async def delete_by_match(self, request: Request):
+        return await _run_bulk_action(request, self.identity, crud.delete_messages_by_matches)
+
 
 class StatsView(BaseView):
     """Страница статистики для админ-панели"""
@@ -208,69 +320,18 @@ class StatsView(BaseView):
     @expose("/stats", methods=["GET"])
     async def stats_page(self, request: Request):
         """Страница со статистикой"""
-        db = SessionLocal()
+        from fastapi.concurrency import run_in_threadpool
+        from fastapi.responses import HTMLResponse
 
-        try:
-            # Основная статистика
-            total_users = db.query(func.count(User.id)).scalar() or 0
-            active_users = db.query(func.count(User.id)).filter(User.is_active == True).scalar() or 0
-            admin_users = db.query(func.count(User.id)).filter(User.is_admin == True).scalar() or 0
-
-            total_likes = db.query(func.count(Like.id)).scalar() or 0
-            total_matches = db.query(func.count(Match.id)).scalar() or 0
-            total_messages = db.query(func.count(Message.id)).scalar() or 0
-
-            # Статистика за последние 7 дней
-            week_ago = datetime.utcnow() - timedelta(days=7)
-
-            new_users_week = db.query(func.count(User.id)).filter(
-                User.created_at >= week_ago
-            ).scalar() or 0
-
-            new_likes_week = db.query(func.count(Like.id)).filter(
-                Like.created_at >= week_ago
-            ).scalar() or 0
-
-            new_matches_week = db.query(func.count(Match.id)).filter(
-                Match.created_at >= week_ago
-            ).scalar() or 0
-
-            # Статистика по специализациям
-            specializations = db.query(
-                User.specialization,
-                func.count(User.id).label('count')
-            ).group_by(User.specialization).all()
-
-            # Статистика по опыту
-            experiences = db.query(
-                User.experience,
-                func.count(User.id).label('count')
-            ).group_by(User.experience).all()
-
-            # Подготовка данных для шаблона
-            specializations_list = [(s[0], s[1]) for s in specializations]
-            experiences_list = [(e[0], e[1]) for e in experiences]
-
-            # Создаем простой шаблон для статистики
-            html_content = self._generate_stats_html(
-                total_users=total_users,
-                active_users=active_users,
-                admin_users=admin_users,
-                total_likes=total_likes,
-                total_matches=total_matches,
-                total_messages=total_messages,
-                new_users_week=new_users_week,
-                new_likes_week=new_likes_week,
-                new_matches_week=new_matches_week,
-                specializations=specializations_list,
-                experiences=experiences_list
-            )
-
-            from fastapi.responses import HTMLResponse
-            return HTMLResponse(content=html_content)
+        # Снимок берём из кэша; первый расчёт не блокирует event loop
+        snapshot = await run_in_threadpool(stats_cache.get)
 
-        finally:
-            db.close()
+        html_content = self._generate_stats_html(
+            snapshot_age=int(stats_cache.age()),
+            stats_ttl=stats_cache.ttl,
+            **snapshot
+        )
+        return HTMLResponse(content=html_content)
 
     def _generate_stats_html(self, **kwargs):
         """Генерирует HTML для страницы статистики"""
@@ -430,7 +491,7 @@ class StatsView(BaseView):
                             </div>
                             <div class="card-body">
                                 <p class="small text-muted">
-                                    <i class="bi bi-clock"></i> Данные обновляются в реальном времени
+                                    <i class="bi bi-clock"></i> Снимок данных обновляется в фоне раз в {kwargs['stats_ttl']} сек.
                                 </p>
                                 <p class="small text-muted">
                                     <i class="bi bi-calendar-week"></i> Статистика за неделю: последние 7 дней
@@ -449,7 +510,7 @@ class StatsView(BaseView):
                             <hr>
                             <p>
                                 <i class="bi bi-cpu"></i> ITmatch Admin Panel • 
-                                <i class="bi bi-clock-history"></i> Обновлено: {datetime.now().strftime("%d.%m.%Y %H:%M")}
+                                <i class="bi bi-clock-history"></i> Снимок от {kwargs['computed_at'].strftime("%d.%m.%Y %H:%M:%S")} ({kwargs['snapshot_age']} сек. назад)
                             </p>
                         </div>
                     </div>
@@ -464,10 +525,322 @@ class StatsView(BaseView):
         return html
 
 
+class AnalyticsView(BaseView):
+    """Графики по дневным агрегатам (без обращения к исходным таблицам)"""
+
+    name = "📈 Аналитика"
+    icon = "fa-solid fa-chart-line"
+
+    def is_visible(self, request: Request) -> bool:
+        """Показывать только администраторам"""
+        return request.session.get("admin", False)
+
+    def is_accessible(self, request: Request) -> bool:
+        """Доступ только администраторам"""
+        return request.session.get("admin", False)
+
+    @expose("/analytics", methods=["GET"])
+    async def analytics_page(self, request: Request):
+        """Страница с графиками"""
+        from fastapi.responses import HTMLResponse
+
+        try:
+            days = min(max(int(request.query_params.get("days", 30)), 1), 365)
+        except ValueError:
+            days = 30
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+
+        db = SessionLocal()
+
+        try:
+            daily = db.query(DailyStats).filter(
+                DailyStats.day >= since
+            ).order_by(DailyStats.day).all()
+
+            conversion = db.query(
+                DailyConversion.specialization,
+                DailyConversion.experience,
+                func.sum(DailyConversion.likes),
+                func.sum(DailyConversion.matches)
+            ).filter(
+                DailyConversion.day >= since
+            ).group_by(
+                DailyConversion.specialization, DailyConversion.experience
+            ).order_by(
+                DailyConversion.specialization, DailyConversion.experience
+            ).all()
+
+            html_content = self._generate_analytics_html(days, daily, conversion)
+            return HTMLResponse(content=html_content)
+
+        finally:
+            db.close()
+
+    def _generate_analytics_html(self, days, daily, conversion):
+        """Генерирует HTML для страницы аналитики"""
+        series = {
+            "labels": [row.day.strftime("%d.%m") for row in daily],
+            "new_users": [row.new_users for row in daily],
+            "likes": [row.likes for row in daily],
+            "matches": [row.matches for row in daily],
+            "messages": [row.messages for row in daily],
+            "active_senders": [row.active_senders for row in daily]
+        }
+
+        rows = ""
+        for specialization, experience, likes, matches in conversion:
+            rate = f"{matches / likes * 100:.1f}%" if likes else "—"
+            rows += f'''
+                <tr>
+                    <td>{escape(specialization)}</td>
+                    <td>{escape(experience)}</td>
+                    <td class="text-end">{likes}</td>
+                    <td class="text-end">{matches}</td>
+                    <td class="text-end">{rate}</td>
+                </tr>
+            '''
+        if not rows:
+            rows = '<tr><td colspan="5" class="text-muted">Нет данных</td></tr>'
+
+        periods = " ".join(
+            f'<a href="/admin/analytics?days={period}" class="btn btn-sm {"btn-primary" if period == days else "btn-outline-primary"}">{period} дн.</a>'
+            for period in (7, 30, 90, 365)
+        )
+
+        return f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Аналитика - ITmatch Admin</title>
+            <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
+            <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css">
+            <style>
+                body {{ padding: 20px; background-color: #f8f9fa; }}
+            </style>
+        </head>
+        <body>
+            <div class="container-fluid">
+                <div class="row mb-4">
+                    <div class="col-12">
+                        <h1><i class="bi bi-graph-up-arrow me-2"></i>Аналитика ITmatch</h1>
+                        <p class="text-muted">Данные из дневных агрегатов (обновляются фоновой задачей или <code>python rollup_stats.py</code>)</p>
+                        {periods}
+                    </div>
+                </div>
+
+                <div class="row">
+                    <div class="col-lg-6 mb-4">
+                        <div class="card h-100">
+                            <div class="card-header bg-primary text-white">
+                                <h5 class="mb-0"><i class="bi bi-people me-2"></i>Регистрации, лайки и совпадения</h5>
+                            </div>
+                            <div class="card-body"><canvas id="activityChart"></canvas></div>
+                        </div>
+                    </div>
+
+                    <div class="col-lg-6 mb-4">
+                        <div class="card h-100">
+                            <div class="card-header bg-warning">
+                                <h5 class="mb-0"><i class="bi bi-chat-dots me-2"></i>Сообщения и активные отправители</h5>
+                            </div>
+                            <div class="card-body"><canvas id="messagesChart"></canvas></div>
+                        </div>
+                    </div>
+                </div>
+
+                <div class="card mb-4">
+                    <div class="card-header bg-success text-white">
+                        <h5 class="mb-0"><i class="bi bi-arrow-left-right me-2"></i>Конверсия лайк → совпадение</h5>
+                    </div>
+                    <div class="card-body">
+                        <table class="table table-sm">
+                            <tr><th>Специализация</th><th>Опыт</th><th class="text-end">Лайков получено</th><th class="text-end">Совпадений</th><th class="text-end">Конверсия</th></tr>
+                            {rows}
+                        </table>
+                    </div>
+                </div>
+
+                <a href="/admin" class="btn btn-outline-primary btn-sm">
+                    <i class="bi bi-arrow-left"></i> Назад в админку
+                </a>
+            </div>
+
+            <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js"></script>
+            <script>
+                const series = {json.dumps(series)};
+                const line = (label, data) => ({{ label: label, data: data, tension: 0.2 }});
+
+                new Chart(document.getElementById("activityChart"), {{
+                    type: "line",
+                    data: {{
+                        labels: series.labels,
+                        datasets: [
+                            line("Новые пользователи", series.new_users),
+                            line("Лайки", series.likes),
+                            line("Совпадения", series.matches)
+                        ]
+                    }}
+                }});
+
+                new Chart(document.getElementById("messagesChart"), {{
+                    type: "line",
+                    data: {{
+                        labels: series.labels,
+                        datasets: [
+                            line("Сообщения", series.messages),
+                            line("Активные отправители", series.active_senders)
+                        ]
+                    }}
+                }});
+            </script>
+        </body>
+        </html>
+        '''
+
+
+class ProfilerView(BaseView):
+    """Самые медленные запросы и их профили"""
+
+    name = "⏱ Профилировщик"
+    icon = "fa-solid fa-stopwatch"
+
+    def is_visible(self, request: Request) -> bool:
+        """Показывать только администраторам"""
+        return request.session.get("admin", False)
+
+    def is_accessible(self, request: Request) -> bool:
+        """Доступ только администраторам"""
+        return request.session.get("admin", False)
+
+    # sqladmin ведёт пункт меню на первый по алфавиту exposed-метод,
+    # поэтому имя страницы-списка должно идти раньше profiler_record
+    @expose("/profiler", methods=["GET"])
+    async def profiler_page(self, request: Request):
+        """Список самых медленных запросов"""
+        from fastapi.responses import HTMLResponse
+
+        html_content = self._generate_profiler_html(
+            slowest=request_log.slowest(),
+            profiled=request_log.profiled()
+        )
+        return HTMLResponse(content=html_content)
+
+    @expose("/profiler/{record_id}", methods=["GET"])
+    async def profiler_record(self, request: Request):
+        """Профиль запроса в формате свёрнутых стеков"""
+        from fastapi.responses import PlainTextResponse
+
+        try:
+            record = request_log.get(int(request.path_params["record_id"]))
+        except ValueError:
+            record = None
+
+        if record is None:
+            return PlainTextResponse("Профиль не найден", status_code=404)
+
+        return PlainTextResponse(
+            record.profiler.collapsed(),
+            headers={"Content-Disposition": f"attachment; filename=profile-{record.id}.folded"}
+        )
+
+    def _generate_profiler_html(self, slowest, profiled):
+        """Генерирует HTML для страницы профилировщика"""
+        profile_ids = {record.id for record in profiled}
+
+        rows = ""
+        for record in slowest:
+            profile_link = ""
+            if record.id in profile_ids:
+                profile_link = f'<a href="/admin/profiler/{record.id}">скачать</a>'
+            rows += f'''
+                <tr>
+                    <td>{record.started_at.strftime("%d.%m.%Y %H:%M:%S")}</td>
+                    <td>{record.method}</td>
+                    <td><code>{escape(record.path)}</code></td>
+                    <td>{record.status_code}</td>
+                    <td class="text-end">{record.duration * 1000:.1f} мс</td>
+                    <td>{profile_link}</td>
+                </tr>
+            '''
+
+        profile_rows = ""
+        for record in profiled:
+            profile_rows += f'''
+                <tr>
+                    <td>{record.started_at.strftime("%d.%m.%Y %H:%M:%S")}</td>
+                    <td>{record.method}</td>
+                    <td><code>{escape(record.path)}</code></td>
+                    <td class="text-end">{record.duration * 1000:.1f} мс</td>
+                    <td class="text-end">{record.profiler.total_samples}</td>
+                    <td><a href="/admin/profiler/{record.id}">скачать</a></td>
+                </tr>
+            '''
+
+        empty_row = '<tr><td colspan="6" class="text-muted">Нет данных</td></tr>'
+
+        return f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Профилировщик - ITmatch Admin</title>
+            <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
+            <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/bootstrap-icons.css">
+            <style>
+                body {{ padding: 20px; background-color: #f8f9fa; }}
+            </style>
+        </head>
+        <body>
+            <div class="container-fluid">
+                <div class="row mb-4">
+                    <div class="col-12">
+                        <h1><i class="bi bi-stopwatch me-2"></i>Профилировщик запросов</h1>
+                        <p class="text-muted">
+                            Чтобы снять профиль, откройте любую страницу с параметром
+                            <code>?{PROFILE_QUERY_PARAM}=1</code> (профиль сохранится здесь) или
+                            <code>?{PROFILE_QUERY_PARAM}=collapsed</code> (профиль вернётся вместо страницы).
+                            Формат профиля - свёрнутые стеки для flamegraph.pl или speedscope.
+                        </p>
+                    </div>
+                </div>
+
+                <div class="card mb-4">
+                    <div class="card-header bg-danger text-white">
+                        <h5 class="mb-0"><i class="bi bi-hourglass-split me-2"></i>Самые медленные запросы</h5>
+                    </div>
+                    <div class="card-body">
+                        <table class="table table-sm">
+                            <tr><th>Время</th><th>Метод</th><th>Путь</th><th>Статус</th><th class="text-end">Длительность</th><th>Профиль</th></tr>
+                            {rows or empty_row}
+                        </table>
+                    </div>
+                </div>
+
+                <div class="card mb-4">
+                    <div class="card-header bg-primary text-white">
+                        <h5 class="mb-0"><i class="bi bi-fire me-2"></i>Снятые профили</h5>
+                    </div>
+                    <div class="card-body">
+                        <table class="table table-sm">
+                            <tr><th>Время</th><th>Метод</th><th>Путь</th><th class="text-end">Длительность</th><th class="text-end">Сэмплов</th><th>Профиль</th></tr>
+                            {profile_rows or empty_row}
+                        </table>
+                    </div>
+                </div>
+
+                <a href="/admin" class="btn btn-outline-primary btn-sm">
+                    <i class="bi bi-arrow-left"></i> Назад в админку
+                </a>
+            </div>
+        </body>
+        </html>
+        '''
+
+
 # Обновляем функцию setup_admin
 def setup_admin(app):
     """Настройка админ-панели"""
     from sqladmin import templates
+    from .admin_export import ExportView
 
     authentication_backend = AdminAuth(
         secret_key="your-secret-key-here-change-in-production"
@@ -488,6 +861,9 @@ def setup_admin(app):
     admin.add_view(MatchAdmin)
     admin.add_view(MessageAdmin)
     admin.add_view(StatsView)  # <-- ДОБАВЛЯЕМ СТРАНИЦУ СТАТИСТИКИ
+    admin.add_view(AnalyticsView)
+    admin.add_view(ProfilerView)
+    admin.add_view(ExportView)
 
     logger.info("✅ Админ-панель настроена (с аутентификацией и статистикой)")
     return admin
\ No newline at end of file
@@ -0,0 +1,208 @@
+"""
+Потоковая выгрузка таблиц из админ-панели в CSV / NDJSON
+"""
+import csv
+import io
+import json
+from datetime import datetime, date
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
+from sqladmin import BaseView, expose
+from sqlalchemy import Boolean, Integer, select
+
+from .database import SessionLocal
+from .models import User, Like, Match, Message
+from .admin import UserAdmin, MessageAdmin
+
+# Сколько строк читаем из курсора за раз и отдаём одним чанком
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Таблица -> (модель, выгружаемые колонки, колонки для фильтрации)
+EXPORT_TABLES = {
+    "users": (
+        User,
+        [User.id, User.email, User.username, User.specialization, User.experience,
+         User.bio, User.avatar_url, User.is_active, User.is_admin, User.created_at],
+        UserAdmin.column_filters
+    ),
+    "likes": (
+        Like,
+        [Like.id, Like.from_user_id, Like.to_user_id, Like.created_at],
+        [Like.from_user_id, Like.to_user_id]
+    ),
+    "matches": (
+        Match,
+        [Match.id, Match.user1_id, Match.user2_id, Match.created_at],
+        [Match.user1_id, Match.user2_id]
+    ),
+    "messages": (
+        Message,
+        [Message.id, Message.match_id, Message.sender_id, Message.text,
+         Message.created_at, Message.is_read],
+        [Message.match_id, Message.sender_id] + MessageAdmin.column_filters
+    ),
+}
+
+
+def _parse_filter_value(column, raw: str):
+    """Привести значение фильтра из query string к типу колонки"""
+    if isinstance(column.type, Boolean):
+        return raw.lower() in ("1", "true", "yes", "on")
+    if isinstance(column.type, Integer):
+        return int(raw)
+    return raw
+
+
+def build_export_filters(table: str, query_params) -> list:
+    """
+    Условия WHERE из query string
+
+    Поддерживаются колонки из списка фильтров таблицы (как в column_filters
+    админки) и диапазон по дате создания: created_from / created_to (ISO).
+    """
+    model, _, filter_columns = EXPORT_TABLES[table]
+    conditions = []
+
+    for column in filter_columns:
+        raw = query_params.get(column.key)
+        if raw is not None and raw != "":
+            conditions.append(column == _parse_filter_value(column, raw))
+
+    if query_params.get("created_from"):
+        conditions.append(model.created_at >= datetime.fromisoformat(query_params["created_from"]))
+    if query_params.get("created_to"):
+        conditions.append(model.created_at < datetime.fromisoformat(query_params["created_to"]))
+
+    return conditions
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def stream_export(table: str, export_format: str, conditions: list):
+    """Генератор чанков выгрузки; строки читаются с сервера порциями"""
+    model, columns, _ = EXPORT_TABLES[table]
+    names = [column.key for column in columns]
+
+    db = SessionLocal()
+    try:
+        stmt = select(*columns).where(*conditions).order_by(model.id).execution_options(
+            yield_per=EXPORT_CHUNK_SIZE
+        )
+        result = db.execute(stmt)
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            yield buffer.getvalue()
+
+            for partition in result.partitions():
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(
+                    [_json_value(value) for value in row] for row in partition
+                )
+                yield buffer.getvalue()
+        else:
+            for partition in result.partitions():
+                yield "".join(
+                    json.dumps(
+                        {name: _json_value(value) for name, value in zip(names, row)},
+                        ensure_ascii=False
+                    ) + "\n"
+                    for row in partition
+                )
+    finally:
+        db.close()
+
+
+class ExportView(BaseView):
+    """Выгрузка таблиц целиком без загрузки в память"""
+
+    name = "📤 Экспорт"
+    icon = "fa-solid fa-file-export"
+
+    def is_visible(self, request: Request) -> bool:
+        """Показывать только администраторам"""
+        return request.session.get("admin", False)
+
+    def is_accessible(self, request: Request) -> bool:
+        """Доступ только администраторам"""
+        return request.session.get("admin", False)
+
+    @expose("/export", methods=["GET"])
+    async def export_page(self, request: Request):
+        """Страница со ссылками на выгрузки"""
+        links = ""
+        for table in EXPORT_TABLES:
+            filters = ", ".join(column.key for column in EXPORT_TABLES[table][2])
+            buttons = " ".join(
+                f'<a href="/admin/export/{table}.{export_format}" class="btn btn-sm btn-outline-primary">{export_format.upper()}</a>'
+                for export_format in EXPORT_FORMATS
+            )
+            links += f'''
+                <tr>
+                    <td><strong>{table}</strong></td>
+                    <td><code>{filters}, created_from, created_to</code></td>
+                    <td>{buttons}</td>
+                </tr>
+            '''
+
+        return HTMLResponse(content=f'''
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Экспорт - ITmatch Admin</title>
+            <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist/css/bootstrap.min.css" rel="stylesheet">
+            <style>
+                body {{ padding: 20px; background-color: #f8f9fa; }}
+            </style>
+        </head>
+        <body>
+            <div class="container-fluid">
+                <h1>Экспорт таблиц</h1>
+                <p class="text-muted">
+                    Фильтры передаются в query string, например
+                    <code>/admin/export/users.csv?specialization=Backend&amp;is_active=true</code>
+                </p>
+                <table class="table">
+                    <tr><th>Таблица</th><th>Фильтры</th><th>Формат</th></tr>
+                    {links}
+                </table>
+                <a href="/admin" class="btn btn-outline-primary btn-sm">Назад в админку</a>
+            </div>
+        </body>
+        </html>
+        ''')
+
+    @expose("/export/{table}.{export_format}", methods=["GET"])
+    async def export_table(self, request: Request):
+        """Потоковая выгрузка таблицы"""
+        table = request.path_params["table"]
+        export_format = request.path_params["export_format"]
+
+        if table not in EXPORT_TABLES or export_format not in EXPORT_FORMATS:
+            return PlainTextResponse("Неизвестная таблица или формат", status_code=404)
+
+        try:
+            conditions = build_export_filters(table, request.query_params)
+        except ValueError:
+            return PlainTextResponse("Неверное значение фильтра", status_code=400)
+
+        filename = f"{table}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.{export_format}"
+
+        return StreamingResponse(
+            stream_export(table, export_format, conditions),
+            media_type=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        )
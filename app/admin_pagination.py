@@ -0,0 +1,229 @@
+"""
+Keyset-пагинация и оценка количества строк для списков sqladmin
+"""
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import anyio
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import selectinload
+from sqladmin.pagination import Pagination, PageControl
+from starlette.datastructures import URL
+from starlette.requests import Request
+
+# Сколько секунд держим оценку количества строк таблицы
+ESTIMATED_COUNT_TTL = int(os.getenv("ITMATCH_ADMIN_COUNT_TTL", "60"))
+
+# При поиске считаем совпадения не дальше этого предела
+SEARCH_COUNT_LIMIT = 10000
+
+CURSOR_PARAMS = ["page", "after", "before", "last"]
+
+
+@dataclass
+class KeysetPagination(Pagination):
+    """Пагинация по курсору первичного ключа вместо OFFSET"""
+
+    has_previous_rows: bool = False
+    has_next_rows: bool = False
+    first_key: Optional[int] = None
+    last_key: Optional[int] = None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.has_previous_rows
+
+    @property
+    def has_next(self) -> bool:
+        return self.has_next_rows
+
+    def add_pagination_urls(self, base_url: URL) -> None:
+        current_url = str(base_url)
+        base_url = base_url.remove_query_params(CURSOR_PARAMS)
+        controls = {1: str(base_url)}
+
+        if self.has_previous_rows and self.page > 2:
+            controls[self.page - 1] = str(base_url.include_query_params(
+                page=self.page - 1, before=self.first_key
+            ))
+
+        controls[self.page] = current_url if self.page > 1 else str(base_url)
+
+        if self.has_next_rows:
+            controls[self.page + 1] = str(base_url.include_query_params(
+                page=self.page + 1, after=self.last_key
+            ))
+
+            total_pages = max(math.ceil(self.count / self.page_size), 1)
+            if total_pages > self.page + 1:
+                controls[total_pages] = str(base_url.include_query_params(
+                    page=total_pages, last=1
+                ))
+
+        self.page_controls = [
+            PageControl(number=number, url=controls[number]) for number in sorted(controls)
+        ]
+
+
+class KeysetPaginationMixin:
+    """
+    Примесь для ModelView: листание по первичному ключу и приблизительный count
+
+    При сортировке по первичному ключу (по умолчанию) страницы выбираются
+    условием id > курсор / id < курсор, поэтому последняя страница открывается
+    так же быстро, как первая. Общее количество строк оценивается по
+    pg_class.reltuples (PostgreSQL) или sqlite_stat1 (SQLite после ANALYZE);
+    без статистики - по min/max первичного ключа, это верхняя граница.
+    Оценка кэшируется. Для поиска и сортировки по другим колонкам остаётся OFFSET,
+    но с ограниченным подсчётом.
+    """
+
+    _count_cache: dict = {}
+
+    def _run_scalar_sync(self, stmt):
+        with self.session_maker() as session:
+            return session.execute(stmt).scalar()
+
+    def _estimate_count_sync(self) -> int:
+        pk = self.pk_columns[0]
+        with self.session_maker() as session:
+            if session.bind.dialect.name == "postgresql":
+                estimate = session.execute(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+                    {"table": self.model.__tablename__}
+                ).scalar()
+                if estimate and estimate > 0:
+                    return estimate
+
+            # Оба значения берутся из индекса первичного ключа за O(log n).
+            # Это верхняя граница: после удалений в id остаются дыры
+            low, high = session.execute(select(func.min(pk), func.max(pk))).one()
+            if high is None:
+                return 0
+            upper_bound = high - low + 1
+
+            if session.bind.dialect.name == "sqlite":
+                analyzed = self._sqlite_analyzed_count(session)
+                if analyzed is not None:
+                    # Статистика ANALYZE не видит строк, добавленных после неё
+                    return min(analyzed, upper_bound)
+            return upper_bound
+
+    def _sqlite_analyzed_count(self, session) -> Optional[int]:
+        """Число строк по sqlite_stat1 (есть после ANALYZE), иначе None"""
+        has_stats = session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        ).scalar()
+        if not has_stats:
+            return None
+        # Первое число stat - количество строк таблицы (для любого её индекса)
+        stat = session.execute(
+            text("SELECT stat FROM sqlite_stat1 WHERE tbl = :table LIMIT 1"),
+            {"table": self.model.__tablename__}
+        ).scalar()
+        if not stat:
+            return None
+        return int(stat.split()[0])
+
+    async def count(self, request: Request, stmt=None) -> int:
+        if stmt is not None:
+            return await anyio.to_thread.run_sync(self._run_scalar_sync, stmt)
+
+        cached = self._count_cache.get(self.identity)
+        if cached and time.monotonic() - cached[1] < ESTIMATED_COUNT_TTL:
+            return cached[0]
+
+        estimate = await anyio.to_thread.run_sync(self._estimate_count_sync)
+        self._count_cache[self.identity] = (estimate, time.monotonic())
+        return estimate
+
+    def _base_list_query(self, request: Request):
+        stmt = self.list_query(request)
+        for relation in self._list_relations:
+            stmt = stmt.options(selectinload(relation))
+        return stmt
+
+    async def list(self, request: Request) -> Pagination:
+        page = self.validate_page_number(request.query_params.get("page"), 1)
+        page_size = self.validate_page_number(request.query_params.get("pageSize"), 0)
+        page_size = min(page_size or self.page_size, max(self.page_size_options))
+        search = request.query_params.get("search", None)
+        sort_by = request.query_params.get("sortBy", None)
+
+        pk = self.pk_columns[0]
+        if search or (sort_by and sort_by != pk.name):
+            return await self._offset_list(request, page, page_size, search)
+
+        descending = sort_by == pk.name and request.query_params.get("sort") == "desc"
+        after = request.query_params.get("after")
+        before = request.query_params.get("before")
+        is_last = bool(request.query_params.get("last"))
+
+        forward_order = pk.desc() if descending else pk.asc()
+        backward_order = pk.asc() if descending else pk.desc()
+
+        stmt = self._base_list_query(request)
+        if after:
+            key = self.validate_page_number(after, 0)
+            stmt = stmt.where(pk < key if descending else pk > key).order_by(forward_order)
+        elif before:
+            key = self.validate_page_number(before, 0)
+            stmt = stmt.where(pk > key if descending else pk < key).order_by(backward_order)
+        elif is_last:
+            stmt = stmt.order_by(backward_order)
+        else:
+            stmt = stmt.order_by(forward_order)
+            page = 1
+
+        # Берём на одну строку больше, чтобы знать, есть ли следующая страница
+        rows = list(await self._run_query(stmt.limit(page_size + 1)))
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if before or is_last:
+            rows.reverse()
+            has_previous, has_next = has_more, not is_last
+        else:
+            has_previous, has_next = bool(after), has_more
+
+        count = await self.count(request)
+        if is_last:
+            page = max(math.ceil(count / page_size), 1)
+        if not has_previous:
+            page = 1
+        count = max(count, (page - 1) * page_size + len(rows))
+
+        return KeysetPagination(
+            rows=rows,
+            page=page,
+            page_size=page_size,
+            count=count,
+            has_previous_rows=has_previous,
+            has_next_rows=has_next,
+            first_key=getattr(rows[0], pk.name) if rows else None,
+            last_key=getattr(rows[-1], pk.name) if rows else None
+        )
+
+    async def _offset_list(self, request: Request, page: int, page_size: int, search) -> Pagination:
+        stmt = self.sort_query(self._base_list_query(request), request)
+
+        if search:
+            stmt = self.search_query(stmt=stmt, term=search)
+            count = await self.count(
+                request,
+                select(func.count()).select_from(stmt.limit(SEARCH_COUNT_LIMIT).subquery())
+            )
+        else:
+            count = await self.count(request)
+
+        rows = await self._run_query(stmt.limit(page_size).offset((page - 1) * page_size))
+
+        return Pagination(
+            rows=rows,
+            page=page,
+            page_size=page_size,
+            count=max(count, (page - 1) * page_size + len(rows)),
+        )
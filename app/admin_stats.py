@@ -6,6 +6,7 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 from .database import SessionLocal
 from .models import User, Like, Match, Message
+from .stats import stats_cache
 from fastapi import Request
 from datetime import datetime, timedelta
 
@@ -19,67 +20,20 @@ class StatsView(BaseView):
     @expose("/stats", methods=["GET"])
     def stats_page(self, request: Request):
         """Страница со статистикой"""
-        db = SessionLocal()
-
-        try:
-            # Основная статистика
-            total_users = db.query(func.count(User.id)).scalar()
-            active_users = db.query(func.count(User.id)).filter(User.is_active == True).scalar()
-            admin_users = db.query(func.count(User.id)).filter(User.is_admin == True).scalar()
-
-            total_likes = db.query(func.count(Like.id)).scalar()
-            total_matches = db.query(func.count(Match.id)).scalar()
-            total_messages = db.query(func.count(Message.id)).scalar()
-
-            # Статистика за последние 7 дней
-            week_ago = datetime.utcnow() - timedelta(days=7)
-
-            new_users_week = db.query(func.count(User.id)).filter(
-                User.created_at >= week_ago
-            ).scalar()
-
-            new_likes_week = db.query(func.count(Like.id)).filter(
-                Like.created_at >= week_ago
-            ).scalar()
-
-            new_matches_week = db.query(func.count(Match.id)).filter(
-                Match.created_at >= week_ago
-            ).scalar()
-
-            # Статистика по специализациям
-            specializations = db.query(
-                User.specialization,
-                func.count(User.id)
-            ).group_by(User.specialization).all()
-
-            # Статистика по опыту
-            experiences = db.query(
-                User.experience,
-                func.count(User.id)
-            ).group_by(User.experience).all()
-
-            context = {
-                "request": request,
-                "total_users": total_users or 0,
-                "active_users": active_users or 0,
-                "admin_users": admin_users or 0,
-                "total_likes": total_likes or 0,
-                "total_matches": total_matches or 0,
-                "total_messages": total_messages or 0,
-                "new_users_week": new_users_week or 0,
-                "new_likes_week": new_likes_week or 0,
-                "new_matches_week": new_matches_week or 0,
-                "specializations": specializations or [],
-                "experiences": experiences or [],
-            }
-
-            return self.templates.TemplateResponse(
-                "admin_stats.html",
-                context
-            )
-
-        finally:
-            db.close()
+        # Снимок статистики общий с основной админкой (app/stats.py)
+        snapshot = stats_cache.get()
+
+        context = {
+            "request": request,
+            "snapshot_age": int(stats_cache.age()),
+            "stats_ttl": stats_cache.ttl,
+            **snapshot
+        }
+
+        return self.templates.TemplateResponse(
+            "admin_stats.html",
+            context
+        )
 
 
 # HTML шаблон для статистики
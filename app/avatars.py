@@ -0,0 +1,285 @@
+"""
+Обработка аватарок: декодирование и пережатие в фиксированные размеры
+
+Загруженное изображение обрезается до квадрата и сохраняется в размерах
+AVATAR_SIZES в WebP и JPEG без EXIF. Пережатие идёт в пуле процессов,
+чтобы не занимать event loop и обойти GIL. Оригинал не хранится
+(или складывается в архив, если задан ITMATCH_AVATAR_ARCHIVE_DIR).
+
+Ключ аватарки - хэш содержимого загруженного файла, поэтому одинаковые
+картинки хранятся один раз, а файл под данным именем никогда не меняется:
+он отдаётся с Cache-Control: immutable и сильным ETag. Файлы, на которые
+не ссылается ни один пользователь, удаляет collect_garbage.
+
+Файлы лежат в хранилище из app.storage (локальный каталог или S3).
+
+Аватарка в avatar_url:
+  - "default_avatar.png" - аватарка по умолчанию;
+  - "<имя>.<расширение>" - старая загрузка, один файл-оригинал;
+  - "<ключ>" без расширения - набор файлов "<ключ>_<размер>.<формат>".
+"""
+import io
+import os
+import re
+import time
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.staticfiles import NotModifiedResponse
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+from .storage import storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AVATAR = "default_avatar.png"
+DEFAULT_AVATAR_URL = "/static/default_avatar.png"
+
+# Стороны квадратных миниатюр, px
+AVATAR_SIZES = (64, 150, 400)
+
+# Формат -> (расширение, MIME, параметры сохранения PIL)
+AVATAR_FORMATS = {
+    "webp": ("webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("jpg", "image/jpeg", {"quality": 85, "optimize": True, "progressive": True}),
+}
+
+# Больше пикселей не декодируем (защита от «бомб» распаковки)
+MAX_IMAGE_PIXELS = 40_000_000
+
+AVATAR_WORKERS = int(os.getenv("ITMATCH_AVATAR_WORKERS", "2"))
+
+# Куда складывать оригиналы; пусто - оригинал отбрасывается
+AVATAR_ARCHIVE_DIR = os.getenv("ITMATCH_AVATAR_ARCHIVE_DIR", "")
+
+# Длина ключа: первые 128 бит SHA-256 от содержимого
+AVATAR_KEY_LENGTH = 32
+
+# Файлы моложе этого возраста сборщик мусора не трогает: их могли только что
+# записать (или переиспользовать) для ещё не сохранённого профиля
+AVATAR_GC_GRACE = int(os.getenv("ITMATCH_AVATAR_GC_GRACE", "3600"))
+
+# Год - дольше браузеры и CDN всё равно не хранят
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_variant_re = re.compile(r"^([0-9a-f]{%d})_(\d+)\.(%s)$" % (
+    AVATAR_KEY_LENGTH, "|".join(ext for ext, _, _ in AVATAR_FORMATS.values())
+))
+
+_pool = None
+
+
+class AvatarError(ValueError):
+    """Файл не удалось прочитать как изображение"""
+
+
+def render_avatar_variants(data: bytes) -> dict:
+    """
+    Пережать изображение во все размеры и форматы
+
+    Выполняется в процессе пула. Возвращает {(размер, формат): байты}.
+    """
+    if Image is None:
+        raise AvatarError("Обработка изображений недоступна: не установлен Pillow")
+
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    largest = max(AVATAR_SIZES)
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # JPEG сразу декодируется в уменьшенном масштабе - в разы быстрее
+            img.draft("RGB", (largest, largest))
+            # Поворот по EXIF; сами метаданные в новые файлы не попадают
+            img = ImageOps.exif_transpose(img)
+
+            if img.mode in ("RGBA", "LA", "P"):
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, "white")
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                img = img.convert("RGB")
+
+            base = ImageOps.fit(img, (largest, largest), Image.LANCZOS)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise AvatarError(f"Не удалось прочитать изображение: {e}")
+
+    variants = {}
+    for size in AVATAR_SIZES:
+        resized = base if size == largest else base.resize((size, size), Image.LANCZOS)
+        for fmt, (_, _, options) in AVATAR_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), **options)
+            variants[(size, fmt)] = buffer.getvalue()
+
+    return variants
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=AVATAR_WORKERS)
+    return _pool
+
+
+async def process_avatar(data: bytes) -> dict:
+    """Пережать аватарку в пуле процессов"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), render_avatar_variants, data)
+
+
+def shutdown_avatar_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def is_processed(avatar_url: str) -> bool:
+    """Аватарка сохранена набором миниатюр (а не одним оригиналом)"""
+    return bool(avatar_url) and avatar_url != DEFAULT_AVATAR and "." not in avatar_url
+
+
+def content_key(data: bytes) -> str:
+    """Ключ аватарки по содержимому загруженного файла"""
+    return hashlib.sha256(data).hexdigest()[:AVATAR_KEY_LENGTH]
+
+
+def variant_filename(key: str, size: int, fmt: str) -> str:
+    return f"{key}_{size}.{AVATAR_FORMATS[fmt][0]}"
+
+
+def _variant_names(key: str) -> list:
+    return [variant_filename(key, size, fmt) for size in AVATAR_SIZES for fmt in AVATAR_FORMATS]
+
+
+def avatar_exists(key: str) -> bool:
+    """Все миниатюры с этим ключом уже лежат в хранилище"""
+    return all(storage.exists(name) for name in _variant_names(key))
+
+
+def touch_avatar(key: str):
+    """Обновить время изменения, чтобы сборщик мусора не удалил переиспользованные файлы"""
+    for name in _variant_names(key):
+        storage.touch(name)
+
+
+def save_avatar(key: str, variants: dict, original: bytes = None, original_ext: str = ""):
+    """Записать миниатюры в хранилище (и оригинал в архив, если он включён)"""
+    for (size, fmt), content in variants.items():
+        storage.save(
+            variant_filename(key, size, fmt), content,
+            content_type=AVATAR_FORMATS[fmt][1],
+            cache_control=IMMUTABLE_CACHE_CONTROL,
+        )
+
+    if AVATAR_ARCHIVE_DIR and original is not None:
+        os.makedirs(AVATAR_ARCHIVE_DIR, exist_ok=True)
+        with open(os.path.join(AVATAR_ARCHIVE_DIR, f"{key}{original_ext}"), "wb") as f:
+            f.write(original)
+
+
+async def store_avatar(data: bytes, original_ext: str = "") -> str:
+    """
+    Сохранить загруженное изображение как аватарку и вернуть её ключ
+
+    Одинаковые картинки пережимаются и хранятся один раз. Обращения к
+    хранилищу идут в пуле потоков, пережатие - в пуле процессов.
+    Бросает AvatarError, если данные не читаются как изображение.
+    """
+    key = content_key(data)
+    if await run_in_threadpool(avatar_exists, key):
+        await run_in_threadpool(touch_avatar, key)
+    else:
+        variants = await process_avatar(data)
+        await run_in_threadpool(save_avatar, key, variants, data, original_ext)
+    return key
+
+
+def delete_avatar(avatar_url: str):
+    """Удалить файлы аватарки (все миниатюры или старый оригинал)"""
+    if not avatar_url or avatar_url == DEFAULT_AVATAR:
+        return
+
+    names = _variant_names(avatar_url) if is_processed(avatar_url) else [avatar_url]
+    for name in names:
+        storage.delete(name)
+
+
+def collect_garbage(referenced: set, grace_seconds: int = AVATAR_GC_GRACE, dry_run: bool = False) -> list:
+    """
+    Удалить файлы, на которые не ссылается ни один пользователь
+
+    referenced - множество значений avatar_url из базы. Заодно убираются
+    брошенные прямые загрузки (incoming/...) и недописанные временные файлы.
+    Возвращает список удалённых (при dry_run - подлежащих удалению) файлов.
+    """
+    deadline = time.time() - grace_seconds
+    removed = []
+    for name, mtime in list(storage.list()):
+        match = _variant_re.match(name)
+        avatar_url = match.group(1) if match else name
+        if avatar_url in referenced or mtime > deadline:
+            continue
+        if not dry_run:
+            storage.delete(name)
+        removed.append(name)
+
+    return removed
+
+
+class AvatarFiles(StaticFiles):
+    """
+    Раздача загруженных аватарок
+
+    Миниатюры с ключом-хэшем неизменяемы: кэшируются на год без
+    перепроверок, ETag - имя файла. Старые файлы отдаются как обычная статика.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        name = os.path.basename(full_path)
+        if not _variant_re.match(name):
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            method=scope["method"],
+            headers={"cache-control": IMMUTABLE_CACHE_CONTROL, "etag": f'"{name}"'},
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+# --- Помощники для шаблонов ---
+
+def avatar_src(avatar_url: str, display_size: int, fmt: str = "jpeg") -> str:
+    """URL наименьшей миниатюры, которая не меньше display_size"""
+    if not avatar_url or avatar_url == DEFAULT_AVATAR:
+        return DEFAULT_AVATAR_URL
+    if not is_processed(avatar_url):
+        return storage.url(avatar_url)
+
+    size = next((s for s in AVATAR_SIZES if s >= display_size), max(AVATAR_SIZES))
+    return storage.url(variant_filename(avatar_url, size, fmt))
+
+
+def avatar_srcset(avatar_url: str, fmt: str = "jpeg") -> str:
+    """srcset со всеми размерами - браузер выберет по плотности экрана"""
+    if not is_processed(avatar_url):
+        return ""
+    return ", ".join(
+        f"{storage.url(variant_filename(avatar_url, size, fmt))} {size}w"
+        for size in AVATAR_SIZES
+    )
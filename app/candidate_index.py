@@ -0,0 +1,294 @@
+"""
+Индекс кандидатов для ленты на битовых масках
+
+Маска - обычное целое число Python: бит N установлен, если пользователь
+с id N входит в множество. Для каждой пары (специализация, уровень) хранится
+маска активных пользователей, для каждого смотрящего ленту - маска тех,
+кого он уже лайкнул. Кандидаты обычной ленты:
+
+    (ИЛИ подходящих корзин) И НЕ лайкнутые И НЕ пропущенные И НЕ сам
+
+Число кандидатов - bit_count(), страница - биты по порядку id, начиная
+с нужного по счёту. Маска на 100 тыс. id занимает 12,5 КБ, операции над
+ней - микросекунды; из базы читаются только строки страницы.
+
+Маски лайкнутых кэшируются на ITMATCH_SEEN_TTL секунд (лайки из других
+воркеров) в пределах ITMATCH_SEEN_CACHE_MB: маска весит max(id)/8 байт
+независимо от числа лайков, поэтому кэш ограничен объёмом, а не числом
+масок.
+
+Индекс строится при старте приложения и обновляется при регистрации,
+правке профиля и (де)активации в админке. Другие воркеры узнают о новых
+анкетах раз в ITMATCH_CANDIDATE_INDEX_SYNC секунд, а о правках - при
+полной перестройке раз в ITMATCH_CANDIDATE_INDEX_REBUILD секунд; строки
+страницы всё равно проверяются обычным запросом с фильтрами ленты.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .database import engine
+from .models import Like, User
+
+logger = logging.getLogger(__name__)
+
+# Как часто подхватывать анкеты, зарегистрированные через другие воркеры
+SYNC_SECONDS = int(os.getenv("ITMATCH_CANDIDATE_INDEX_SYNC", "30"))
+
+# Как часто перестраивать индекс целиком (правки профилей в других воркерах)
+REBUILD_SECONDS = int(os.getenv("ITMATCH_CANDIDATE_INDEX_REBUILD", "600"))
+
+# Сколько памяти отдать маскам лайкнутых (по одной на смотрящего ленту), МБ
+SEEN_CACHE_MB = int(os.getenv("ITMATCH_SEEN_CACHE_MB", "64"))
+
+# Сколько секунд маска лайкнутых не перечитывается из базы
+SEEN_TTL = int(os.getenv("ITMATCH_SEEN_TTL", "30"))
+
+# Сколько лишних анкет брать на страницу: часть могла устареть в индексе
+PAGE_SLACK = 5
+
+# Блок маски, который целиком пропускается по bit_count() при поиске страницы
+_BLOCK_BYTES = 128
+
+USER_COLUMNS = (User.id, User.specialization, User.experience, User.is_active)
+
+
+def to_bitmap(ids: Iterable[int], max_id: Optional[int] = None) -> int:
+    """
+    Маска из списка id (за один проход, без сдвигов большого числа)
+
+    Маска весит max(id)/8 байт: id из сессии или чужих данных ограничиваем
+    max_id - кандидатов с большими id в индексе всё равно нет.
+    """
+    ids = [
+        int(user_id) for user_id in ids
+        if int(user_id) >= 0 and (max_id is None or int(user_id) <= max_id)
+    ]
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for user_id in ids:
+        data[user_id >> 3] |= 1 << (user_id & 7)
+    return int.from_bytes(data, "little")
+
+
+def _mask_bytes(bitmap: int) -> int:
+    return (bitmap.bit_length() + 7) // 8
+
+
+def select_bits(bitmap: int, offset: int, limit: int) -> List[int]:
+    """Номера единичных битов по возрастанию: limit штук, начиная с offset-го"""
+    result = []
+    if bitmap <= 0 or limit <= 0:
+        return result
+
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for start in range(0, len(data), _BLOCK_BYTES):
+        block = int.from_bytes(data[start:start + _BLOCK_BYTES], "little")
+        count = block.bit_count()
+        if offset >= count:
+            offset -= count
+            continue
+
+        base = start * 8
+        while block and len(result) < limit:
+            lowest = block & -block
+            block ^= lowest
+            if offset:
+                offset -= 1
+            else:
+                result.append(base + lowest.bit_length() - 1)
+        if len(result) >= limit:
+            break
+    return result
+
+
+class CandidateIndex:
+    """Маски пользователей по корзинам (специализация, уровень) для текущего воркера"""
+
+    def __init__(self, seen_cache_mb: int = SEEN_CACHE_MB, seen_ttl: int = SEEN_TTL,
+                 sync_seconds: int = SYNC_SECONDS, rebuild_seconds: int = REBUILD_SECONDS,
+                 bind: Engine = engine):
+        # База, из которой строится индекс (бенчмарки подставляют свою)
+        self.bind = bind
+        self.seen_cache_bytes = seen_cache_mb * 1024 * 1024
+        self.seen_ttl = seen_ttl
+        self.sync_seconds = sync_seconds
+        self.rebuild_seconds = rebuild_seconds
+        self.buckets: Dict[Tuple[str, str], int] = {}
+        self.last_user_id = 0
+        # id смотрящего -> (время загрузки, маска лайкнутых)
+        self._seen = OrderedDict()
+        self._seen_bytes = 0
+        self._built_at = 0.0
+        self._synced_at = 0.0
+        self._lock = threading.RLock()
+        self._rebuilding = False
+        # Анкеты, обновлённые во время фоновой перестройки (её снимок мог их не увидеть)
+        self._updated_during_rebuild = set()
+
+    @property
+    def ready(self) -> bool:
+        return self._built_at > 0
+
+    def rebuild(self):
+        """Построить маски заново по таблице users"""
+        started = time.perf_counter()
+        with self._lock:
+            self._updated_during_rebuild = set()
+        try:
+            with self.bind.connect() as conn:
+                rows = conn.execute(select(*USER_COLUMNS).where(User.is_active == True)).all()
+                last_user_id = conn.execute(select(User.id).order_by(User.id.desc()).limit(1)).scalar() or 0
+
+            members = {}
+            for user_id, specialization, experience, _ in rows:
+                members.setdefault((specialization, experience), []).append(user_id)
+            buckets = {key: to_bitmap(ids) for key, ids in members.items()}
+
+            with self._lock:
+                self.buckets = buckets
+                self.last_user_id = last_user_id
+                # Заодно забываем маски лайкнутых: лайки могли удалить в обход воркера
+                self._seen.clear()
+                self._seen_bytes = 0
+                self._built_at = self._synced_at = time.monotonic()
+                updated = self._updated_during_rebuild
+                self._rebuilding = False
+            if updated:
+                self.refresh(updated)
+            logger.info(
+                f"✅ Индекс кандидатов: {len(rows)} активных анкет, {len(buckets)} корзин "
+                f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+            )
+        except Exception as e:
+            logger.error(f"🔥 Ошибка при построении индекса кандидатов: {e}", exc_info=True)
+            with self._lock:
+                self._rebuilding = False
+            if not self.ready:
+                raise
+
+    def update(self, user_id: int, specialization: Optional[str] = None,
+               experience: Optional[str] = None, is_active: bool = False):
+        """Переложить пользователя в его корзину (неактивные - ни в одной)"""
+        bit = 1 << user_id
+        key = (specialization, experience)
+        with self._lock:
+            for other_key, bitmap in self.buckets.items():
+                if bitmap & bit and other_key != key:
+                    self.buckets[other_key] = bitmap & ~bit
+            if is_active:
+                self.buckets[key] = self.buckets.get(key, 0) | bit
+            elif key in self.buckets:
+                self.buckets[key] &= ~bit
+            self.last_user_id = max(self.last_user_id, user_id)
+            if self._rebuilding:
+                self._updated_during_rebuild.add(user_id)
+
+    def update_user(self, user: User):
+        """Обновить по объекту пользователя (регистрация, правка профиля)"""
+        self.update(user.id, user.specialization, user.experience, bool(user.is_active))
+
+    def refresh(self, user_ids: Iterable[int]):
+        """Перечитать пользователей из базы (после массовых действий в админке)"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        with self.bind.connect() as conn:
+            rows = conn.execute(select(*USER_COLUMNS).where(User.id.in_(user_ids))).all()
+        for user_id, specialization, experience, is_active in rows:
+            self.update(user_id, specialization, experience, bool(is_active))
+        # Удалённых в выборке нет
+        for user_id in user_ids - {row[0] for row in rows}:
+            self.update(user_id)
+
+    def _sync(self):
+        """Подхватить новые анкеты; раз в rebuild_seconds - перестроить в фоне"""
+        now = time.monotonic()
+        if now - self._built_at > self.rebuild_seconds:
+            with self._lock:
+                start_rebuild = not self._rebuilding
+                self._rebuilding = True
+            if start_rebuild:
+                threading.Thread(target=self.rebuild, name="itmatch-candidates", daemon=True).start()
+
+        if now - self._synced_at > self.sync_seconds:
+            with self.bind.connect() as conn:
+                rows = conn.execute(
+                    select(*USER_COLUMNS).where(User.id > self.last_user_id).order_by(User.id)
+                ).all()
+            for user_id, specialization, experience, is_active in rows:
+                self.update(user_id, specialization, experience, bool(is_active))
+            self._synced_at = now
+
+    def seen(self, db: Session, user_id: int) -> int:
+        """Маска тех, кого пользователь уже лайкнул (из кэша или из базы)"""
+        with self._lock:
+            item = self._seen.get(user_id)
+            if item is not None and time.monotonic() - item[0] <= self.seen_ttl:
+                self._seen.move_to_end(user_id)
+                return item[1]
+
+        liked = db.execute(select(Like.to_user_id).where(Like.from_user_id == user_id)).scalars()
+        bitmap = to_bitmap(liked, self.last_user_id)
+        with self._lock:
+            self._store_seen(user_id, time.monotonic(), bitmap)
+        return bitmap
+
+    def _store_seen(self, user_id: int, loaded_at: float, bitmap: int):
+        """Положить маску в кэш и вытеснить старые сверх бюджета памяти (под блокировкой)"""
+        old = self._seen.pop(user_id, None)
+        if old is not None:
+            self._seen_bytes -= _mask_bytes(old[1])
+        self._seen[user_id] = (loaded_at, bitmap)
+        self._seen_bytes += _mask_bytes(bitmap)
+        while self._seen_bytes > self.seen_cache_bytes and len(self._seen) > 1:
+            _, (_, evicted) = self._seen.popitem(last=False)
+            self._seen_bytes -= _mask_bytes(evicted)
+
+    def mark_seen(self, user_id: int, other_id: int):
+        """Пользователь лайкнул other_id"""
+        if not 0 <= other_id <= self.last_user_id:
+            # Анкеты нет в индексе - и маска ей не нужна
+            return
+        with self._lock:
+            item = self._seen.get(user_id)
+            if item is not None:
+                self._store_seen(user_id, item[0], item[1] | (1 << other_id))
+
+    def forget_seen(self, user_id: Optional[int] = None):
+        """Перечитать маску лайкнутых пользователя (или всех) при следующем запросе"""
+        with self._lock:
+            if user_id is None:
+                self._seen.clear()
+                self._seen_bytes = 0
+            else:
+                item = self._seen.pop(user_id, None)
+                if item is not None:
+                    self._seen_bytes -= _mask_bytes(item[1])
+
+    def candidates(self, db: Session, user_id: int, specialization: Optional[str] = None,
+                   experience: Optional[str] = None, skipped_ids: Iterable[int] = ()) -> int:
+        """Маска кандидатов ленты с фильтрами"""
+        self._sync()
+        bitmap = 0
+        for (bucket_specialization, bucket_experience), members in list(self.buckets.items()):
+            if specialization and bucket_specialization != specialization:
+                continue
+            if experience and bucket_experience != experience:
+                continue
+            bitmap |= members
+
+        excluded = self.seen(db, user_id) | to_bitmap(skipped_ids, self.last_user_id) | (1 << user_id)
+        return bitmap & ~excluded
+
+
+# Индекс текущего воркера
+candidate_index = CandidateIndex()
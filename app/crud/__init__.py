@@ -3,7 +3,9 @@ from .users import (
     get_user_by_id,
     create_user,
     verify_password,
-    update_user_profile
+    update_user_profile,
+    count_users_with_avatar,
+    get_avatar_urls
 )
 from .likes import (
     create_like,
@@ -14,5 +16,13 @@ from .likes import (
 from .messages import (
     create_message,
     get_messages_by_match,
-    get_user_chats
+    get_user_chats,
+    get_chat_summaries,
+    get_messages_after
+)
+from .bulk import (
+    set_users_active,
+    delete_users,
+    delete_messages_by_senders,
+    delete_messages_by_matches
 )
\ No newline at end of file
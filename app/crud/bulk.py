@@ -0,0 +1,152 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, update, delete, table, column
+from .. import models
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Таблица из миграции 0002 (модели у неё нет)
+skipped_users = table("skipped_users", column("user_id"), column("skipped_user_id"))
+
+# Выборки больше этого размера обрабатываются порциями с отдельным коммитом
+BULK_CHUNK_SIZE = 5000
+
+
+def _chunks(ids, size):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _log_progress(done, total):
+    logger.info(f"⏳ Массовая операция: {done}/{total}")
+
+
+def _run_chunked(db: Session, ids, operation, chunk_size: int = BULK_CHUNK_SIZE, progress=_log_progress):
+    """
+    Выполнить операцию над id одной транзакцией или порциями
+
+    Если id не больше chunk_size - одна транзакция (всё или ничего).
+    Иначе каждая порция коммитится отдельно, а progress(сделано, всего)
+    вызывается после каждой порции.
+    """
+    ids = list(ids)
+    total = len(ids)
+    affected = 0
+
+    if total <= chunk_size:
+        affected = operation(ids)
+        db.commit()
+        return affected
+
+    done = 0
+    for chunk in _chunks(ids, chunk_size):
+        affected += operation(chunk)
+        db.commit()
+        done += len(chunk)
+        progress(done, total)
+
+    return affected
+
+
+def set_users_active(db: Session, user_ids, is_active: bool, **kwargs):
+    """Активировать/деактивировать пользователей одним UPDATE"""
+    def operation(ids):
+        return db.execute(
+            update(models.User)
+            .where(models.User.id.in_(ids))
+            .values(is_active=is_active)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    return _run_chunked(db, user_ids, operation, **kwargs)
+
+
+def delete_users(db: Session, user_ids, **kwargs):
+    """Удалить пользователей вместе с их лайками, пропусками, рекомендациями, матчами и сообщениями"""
+    def operation(ids):
+        user_matches = select(models.Match.id).where(
+            or_(
+                models.Match.user1_id.in_(ids),
+                models.Match.user2_id.in_(ids)
+            )
+        )
+
+        db.execute(
+            delete(models.Message)
+            .where(or_(
+                models.Message.sender_id.in_(ids),
+                models.Message.match_id.in_(user_matches)
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(models.Match)
+            .where(or_(
+                models.Match.user1_id.in_(ids),
+                models.Match.user2_id.in_(ids)
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(models.Like)
+            .where(or_(
+                models.Like.from_user_id.in_(ids),
+                models.Like.to_user_id.in_(ids)
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(models.Recommendation)
+            .where(or_(
+                models.Recommendation.user_id.in_(ids),
+                models.Recommendation.candidate_id.in_(ids)
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            delete(skipped_users)
+            .where(or_(
+                skipped_users.c.user_id.in_(ids),
+                skipped_users.c.skipped_user_id.in_(ids)
+            ))
+        )
+        return db.execute(
+            delete(models.User)
+            .where(models.User.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    return _run_chunked(db, user_ids, operation, **kwargs)
+
+
+def delete_messages_by_senders(db: Session, message_ids, **kwargs):
+    """Удалить все сообщения отправителей выбранных сообщений"""
+    senders = db.execute(
+        select(models.Message.sender_id).where(models.Message.id.in_(message_ids)).distinct()
+    ).scalars().all()
+
+    def operation(ids):
+        return db.execute(
+            delete(models.Message)
+            .where(models.Message.sender_id.in_(ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    return _run_chunked(db, senders, operation, **kwargs)
+
+
+def delete_messages_by_matches(db: Session, message_ids, **kwargs):
+    """Удалить все сообщения из чатов выбранных сообщений"""
+    matches = db.execute(
+        select(models.Message.match_id).where(models.Message.id.in_(message_ids)).distinct()
+    ).scalars().all()
+
+    def operation(ids):
+        return db.execute(
+            delete(models.Message)
+            .where(models.Message.match_id.in_(ids))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    return _run_chunked(db, matches, operation, **kwargs)
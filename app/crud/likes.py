@@ -57,6 +57,32 @@ def get_user_likes(db: Session, user_id: int):
     return sent_likes, received_likes
 
 
+def _pending_likes(db: Session, user_id: int):
+    """Входящие лайки активных пользователей без ответного лайка (по ix_likes_to_from)"""
+    answered = db.query(models.Like.to_user_id).filter(
+        models.Like.from_user_id == user_id
+    )
+    return db.query(models.Like).join(
+        models.User, models.User.id == models.Like.from_user_id
+    ).filter(
+        models.Like.to_user_id == user_id,
+        models.User.is_active == True,
+        models.Like.from_user_id.not_in(answered)
+    )
+
+
+def count_pending_likes(db: Session, user_id: int) -> int:
+    """Сколько активных пользователей лайкнули, а им ещё не ответили"""
+    return _pending_likes(db, user_id).count()
+
+
+def get_pending_liker_ids(db: Session, user_id: int):
+    """id активных пользователей, которые лайкнули, а им ещё не ответили"""
+    return [
+        liker_id for liker_id, in _pending_likes(db, user_id).with_entities(models.Like.from_user_id)
+    ]
+
+
 def get_user_matches(db: Session, user_id: int):
     """Получить все совпадения пользователя"""
     matches = db.query(models.Match).filter(
@@ -1,5 +1,5 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import or_, and_, case, func, select
 from .. import models
 from datetime import datetime
 
@@ -58,6 +58,61 @@ def get_user_chats(db: Session, user_id: int):
     return chats
 
 
+def get_chat_summaries(db: Session, user_id: int):
+    """
+    Чаты пользователя одним запросом: собеседник (только нужные колонки),
+    последнее сообщение и число непрочитанных, свежие чаты сверху
+    """
+    Match, Message, User = models.Match, models.Message, models.User
+    last_message = aliased(Message)
+
+    other_user_id = case((Match.user1_id == user_id, Match.user2_id), else_=Match.user1_id)
+    last_message_id = select(func.max(Message.id)).where(
+        Message.match_id == Match.id
+    ).correlate(Match).scalar_subquery()
+    unread = select(func.count(Message.id)).where(
+        Message.match_id == Match.id,
+        Message.sender_id != user_id,
+        Message.is_read == False
+    ).correlate(Match).scalar_subquery()
+
+    return db.query(
+        Match.id.label("match_id"),
+        Match.created_at,
+        User.id.label("user_id"),
+        User.username,
+        User.specialization,
+        User.experience,
+        User.avatar_url,
+        last_message.id.label("message_id"),
+        last_message.text,
+        last_message.sender_id,
+        last_message.created_at.label("message_created_at"),
+        last_message.is_read,
+        unread.label("unread")
+    ).join(
+        User, User.id == other_user_id
+    ).outerjoin(
+        last_message, last_message.id == last_message_id
+    ).filter(
+        or_(Match.user1_id == user_id, Match.user2_id == user_id)
+    ).order_by(
+        func.coalesce(last_message.created_at, Match.created_at).desc(),
+        Match.id.desc()
+    ).all()
+
+
+def get_messages_after(db: Session, match_id: int, after_id: int = 0, limit: int = 100):
+    """Сообщения матча после after_id (только колонки для API), по порядку"""
+    Message = models.Message
+    return db.query(
+        Message.id, Message.text, Message.sender_id, Message.created_at, Message.is_read
+    ).filter(
+        Message.match_id == match_id,
+        Message.id > after_id
+    ).order_by(Message.id).limit(limit).all()
+
+
 def get_match_by_users(db: Session, user1_id: int, user2_id: int = None, match_id: int = None):
     """Получить матч между двумя пользователями или по ID матча"""
     if match_id:
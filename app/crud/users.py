@@ -6,14 +6,17 @@ from passlib.context import CryptContext
 # Инициализируем контекст для хэширования паролей
 pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt", "django_pbkdf2_sha256"], deprecated="auto")
 
+
 def get_user_by_email(db: Session, email: str):
     """Получить пользователя по email"""
     return db.query(models.User).filter(models.User.email == email).first()
 
+
 def get_user_by_id(db: Session, user_id: int):
     """Получить пользователя по ID"""
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+
 def create_user(db: Session, user: schemas.UserCreate):
     """Создать нового пользователя"""
     hashed_password = pwd_context.hash(user.password, scheme="pbkdf2_sha256")
@@ -30,10 +33,12 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
+
 def verify_password(plain_password, hashed_password):
     """Проверить пароль"""
     return pwd_context.verify(plain_password, hashed_password)
 
+
 def update_user_profile(db: Session, user_id: int, update_data: dict):
     """Обновить профиль пользователя"""
     db_user = get_user_by_id(db, user_id)
@@ -42,4 +47,14 @@ def update_user_profile(db: Session, user_id: int, update_data: dict):
             setattr(db_user, key, value)
         db.commit()
         db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    return db_user
+
+
+def count_users_with_avatar(db: Session, avatar_url: str):
+    """Сколько пользователей ссылаются на файл аватарки"""
+    return db.query(models.User).filter(models.User.avatar_url == avatar_url).count()
+
+
+def get_avatar_urls(db: Session):
+    """Все используемые аватарки (для сборки мусора)"""
+    return {row[0] for row in db.query(models.User.avatar_url).distinct() if row[0]}
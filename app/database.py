@@ -1,16 +1,36 @@
+import os
+import sqlite3
 from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# Используем SQLite для разработки
-SQLALCHEMY_DATABASE_URL = "sqlite:///./itmatch.db"
+# База в памяти с общим кэшем: все соединения процесса видят одни и те же данные
+MEMORY_DATABASE_URL = "sqlite:///file:itmatch?mode=memory&cache=shared&uri=true"
+
+# Используем SQLite для разработки (можно переопределить, например для нагрузочных данных)
+SQLALCHEMY_DATABASE_URL = os.getenv("ITMATCH_DATABASE_URL", "sqlite:///./itmatch.db")
+
+# ITMATCH_DATABASE_URL=memory - быстрая база для тестов, живёт пока жив процесс
+if SQLALCHEMY_DATABASE_URL == "memory":
+    SQLALCHEMY_DATABASE_URL = MEMORY_DATABASE_URL
+
+IS_MEMORY_DATABASE = SQLALCHEMY_DATABASE_URL.startswith("sqlite") and "mode=memory" in SQLALCHEMY_DATABASE_URL
 
 # Создаём движок базы данных
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Только для SQLite
+    connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {},  # Только для SQLite
+    # Для памяти SQLAlchemy по умолчанию берёт SingletonThreadPool, а нам нужны соединения на каждый поток
+    **({"poolclass": QueuePool} if IS_MEMORY_DATABASE else {})
 )
 
+# База в памяти исчезает вместе с последним соединением - держим одно открытым
+_memory_keepalive = None
+if IS_MEMORY_DATABASE:
+    _args, _kwargs = engine.dialect.create_connect_args(engine.url)
+    _memory_keepalive = sqlite3.connect(*_args, **_kwargs)
+
 # Создаём фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -23,4 +43,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,105 @@
+"""
+Счётчики для фильтров ленты: сколько ещё не просмотренных анкет
+в каждой специализации и на каждом уровне
+
+Считаются одним GROUP BY (специализация, уровень) по тем же условиям,
+что и лента, и кэшируются на пользователя на ITMATCH_FACET_TTL секунд
+вместе с отпечатком списка пропущенных: другой список (вторая сессия того
+же пользователя) - пересчёт, а не чужие счётчики.
+Лайк, пропуск и сброс пропущенных сбрасывают кэш пользователя в этом
+воркере; в остальных счётчики обновятся по истечении TTL.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import exists, func, not_
+from sqlalchemy.orm import Session
+
+from .models import Like, User
+
+# Время жизни счётчиков пользователя (секунды)
+FACET_TTL = int(os.getenv("ITMATCH_FACET_TTL", "60"))
+
+# Сколько пользователей держать в кэше
+FACET_CACHE_SIZE = int(os.getenv("ITMATCH_FACET_CACHE_SIZE", "10000"))
+
+
+def compute_facets(db: Session, user_id: int, skipped_ids: Iterable[int] = ()) -> Dict[Tuple[str, str], int]:
+    """Число кандидатов ленты по парам (специализация, уровень) - один запрос"""
+    already_liked = exists().where(
+        Like.from_user_id == user_id,
+        Like.to_user_id == User.id
+    )
+    rows = db.query(User.specialization, User.experience, func.count()).filter(
+        User.id != user_id,
+        User.is_active == True,
+        not_(already_liked),
+        not_(User.id.in_(list(skipped_ids)))
+    ).group_by(User.specialization, User.experience).all()
+    return {(specialization, experience): count for specialization, experience, count in rows}
+
+
+def summarize(counts: Dict[Tuple[str, str], int], specialization: Optional[str] = None,
+              experience: Optional[str] = None) -> dict:
+    """
+    Счётчики для выпадающих списков
+
+    Счётчик специализации учитывает выбранный уровень и наоборот - сколько
+    анкет покажет лента, если выбрать этот пункт.
+    """
+    by_specialization = {}
+    by_experience = {}
+    for (spec, exp), count in counts.items():
+        if not experience or exp == experience:
+            by_specialization[spec] = by_specialization.get(spec, 0) + count
+        if not specialization or spec == specialization:
+            by_experience[exp] = by_experience.get(exp, 0) + count
+    return {
+        "specialization": by_specialization,
+        "experience": by_experience,
+        "all_specializations": sum(by_specialization.values()),
+        "all_experiences": sum(by_experience.values()),
+    }
+
+
+class FacetCache:
+    """LRU-кэш счётчиков по пользователям с коротким TTL"""
+
+    def __init__(self, ttl: int = FACET_TTL, max_items: int = FACET_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, user_id: int, skipped_ids: Iterable[int] = ()) -> Dict[Tuple[str, str], int]:
+        skipped_ids = list(skipped_ids)
+        skipped_key = hash(frozenset(skipped_ids))
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and item[1] == skipped_key and time.monotonic() - item[0] <= self.ttl:
+                self._items.move_to_end(user_id)
+                self.hits += 1
+                return item[2]
+
+        counts = compute_facets(db, user_id, skipped_ids)
+        with self._lock:
+            self.misses += 1
+            self._items[user_id] = (time.monotonic(), skipped_key, counts)
+            self._items.move_to_end(user_id)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return counts
+
+    def invalidate(self, user_id: int):
+        """Пользователь лайкнул или пропустил анкету - пересчитать при следующем показе"""
+        with self._lock:
+            self._items.pop(user_id, None)
+
+
+# Кэш счётчиков текущего воркера
+facet_cache = FacetCache()
@@ -0,0 +1,162 @@
+"""
+Сгенерированные аватарки для пользователей без загруженной картинки
+
+Инициалы на цветном фоне; цвет зависит от id пользователя и не меняется
+при смене имени. Каждая картинка рисуется один раз: готовый PNG хранится
+на диске и в ограниченном LRU-кэше в памяти, так что повторные запросы
+обходятся без PIL. ETag - хэш того, что нарисовано, поэтому браузер
+получает 304, пока имя пользователя не поменялось.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+from .avatars import AVATAR_SIZES, DEFAULT_AVATAR_URL
+
+# Без Pillow вместо сгенерированных аватарок отдаётся общая заглушка
+GENERATION_AVAILABLE = Image is not None
+
+GENERATED_DIR = os.getenv("ITMATCH_GENERATED_AVATAR_DIR", "./avatar_cache")
+GENERATED_URL = "/avatars/generated"
+
+# Сколько готовых PNG держать в памяти (примерно 1-10 КБ каждый)
+GENERATED_CACHE_SIZE = int(os.getenv("ITMATCH_GENERATED_AVATAR_CACHE", "2048"))
+
+# Браузер может перепроверить через день - имя пользователя могло смениться
+GENERATED_CACHE_CONTROL = "public, max-age=86400"
+
+PALETTE = (
+    "#007bff", "#6610f2", "#6f42c1", "#d63384", "#dc3545", "#fd7e14",
+    "#198754", "#20c997", "#0dcaf0", "#0d6efd", "#6c757d", "#343a40",
+)
+
+# Шрифты с кириллицей; если ни одного нет - встроенный шрифт Pillow
+FONT_CANDIDATES = (
+    "DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "arialbd.ttf",
+    "arial.ttf",
+)
+
+
+def initials(username: str) -> str:
+    """Одна-две буквы из имени: "ivan_petrov" -> "IP", "alice" -> "A" """
+    parts = [p for p in username.replace(".", " ").replace("_", " ").replace("-", " ").split() if p]
+    if not parts:
+        return "?"
+    letters = parts[0][0] + (parts[1][0] if len(parts) > 1 else "")
+    return letters.upper()
+
+
+def avatar_color(user_id: int) -> str:
+    return PALETTE[user_id % len(PALETTE)]
+
+
+def _load_font(size: int):
+    for name in FONT_CANDIDATES:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 не умеет масштабировать встроенный шрифт
+        return ImageFont.load_default()
+
+
+def render_generated_avatar(text: str, color: str, size: int) -> bytes:
+    """Нарисовать PNG с инициалами"""
+    img = Image.new("RGB", (size, size), color)
+    draw = ImageDraw.Draw(img)
+    font = _load_font(int(size * (0.42 if len(text) > 1 else 0.5)))
+    draw.text((size / 2, size / 2), text, fill="white", anchor="mm", font=font)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class GeneratedAvatarCache:
+    """Двухуровневый кэш готовых аватарок: LRU в памяти поверх файлов на диске"""
+
+    def __init__(self, directory: str = GENERATED_DIR, max_items: int = GENERATED_CACHE_SIZE):
+        self.directory = directory
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    @staticmethod
+    def digest(text: str, color: str, size: int) -> str:
+        return hashlib.sha1(f"{text}|{color}|{size}".encode()).hexdigest()[:20]
+
+    def get(self, text: str, color: str, size: int) -> tuple:
+        """(ETag, PNG) для картинки; рисует её только при первом обращении"""
+        digest = self.digest(text, color, size)
+
+        with self._lock:
+            content = self._items.get(digest)
+            if content is not None:
+                self._items.move_to_end(digest)
+                self.hits += 1
+                return f'"{digest}"', content
+
+        path = os.path.join(self.directory, f"{digest}.png")
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            self.disk_hits += 1
+        except FileNotFoundError:
+            content = render_generated_avatar(text, color, size)
+            self.renders += 1
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._items[digest] = content
+            self._items.move_to_end(digest)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+        return f'"{digest}"', content
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+generated_avatars = GeneratedAvatarCache()
+
+
+def generated_avatar(user_id: int, username: str, size: int) -> tuple:
+    """(ETag, PNG) сгенерированной аватарки пользователя"""
+    return generated_avatars.get(initials(username), avatar_color(user_id), size)
+
+
+# --- Помощники для шаблонов ---
+
+def generated_avatar_src(user_id: int, display_size: int) -> str:
+    """URL наименьшей картинки, которая не меньше display_size"""
+    if not GENERATION_AVAILABLE:
+        return DEFAULT_AVATAR_URL
+    size = next((s for s in AVATAR_SIZES if s >= display_size), max(AVATAR_SIZES))
+    return f"{GENERATED_URL}/{user_id}/{size}.png"
+
+
+def generated_avatar_srcset(user_id: int) -> str:
+    if not GENERATION_AVAILABLE:
+        return ""
+    return ", ".join(f"{GENERATED_URL}/{user_id}/{size}.png {size}w" for size in AVATAR_SIZES)
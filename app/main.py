@@ -1,18 +1,28 @@
 # app/main.py - ПОЛНАЯ ВЕРСИЯ с debug роутами
 from fastapi import FastAPI, Request, Depends
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 from sqlalchemy.orm import Session
-from .database import engine, Base, get_db
-from .routers import auth, profiles, feed, messages
+from .database import engine, get_db
+from .routers import auth, profiles, feed, messages, api
 from .admin import setup_admin
+from .profiling import profile_requests
+from .rollups import rollup_scheduler, ROLLUP_INTERVAL
+from .search import ensure_search_index
+from .snapshots import restore_snapshot
+from .migrations import check_migrations
+from .templating import templates
+from .avatars import shutdown_avatar_pool, AvatarFiles
+from .storage import storage, LocalStorage
+from .identicons import GENERATION_AVAILABLE, render_generated_avatar
+from .candidate_index import candidate_index
 import os
 from pathlib import Path
 import io
+import asyncio
 import logging
 
 # Настройка логирования
@@ -21,13 +31,17 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-# Создаём таблицы в БД
-Base.metadata.create_all(bind=engine)
+# Для тестов и бенчмарков: стартуем с сохранённого снимка (например, в базе в памяти)
+if os.getenv("ITMATCH_SNAPSHOT"):
+    restore_snapshot(engine, os.getenv("ITMATCH_SNAPSHOT"))
 
-app = FastAPI(title="ITmatch", version="1.0.0")
+# Проверяем, что схема БД актуальна (миграции применяет migrate.py)
+check_migrations(engine)
+
+# Полнотекстовый поиск в админке, если индексы уже построены
+ensure_search_index(engine)
 
-# Подключаем шаблоны
-templates = Jinja2Templates(directory="app/templates")
+app = FastAPI(title="ITmatch", version="1.0.0")
 
 from fastapi import Request
 import time
@@ -58,6 +72,10 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+# Профилирование запросов по флагу ?_profile=1 (только для админ-сессии)
+app.middleware("http")(profile_requests)
+
+
 async def sync_session_with_cookies(request: Request, call_next):
     """Синхронизирует сессию с cookies"""
     # Копируем user_id из cookies в сессию, если его там нет
@@ -98,32 +116,22 @@ def create_default_avatar_if_needed():
     default_avatar_path = Path("app/static/default_avatar.png")
 
     if not default_avatar_path.exists():
-        # Создаём простую аватарку
-        try:
-            from PIL import Image, ImageDraw
-            img = Image.new('RGB', (150, 150), color='#007bff')
-            d = ImageDraw.Draw(img)
-
-            # Рисуем инициалы или символ
-            try:
-                from PIL import ImageFont
-                font = ImageFont.truetype("arial.ttf", 60)
-                d.text((75, 75), "?", fill='white', anchor='mm', font=font)
-            except:
-                d.text((75, 75), "?", fill='white', anchor='mm')
-
-            img.save(default_avatar_path)
+        if GENERATION_AVAILABLE:
+            default_avatar_path.write_bytes(render_generated_avatar("?", "#007bff", 150))
             print(f"✅ Создана дефолтная аватарка: {default_avatar_path}")
-        except ImportError:
-            # Если PIL не установлен, создадим позже через эндпоинт
-            print("⚠️  PIL не установлен. Дефолтная аватарка будет создана при первом запросе.")
-            # Можно установить: pip install pillow
+        else:
+            print("⚠️  PIL не установлен, дефолтная аватарка не создана (pip install pillow)")
 
 
 # Создаём дефолтную аватарку при запуске
 create_default_avatar_if_needed()
 
 # Подключаем статические файлы
+# Аватарки раньше общей статики: у них свои заголовки кэширования.
+# Из S3 файлы раздаются напрямую, приложение их не проксирует
+if isinstance(storage, LocalStorage):
+    os.makedirs(storage.directory, exist_ok=True)
+    app.mount(storage.base_url, AvatarFiles(directory=storage.directory), name="uploads")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 # ДЕБАГ РОУТЫ - ДОБАВЬТЕ ЭТО ПЕРЕД КОРНЕВЫМ РОУТОМ
@@ -176,10 +184,30 @@ app.include_router(auth.router, tags=["auth"])
 app.include_router(profiles.router, tags=["profiles"])
 app.include_router(feed.router, tags=["feed"])
 app.include_router(messages.router, tags=["messages"])
+app.include_router(api.router, tags=["api"])
 
 # Настраиваем админ-панель
 admin = setup_admin(app)
 
+
+@app.on_event("startup")
+async def start_rollup_scheduler():
+    """Запускает фоновое обновление дневных агрегатов для аналитики"""
+    if ROLLUP_INTERVAL > 0:
+        asyncio.create_task(rollup_scheduler(ROLLUP_INTERVAL))
+
+
+@app.on_event("startup")
+async def build_candidate_index():
+    """Строит битовые маски кандидатов для ленты"""
+    candidate_index.rebuild()
+
+
+@app.on_event("shutdown")
+async def stop_avatar_pool():
+    """Останавливает процессы обработки аватарок"""
+    shutdown_avatar_pool()
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Главная страница"""
@@ -204,31 +232,6 @@ async def root(request: Request):
         db.close()
 
 
-@app.get("/static/default_avatar.png")
-async def get_default_avatar():
-    """Генерирует дефолтную аватарку если её нет"""
-    from fastapi.responses import Response
-    import io
-
-    # Создаём простую аватарку
-    try:
-        from PIL import Image, ImageDraw
-
-        img = Image.new('RGB', (150, 150), color='#007bff')
-        d = ImageDraw.Draw(img)
-        d.text((75, 75), "?", fill='white', anchor='mm')
-
-        # Конвертируем в bytes
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-
-        return Response(content=img_byte_arr.getvalue(), media_type="image/png")
-    except:
-        # Возвращаем пустое изображение
-        return Response(content=b"", media_type="image/png")
-
-
 @app.get("/static/admin-logo.png")
 async def get_admin_logo():
     """Логотип для админ-панели"""
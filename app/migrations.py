@@ -0,0 +1,374 @@
+"""
+Версионные миграции схемы базы данных
+
+Каждая миграция - функция с номером версии. Применённые версии
+записываются в schema_migrations вместе со временем выполнения.
+Индексы на больших таблицах строятся без блокировки записи:
+в PostgreSQL - CREATE INDEX CONCURRENTLY вне транзакции.
+
+При старте приложение только проверяет, что все миграции применены;
+применяет их `python migrate.py`.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+    inspect, select, text
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import func
+
+from .database import IS_MEMORY_DATABASE
+from . import models
+from .search import SEARCH_INDEXES, create_sqlite_search_index, postgres_search_index
+
+logger = logging.getLogger(__name__)
+
+# Применять недостающие миграции при старте приложения (для разработки и тестов)
+AUTO_MIGRATE = os.getenv("ITMATCH_AUTO_MIGRATE", "0") == "1"
+
+# Ключ advisory-блокировки PostgreSQL, чтобы миграции не запускались параллельно
+MIGRATION_LOCK_ID = 4815162342
+
+migrations_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migrations_metadata,
+    Column("version", String, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+    Column("duration_ms", Integer, nullable=False),
+)
+
+
+@dataclass
+class Migration:
+    version: str
+    name: str
+    # Транзакционная миграция получает соединение и выполняется в одной транзакции
+    # с записью о версии. Нетранзакционная (CONCURRENTLY) получает engine и должна
+    # быть идемпотентной: при сбое её можно просто запустить ещё раз.
+    upgrade: Callable
+    transactional: bool = True
+
+
+MIGRATIONS = []
+
+
+class PendingMigrationsError(RuntimeError):
+    pass
+
+
+def migration(version: str, name: str, transactional: bool = True):
+    """Зарегистрировать функцию как миграцию"""
+    def decorator(upgrade):
+        MIGRATIONS.append(Migration(version, name, upgrade, transactional))
+        return upgrade
+    return decorator
+
+
+def create_index_online(engine: Engine, name: str, table: str, definition: str, unique: bool = False):
+    """
+    Создать индекс, не блокируя запись в таблицу
+
+    definition - список колонок "(a, b)" или "USING gin (...)" / "gin (...)".
+    PostgreSQL: CREATE INDEX CONCURRENTLY; недостроенный (INVALID) индекс
+    после прерванной попытки сначала удаляется. SQLite строит индекс
+    обычным образом - конкурентной записи там всё равно нет.
+    """
+    unique_sql = "UNIQUE " if unique else ""
+
+    if engine.dialect.name == "postgresql":
+        if not definition.startswith("(") and not definition.upper().startswith("USING"):
+            definition = f"USING {definition}"
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": name}).first()
+            if invalid:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(text(
+                f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"
+            ))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} {definition}"))
+
+
+# --- Схема на момент миграций ---
+# Таблицы описаны здесь такими, какими их создаёт миграция, а не берутся
+# из models.py: модели меняются, а применённая миграция - нет. Новые
+# колонки и индексы добавляют следующие миграции.
+
+frozen_metadata = MetaData()
+
+users_0001 = Table(
+    "users",
+    frozen_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("username", String, nullable=False),
+    Column("hashed_password", String, nullable=False),
+    Column("specialization", String, nullable=False),
+    Column("experience", String, nullable=False),
+    Column("bio", Text),
+    Column("avatar_url", String),
+    Column("is_active", Boolean),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("is_admin", Boolean),
+)
+
+likes_0001 = Table(
+    "likes",
+    frozen_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("from_user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("to_user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+matches_0001 = Table(
+    "matches",
+    frozen_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user1_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("user2_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+messages_0001 = Table(
+    "messages",
+    frozen_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("match_id", Integer, ForeignKey("matches.id"), nullable=False),
+    Column("sender_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("text", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("is_read", Boolean),
+)
+
+daily_stats_0004 = Table(
+    "daily_stats",
+    frozen_metadata,
+    Column("day", Date, primary_key=True),
+    Column("new_users", Integer, nullable=False),
+    Column("likes", Integer, nullable=False),
+    Column("matches", Integer, nullable=False),
+    Column("messages", Integer, nullable=False),
+    Column("active_senders", Integer, nullable=False),
+    Column("updated_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+daily_conversion_0004 = Table(
+    "daily_conversion",
+    frozen_metadata,
+    Column("day", Date, primary_key=True),
+    Column("specialization", String, primary_key=True),
+    Column("experience", String, primary_key=True),
+    Column("likes", Integer, nullable=False),
+    Column("matches", Integer, nullable=False),
+)
+
+recommendations_0006 = Table(
+    "recommendations",
+    frozen_metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("rank", Integer, primary_key=True),
+    Column("candidate_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("score", Float, nullable=False),
+)
+
+
+# --- Миграции ---
+# Первые миграции идемпотентны: базы, созданные раньше через create_all
+# и разовые скрипты, просто получают записи о применённых версиях.
+
+@migration("0001", "initial_schema")
+def initial_schema(conn):
+    frozen_metadata.create_all(bind=conn, checkfirst=True, tables=[
+        users_0001, likes_0001, matches_0001, messages_0001,
+    ])
+
+
+@migration("0002", "skipped_users")
+def skipped_users(conn):
+    # Бывший add_skipped_table.py
+    id_column = "SERIAL PRIMARY KEY" if conn.dialect.name == "postgresql" else "INTEGER PRIMARY KEY AUTOINCREMENT"
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS skipped_users (
+            id {id_column},
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            skipped_user_id INTEGER NOT NULL REFERENCES users (id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_skipped_users ON skipped_users (user_id, skipped_user_id)"
+    ))
+
+
+@migration("0003", "created_at_indexes", transactional=False)
+def created_at_indexes(engine):
+    for table in ("users", "likes", "matches", "messages"):
+        create_index_online(engine, f"ix_{table}_created_at", table, "(created_at)")
+
+
+@migration("0004", "daily_rollups")
+def daily_rollups(conn):
+    frozen_metadata.create_all(bind=conn, checkfirst=True, tables=[
+        daily_stats_0004, daily_conversion_0004,
+    ])
+
+
+@migration("0005", "full_text_search", transactional=False)
+def full_text_search(engine):
+    if engine.dialect.name == "sqlite":
+        create_sqlite_search_index(engine)
+    elif engine.dialect.name == "postgresql":
+        for table in SEARCH_INDEXES:
+            name, definition = postgres_search_index(table)
+            create_index_online(engine, name, table, definition)
+
+
+@migration("0006", "recommendations")
+def recommendations(conn):
+    frozen_metadata.create_all(bind=conn, checkfirst=True, tables=[recommendations_0006])
+
+
+@migration("0007", "likes_reciprocity_index", transactional=False)
+def likes_reciprocity_index(engine):
+    # Входящие лайки: кто лайкнул пользователя (лента reciprocal, профиль)
+    create_index_online(engine, "ix_likes_to_from", "likes", "(to_user_id, from_user_id)")
+
+
+@migration("0008", "users_shuffle_key", transactional=False)
+def users_shuffle_key(engine):
+    # Случайный ключ анкеты для ленты вперемешку; колонка могла остаться
+    # от прерванного прогона - тогда только дозаполняем
+    columns = {column["name"] for column in inspect(engine).get_columns("users")}
+    if "shuffle_key" not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE users ADD COLUMN shuffle_key INTEGER"))
+
+    if engine.dialect.name == "postgresql":
+        random_key = f"floor(random() * {models.SHUFFLE_KEY_RANGE})::integer"
+    else:
+        random_key = f"abs(random()) % {models.SHUFFLE_KEY_RANGE}"
+    # Пачками, чтобы не блокировать таблицу на всё заполнение
+    while True:
+        with engine.begin() as conn:
+            updated = conn.execute(text(
+                f"UPDATE users SET shuffle_key = {random_key} "
+                f"WHERE id IN (SELECT id FROM users WHERE shuffle_key IS NULL LIMIT 10000)"
+            )).rowcount
+        if not updated:
+            break
+
+    create_index_online(engine, "ix_users_shuffle_key", "users", "(shuffle_key)")
+
+
+# --- Применение ---
+
+def _ensure_migrations_table(engine: Engine):
+    migrations_metadata.create_all(bind=engine, checkfirst=True)
+
+
+def applied_versions(engine: Engine) -> dict:
+    """Версия -> запись о применении; пустой словарь для новой базы"""
+    if not inspect(engine).has_table("schema_migrations"):
+        return {}
+    with engine.connect() as conn:
+        rows = conn.execute(select(schema_migrations).order_by(schema_migrations.c.version)).mappings().all()
+    return {row["version"]: dict(row) for row in rows}
+
+
+def pending_migrations(engine: Engine) -> list:
+    applied = applied_versions(engine)
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def _record(conn, item: Migration, duration_ms: int):
+    conn.execute(schema_migrations.insert().values(
+        version=item.version, name=item.name, duration_ms=duration_ms
+    ))
+
+
+def _apply(engine: Engine, item: Migration) -> int:
+    started = time.perf_counter()
+
+    if item.transactional:
+        with engine.begin() as conn:
+            item.upgrade(conn)
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            _record(conn, item, duration_ms)
+    else:
+        item.upgrade(engine)
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        with engine.begin() as conn:
+            _record(conn, item, duration_ms)
+
+    return duration_ms
+
+
+def migrate(engine: Engine, target: Optional[str] = None, progress=None) -> list:
+    """
+    Применить недостающие миграции до версии target включительно (по умолчанию - все)
+
+    progress(migration, duration_ms) вызывается после каждой миграции.
+    Возвращает список (migration, duration_ms).
+    """
+    _ensure_migrations_table(engine)
+
+    lock = None
+    if engine.dialect.name == "postgresql":
+        lock = engine.connect()
+        lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+    try:
+        done = []
+        for item in pending_migrations(engine):
+            if target is not None and item.version > target:
+                break
+            logger.info(f"🔄 Миграция {item.version}_{item.name}...")
+            duration_ms = _apply(engine, item)
+            logger.info(f"✅ Миграция {item.version}_{item.name} применена за {duration_ms} мс")
+            done.append((item, duration_ms))
+            if progress:
+                progress(item, duration_ms)
+        return done
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            lock.close()
+
+
+def check_migrations(engine: Engine) -> list:
+    """
+    Проверка при старте приложения вместо create_all
+
+    Пустую базу (или тестовую базу в памяти) сразу доводим до актуальной
+    схемы - это быстро и ничего не блокирует. С существующей базой без
+    миграций приложение не стартует (иначе запросы падали бы с 500 на
+    недостающих колонках): долгие миграции на больших таблицах запускаются
+    отдельно через migrate.py, либо при ITMATCH_AUTO_MIGRATE=1.
+    """
+    pending = pending_migrations(engine)
+    if not pending:
+        return []
+
+    is_empty = not inspect(engine).get_table_names()
+    if is_empty or IS_MEMORY_DATABASE or AUTO_MIGRATE:
+        migrate(engine)
+        return []
+
+    names = ", ".join(f"{m.version}_{m.name}" for m in pending)
+    raise PendingMigrationsError(
+        f"Не применены миграции: {names}. Запустите: python migrate.py "
+        f"(или ITMATCH_AUTO_MIGRATE=1)"
+    )
@@ -1,8 +1,16 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Float, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from .database import Base
 from sqlalchemy import and_, or_
+import random
+
+# Ключи для ленты вперемешку: случайное число из [0, SHUFFLE_KEY_RANGE)
+SHUFFLE_KEY_RANGE = 2 ** 31
+
+
+def random_shuffle_key() -> int:
+    return random.randrange(SHUFFLE_KEY_RANGE)
 
 
 class User(Base):
@@ -17,8 +25,10 @@ class User(Base):
     bio = Column(Text)
     avatar_url = Column(String, default="default_avatar.png")
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     is_admin = Column(Boolean, default=False)
+    # Постоянное место анкеты в ленте вперемешку (mode=shuffle)
+    shuffle_key = Column(Integer, default=random_shuffle_key, index=True)
 
     # Связи с другими таблицами
     sent_likes = relationship("Like", foreign_keys="Like.from_user_id", back_populates="from_user")
@@ -33,12 +43,17 @@ class Like(Base):
     id = Column(Integer, primary_key=True, index=True)
     from_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     to_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     # Связи
     from_user = relationship("User", foreign_keys=[from_user_id], back_populates="sent_likes")
     to_user = relationship("User", foreign_keys=[to_user_id], back_populates="received_likes")
 
+    # Кто лайкнул пользователя (входящие лайки); в старых базах - миграция 0007
+    __table_args__ = (
+        Index("ix_likes_to_from", "to_user_id", "from_user_id"),
+    )
+
 
 class Match(Base):
     __tablename__ = "matches"
@@ -46,7 +61,7 @@ class Match(Base):
     id = Column(Integer, primary_key=True, index=True)
     user1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user2_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     # Связи
     user1 = relationship("User", foreign_keys=[user1_id], back_populates="matches1")
@@ -61,9 +76,43 @@ class Message(Base):
     match_id = Column(Integer, ForeignKey("matches.id"), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     text = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     is_read = Column(Boolean, default=False)
 
     # Связи
     match = relationship("Match", back_populates="messages")
-    sender = relationship("User")
\ No newline at end of file
+    sender = relationship("User")
+
+
+class DailyStats(Base):
+    """Дневные агрегаты для аналитики в админке"""
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    new_users = Column(Integer, nullable=False, default=0)
+    likes = Column(Integer, nullable=False, default=0)
+    matches = Column(Integer, nullable=False, default=0)
+    messages = Column(Integer, nullable=False, default=0)
+    active_senders = Column(Integer, nullable=False, default=0)  # Сколько пользователей писали сообщения
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DailyConversion(Base):
+    """Дневная конверсия лайк -> матч по специализации и опыту получателя лайка"""
+    __tablename__ = "daily_conversion"
+
+    day = Column(Date, primary_key=True)
+    specialization = Column(String, primary_key=True)
+    experience = Column(String, primary_key=True)
+    likes = Column(Integer, nullable=False, default=0)  # Лайки, полученные пользователями сегмента
+    matches = Column(Integer, nullable=False, default=0)  # Матчи с участием пользователей сегмента
+
+
+class Recommendation(Base):
+    """Предрасчитанные кандидаты для ленты (см. app/recommender.py)"""
+    __tablename__ = "recommendations"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 - самый подходящий
+    candidate_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    score = Column(Float, nullable=False)
@@ -0,0 +1,202 @@
+"""
+Сэмплирующий профилировщик запросов для админ-панели
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+# Параметр запроса, включающий профилирование (только для админ-сессии):
+#   ?_profile=1          - профиль сохраняется в журнал, id в заголовке X-Profile-Id
+#   ?_profile=collapsed  - вместо страницы возвращается сам профиль
+PROFILE_QUERY_PARAM = "_profile"
+
+# Интервал между снимками стека (секунды)
+SAMPLE_INTERVAL = float(os.getenv("ITMATCH_PROFILE_INTERVAL", "0.005"))
+
+# Сколько последних запросов держим в кольцевом буфере
+RECENT_REQUESTS_LIMIT = int(os.getenv("ITMATCH_PROFILE_RECENT", "1000"))
+
+# Сколько самых медленных запросов показываем в админке
+SLOWEST_REQUESTS_LIMIT = int(os.getenv("ITMATCH_PROFILE_SLOWEST", "20"))
+
+# Потоки пула, в которых Starlette выполняет синхронные (def) обработчики
+# и run_in_threadpool
+WORKER_THREAD_NAME = "AnyIO worker thread"
+
+# Модули, в которых простаивает свободный поток пула
+_IDLE_MODULES = ("threading.py", "queue.py", "_asyncio.py")
+
+
+class SamplingProfiler:
+    """
+    Периодически снимает стек указанного потока и накапливает свёрнутые стеки
+
+    Кроме него сэмплируются занятые потоки пула (синхронные обработчики,
+    run_in_threadpool) - их стеки начинаются с "[threadpool]". Ограничение:
+    пул общий на воркер, поэтому в профиль попадает и работа параллельных
+    запросов, выполнявшаяся в пуле в это время.
+    """
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="itmatch-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            frame = frames.get(self.thread_id)
+            if frame is not None:
+                self.samples[";".join(self._stack(frame))] += 1
+
+            for thread in threading.enumerate():
+                if thread.name != WORKER_THREAD_NAME or thread.ident not in frames:
+                    continue
+                if self._is_idle(frames[thread.ident]):
+                    # Поток пула ждёт задачу - в профиле он не нужен
+                    continue
+                self.samples[";".join(["[threadpool]"] + self._stack(frames[thread.ident]))] += 1
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        while frame is not None:
+            if os.path.basename(frame.f_code.co_filename) not in _IDLE_MODULES:
+                return False
+            frame = frame.f_back
+        return True
+
+    @staticmethod
+    def _stack(frame) -> list:
+        """Стек от корня к текущей функции: "функция (файл:строка)" """
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    @property
+    def total_samples(self) -> int:
+        return sum(self.samples.values())
+
+    def collapsed(self) -> str:
+        """Профиль в формате свёрнутых стеков (flamegraph.pl, speedscope)"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class RequestRecord:
+    """Информация об одном обработанном запросе"""
+
+    __slots__ = ("id", "method", "path", "status_code", "duration", "started_at", "profiler")
+
+    def __init__(self, record_id, method, path, status_code, duration, started_at, profiler=None):
+        self.id = record_id
+        self.method = method
+        self.path = path
+        self.status_code = status_code
+        self.duration = duration
+        self.started_at = started_at
+        self.profiler = profiler
+
+
+class RequestLog:
+    """Кольцевой буфер последних запросов и их профилей"""
+
+    def __init__(self, recent_limit: int = RECENT_REQUESTS_LIMIT, slowest_limit: int = SLOWEST_REQUESTS_LIMIT):
+        self.slowest_limit = slowest_limit
+        self._recent = deque(maxlen=recent_limit)
+        # Профили храним отдельно, чтобы их не вытесняли обычные быстрые запросы
+        self._profiled = deque(maxlen=slowest_limit)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def record(self, method, path, status_code, duration, started_at, profiler=None) -> RequestRecord:
+        with self._lock:
+            record = RequestRecord(
+                next(self._ids), method, path, status_code, duration, started_at, profiler
+            )
+            self._recent.append(record)
+            if profiler is not None:
+                self._profiled.append(record)
+        return record
+
+    def slowest(self, limit: int = None):
+        """Самые медленные запросы из буфера, по убыванию времени"""
+        with self._lock:
+            records = list(self._recent)
+        records.sort(key=lambda r: r.duration, reverse=True)
+        return records[:limit or self.slowest_limit]
+
+    def profiled(self):
+        """Запросы с профилями, по убыванию времени"""
+        with self._lock:
+            records = list(self._profiled)
+        records.sort(key=lambda r: r.duration, reverse=True)
+        return records
+
+    def get(self, record_id: int):
+        with self._lock:
+            for record in self._profiled:
+                if record.id == record_id:
+                    return record
+        return None
+
+
+# Журнал запросов текущего воркера
+request_log = RequestLog()
+
+
+async def profile_requests(request: Request, call_next):
+    """Замеряет время запросов и профилирует их по флагу администратора"""
+    profile_mode = request.query_params.get(PROFILE_QUERY_PARAM)
+    profiler = None
+    if profile_mode and request.session.get("admin", False):
+        # async-обработчики выполняются в потоке event loop, синхронные - в пуле;
+        # сэмплируем оба
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+
+    started_at = datetime.now()
+    start_time = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    duration = time.perf_counter() - start_time
+
+    record = request_log.record(
+        request.method, request.url.path, response.status_code, duration, started_at, profiler
+    )
+
+    if profiler is None:
+        return response
+
+    if profile_mode == "collapsed":
+        return PlainTextResponse(
+            profiler.collapsed(),
+            headers={
+                "X-Profile-Id": str(record.id),
+                "Content-Disposition": f"attachment; filename=profile-{record.id}.folded"
+            }
+        )
+
+    response.headers["X-Profile-Id"] = str(record.id)
+    return response
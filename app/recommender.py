@@ -0,0 +1,173 @@
+"""
+Рекомендации для ленты по графу лайков (item-item collaborative filtering)
+
+Матрица A: строки - кто лайкал, столбцы - кого лайкали. Две анкеты похожи,
+если их лайкали одни и те же люди: похожесть - косинус между столбцами A,
+S = Aᵀ·A с нормировкой. У каждой анкеты оставляем NEIGHBORS ближайших
+соседей. Оценка кандидата для пользователя - сумма похожестей на всех,
+кого он уже лайкнул: строка A·S. Лучшие TOP_K кандидатов сохраняются
+в таблицу recommendations, лента берёт их оттуда.
+
+Расчёт офлайн (python recommend.py, по cron); нужны numpy и scipy.
+Пока рекомендаций у пользователя нет, лента работает как раньше.
+"""
+import logging
+import os
+import time
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.engine import Engine
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+
+from .models import Like, User, Recommendation
+
+logger = logging.getLogger(__name__)
+
+# Сколько кандидатов хранить на пользователя
+TOP_K = int(os.getenv("ITMATCH_RECOMMENDATIONS_TOP_K", "50"))
+
+# Сколько похожих анкет оставлять у каждой анкеты
+NEIGHBORS = int(os.getenv("ITMATCH_RECOMMENDATIONS_NEIGHBORS", "50"))
+
+# Сколько пользователей считать за один проход (память ~ BLOCK_SIZE * NEIGHBORS * лайков)
+BLOCK_SIZE = 2000
+
+INSERT_BATCH = 10000
+
+
+class RecommenderUnavailable(RuntimeError):
+    pass
+
+
+def _load(engine: Engine):
+    """Лайки и флаги активности в виде массивов; индекс - id пользователя"""
+    with engine.connect() as conn:
+        likes = conn.execute(select(Like.from_user_id, Like.to_user_id)).all()
+        users = conn.execute(select(User.id, User.is_active)).all()
+
+    size = max((user_id for user_id, _ in users), default=0) + 1
+    active = np.zeros(size, dtype=bool)
+    for user_id, is_active in users:
+        active[user_id] = bool(is_active)
+
+    # np.array по строкам результата в разы медленнее fromiter по колонкам
+    from_ids = np.fromiter((row[0] for row in likes), dtype=np.int64, count=len(likes))
+    to_ids = np.fromiter((row[1] for row in likes), dtype=np.int64, count=len(likes))
+    return from_ids, to_ids, active
+
+
+def _likes_matrix(from_ids, to_ids, size: int):
+    likes = sparse.csr_matrix(
+        (np.ones(len(from_ids), dtype=np.float32), (from_ids, to_ids)), shape=(size, size)
+    )
+    # Повторный лайк не должен весить вдвое
+    likes.sum_duplicates()
+    likes.data[:] = 1
+    return likes
+
+
+def _similarity(likes, neighbors: int):
+    """Косинусная похожесть анкет, у каждой - только neighbors ближайших"""
+    likers = np.asarray(likes.sum(axis=0)).ravel()
+    inv_norm = np.zeros_like(likers, dtype=np.float32)
+    inv_norm[likers > 0] = 1 / np.sqrt(likers[likers > 0])
+
+    normalized = likes @ sparse.diags(inv_norm)
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    # Обрезаем строки до neighbors наибольших значений
+    indptr, indices, data = similarity.indptr, similarity.indices, similarity.data
+    counts = np.diff(indptr)
+    keep = np.ones(len(data), dtype=bool)
+    for row in np.flatnonzero(counts > neighbors):
+        start, end = indptr[row], indptr[row + 1]
+        weakest = np.argpartition(data[start:end], -neighbors)[:-neighbors]
+        keep[start + weakest] = False
+
+    rows = np.repeat(np.arange(similarity.shape[0]), counts)[keep]
+    return sparse.csr_matrix((data[keep], (rows, indices[keep])), shape=similarity.shape)
+
+
+def compute_recommendations(from_ids, to_ids, active, top_k: int = TOP_K, neighbors: int = NEIGHBORS):
+    """
+    Лучшие кандидаты для каждого активного пользователя с лайками
+
+    Генератор (user_id, candidate_ids, scores); кандидаты - по убыванию
+    оценки, без самого пользователя, уже лайкнутых и неактивных.
+    """
+    size = len(active)
+    likes = _likes_matrix(from_ids, to_ids, size)
+    similarity = _similarity(likes, neighbors)
+
+    users = np.flatnonzero(active & (np.diff(likes.indptr) > 0))
+    for block_start in range(0, len(users), BLOCK_SIZE):
+        block = users[block_start:block_start + BLOCK_SIZE]
+        scores = (likes[block] @ similarity).tocsr()
+
+        for i, user_id in enumerate(block):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            candidates = scores.indices[start:end]
+            values = scores.data[start:end]
+
+            liked = likes.indices[likes.indptr[user_id]:likes.indptr[user_id + 1]]
+            mask = active[candidates] & (candidates != user_id) & ~np.isin(candidates, liked, assume_unique=True)
+            candidates, values = candidates[mask], values[mask]
+            if not len(candidates):
+                continue
+
+            if len(candidates) > top_k:
+                best = np.argpartition(values, -top_k)[-top_k:]
+                candidates, values = candidates[best], values[best]
+            # По убыванию оценки, при равенстве - по id
+            order = np.lexsort((candidates, -values))
+            yield int(user_id), candidates[order], values[order]
+
+
+def rebuild_recommendations(engine: Engine, top_k: int = TOP_K, neighbors: int = NEIGHBORS) -> dict:
+    """
+    Пересчитать таблицу recommendations целиком
+
+    Старые строки заменяются в одной транзакции: лента видит либо
+    прежние рекомендации, либо новые. Возвращает статистику расчёта.
+    """
+    if np is None:
+        raise RecommenderUnavailable("Для рекомендаций нужны numpy и scipy: pip install numpy scipy")
+
+    started = time.perf_counter()
+    from_ids, to_ids, active = _load(engine)
+    loaded = time.perf_counter()
+
+    # Считаем до начала транзакции, чтобы не держать блокировку записи
+    results = list(compute_recommendations(from_ids, to_ids, active, top_k, neighbors))
+    computed = time.perf_counter()
+
+    stats = {"likes": len(from_ids), "users": len(results), "rows": 0}
+    with engine.begin() as conn:
+        conn.execute(delete(Recommendation))
+
+        batch = []
+        for user_id, candidates, scores in results:
+            batch.extend(
+                {"user_id": user_id, "rank": rank, "candidate_id": int(candidate), "score": float(score)}
+                for rank, (candidate, score) in enumerate(zip(candidates, scores))
+            )
+            if len(batch) >= INSERT_BATCH:
+                conn.execute(insert(Recommendation), batch)
+                stats["rows"] += len(batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Recommendation), batch)
+            stats["rows"] += len(batch)
+
+    stats["load_seconds"] = loaded - started
+    stats["compute_seconds"] = computed - loaded
+    stats["total_seconds"] = time.perf_counter() - started
+    logger.info(f"✅ Рекомендации пересчитаны: {stats}")
+    return stats
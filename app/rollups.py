@@ -0,0 +1,150 @@
+"""
+Инкрементальные дневные агрегаты (rollup) для аналитики в админ-панели
+"""
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, distinct, union_all, select
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import User, Like, Match, Message, DailyStats, DailyConversion
+
+logger = logging.getLogger(__name__)
+
+# Как часто фоновая задача пересчитывает агрегаты (секунды, 0 - отключить)
+ROLLUP_INTERVAL = int(os.getenv("ITMATCH_ROLLUP_INTERVAL", "3600"))
+
+
+def _day_range(day: date):
+    """Границы суток [начало, конец) в UTC, как их пишет server_default"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def rollup_day(db: Session, day: date) -> DailyStats:
+    """Пересчитать агрегаты за одни сутки (идемпотентно)"""
+    start, end = _day_range(day)
+
+    new_users = db.query(func.count(User.id)).filter(
+        User.created_at >= start, User.created_at < end
+    ).scalar() or 0
+
+    likes = db.query(func.count(Like.id)).filter(
+        Like.created_at >= start, Like.created_at < end
+    ).scalar() or 0
+
+    matches = db.query(func.count(Match.id)).filter(
+        Match.created_at >= start, Match.created_at < end
+    ).scalar() or 0
+
+    messages, active_senders = db.query(
+        func.count(Message.id),
+        func.count(distinct(Message.sender_id))
+    ).filter(
+        Message.created_at >= start, Message.created_at < end
+    ).one()
+
+    stats = db.merge(DailyStats(
+        day=day,
+        new_users=new_users,
+        likes=likes,
+        matches=matches,
+        messages=messages or 0,
+        active_senders=active_senders or 0
+    ))
+
+    # Конверсия по сегментам: лайки по получателю, матчи по обоим участникам
+    segment_likes = db.query(
+        User.specialization,
+        User.experience,
+        func.count(Like.id)
+    ).join(User, User.id == Like.to_user_id).filter(
+        Like.created_at >= start, Like.created_at < end
+    ).group_by(User.specialization, User.experience).all()
+
+    participants = union_all(
+        select(Match.user1_id.label("user_id")).where(Match.created_at >= start, Match.created_at < end),
+        select(Match.user2_id.label("user_id")).where(Match.created_at >= start, Match.created_at < end)
+    ).subquery()
+
+    segment_matches = db.query(
+        User.specialization,
+        User.experience,
+        func.count()
+    ).join(participants, participants.c.user_id == User.id).group_by(
+        User.specialization, User.experience
+    ).all()
+
+    segments = {}
+    for specialization, experience, count in segment_likes:
+        segments.setdefault((specialization, experience), [0, 0])[0] = count
+    for specialization, experience, count in segment_matches:
+        segments.setdefault((specialization, experience), [0, 0])[1] = count
+
+    db.query(DailyConversion).filter(DailyConversion.day == day).delete()
+    db.add_all([
+        DailyConversion(
+            day=day,
+            specialization=specialization,
+            experience=experience,
+            likes=segment_likes_count,
+            matches=segment_matches_count
+        )
+        for (specialization, experience), (segment_likes_count, segment_matches_count) in segments.items()
+    ])
+
+    db.commit()
+    return stats
+
+
+def rollup_pending(db: Session, today: date = None) -> list:
+    """
+    Досчитать агрегаты с последнего обработанного дня по сегодняшний
+
+    Последний день пересчитывается повторно, так как мог быть неполным.
+    При первом запуске агрегаты строятся с даты первой регистрации.
+    """
+    today = today or datetime.utcnow().date()
+
+    last_day = db.query(func.max(DailyStats.day)).scalar()
+    if last_day is None:
+        first_created = db.query(func.min(User.created_at)).scalar()
+        if first_created is None:
+            return []
+        if isinstance(first_created, str):
+            first_created = datetime.fromisoformat(first_created)
+        last_day = first_created.date()
+
+    days = []
+    day = last_day
+    while day <= today:
+        rollup_day(db, day)
+        days.append(day)
+        day += timedelta(days=1)
+
+    return days
+
+
+def run_rollups() -> list:
+    """Обновить агрегаты в отдельной сессии (для планировщика и cron)"""
+    db = SessionLocal()
+    try:
+        days = rollup_pending(db)
+        logger.info(f"📈 Агрегаты обновлены за {len(days)} дн.")
+        return days
+    finally:
+        db.close()
+
+
+async def rollup_scheduler(interval: int = ROLLUP_INTERVAL):
+    """Фоновая задача: периодически обновляет дневные агрегаты"""
+    while True:
+        try:
+            await run_in_threadpool(run_rollups)
+        except Exception as e:
+            logger.error(f"🔥 Ошибка при обновлении агрегатов: {e}", exc_info=True)
+        await asyncio.sleep(interval)
@@ -0,0 +1,265 @@
+"""
+JSON API v1: лента, лайки, совпадения и сообщения
+
+Те же данные, что и в HTML-страницах, но без шаблонов и редиректов:
+лайк отвечает 201 с результатом, пропуск и отметка прочитанного - 204.
+Авторизация - та же сессия (или cookie user_id), что и у сайта; войти
+можно через POST /api/v1/login.
+
+Ответы сериализует pydantic-core (Rust) прямо в байты, минуя повторную
+валидацию и jsonable_encoder FastAPI; анкеты читаются только нужными
+колонками.
+"""
+from typing import List, Optional
+
+import pydantic_core
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy.orm import Session
+
+from .. import crud, models, schemas
+from ..avatars import avatar_src, DEFAULT_AVATAR
+from ..database import get_db
+from ..facets import facet_cache, summarize
+from ..identicons import generated_avatar_src
+from .auth import get_current_user
+from .feed import FEED_MODES, FEED_PER_PAGE, select_feed_page, record_like, record_skip
+
+
+class ModelJSONResponse(Response):
+    """JSON-ответ из pydantic-моделей (и списков моделей) одним вызовом to_json"""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return pydantic_core.to_json(content)
+
+
+router = APIRouter(prefix="/api/v1", default_response_class=ModelJSONResponse)
+
+# Размер аватарки, под который отдаётся URL
+AVATAR_SIZE = 80
+
+# Максимум анкет и сообщений за один запрос
+MAX_PER_PAGE = 50
+MAX_MESSAGES = 100
+
+# Колонки анкеты, нужные ленте API
+FEED_COLUMNS = (
+    models.User.id,
+    models.User.username,
+    models.User.specialization,
+    models.User.experience,
+    models.User.bio,
+    models.User.avatar_url,
+)
+
+
+def require_user(request: Request, db: Session = Depends(get_db)) -> models.User:
+    """Текущий пользователь или 401"""
+    user = get_current_user(request, db)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Требуется вход")
+    return user
+
+
+def require_match(db: Session, user: models.User, match_id: int) -> models.Match:
+    """Матч, в котором участвует пользователь, или 404"""
+    match = crud.likes.get_match_by_users(db, user.id, match_id=match_id)
+    if not match:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Чат не найден или нет доступа")
+    return match
+
+
+def avatar_url(user_id: int, avatar: Optional[str]) -> str:
+    """URL аватарки как в шаблонах: загруженная или сгенерированная"""
+    if not avatar or avatar == DEFAULT_AVATAR:
+        return generated_avatar_src(user_id, AVATAR_SIZE)
+    return avatar_src(avatar, AVATAR_SIZE)
+
+
+@router.post("/login", status_code=status.HTTP_204_NO_CONTENT)
+async def api_login(
+        credentials: schemas.LoginRequest,
+        request: Request,
+        db: Session = Depends(get_db)
+):
+    """Вход: сессия и cookie, как у формы входа"""
+    user = crud.get_user_by_email(db, credentials.email)
+    if not user or not crud.verify_password(credentials.password, user.hashed_password):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный email или пароль")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Пользователь заблокирован")
+
+    request.session["user_id"] = str(user.id)
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    response.set_cookie(key="user_id", value=str(user.id), max_age=3600 * 24)
+    return response
+
+
+@router.get("/feed", response_model=schemas.FeedPage)
+async def api_feed(
+        request: Request,
+        specialization: Optional[str] = Query(None),
+        experience: Optional[str] = Query(None),
+        mode: Optional[str] = Query(None),
+        page: int = Query(1, ge=1),
+        per_page: int = Query(FEED_PER_PAGE, ge=1, le=MAX_PER_PAGE),
+        after: Optional[str] = Query(None),
+        before: Optional[str] = Query(None),
+        user: models.User = Depends(require_user),
+        db: Session = Depends(get_db)
+):
+    """Страница ленты: те же фильтры и режимы, что у /feed; after/before - курсоры ленты вперемешку"""
+    if mode and mode not in FEED_MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Неизвестный режим ленты")
+
+    feed_slice = select_feed_page(
+        request, db, user, specialization, experience, mode, page, per_page,
+        columns=FEED_COLUMNS, after=after, before=before
+    )
+    skipped_users = request.session.get("skipped_users", [])
+    facets = summarize(facet_cache.get(db, user.id, skipped_users), specialization, experience)
+    return ModelJSONResponse(schemas.FeedPage(
+        users=[
+            schemas.FeedUser(
+                id=row.id,
+                username=row.username,
+                specialization=row.specialization,
+                experience=row.experience,
+                bio=row.bio,
+                avatar=avatar_url(row.id, row.avatar_url)
+            )
+            for row in feed_slice.users
+        ],
+        page=page,
+        total_pages=(feed_slice.total + per_page - 1) // per_page,
+        total=feed_slice.total,
+        facets=schemas.FeedFacets(**facets),
+        next_cursor=feed_slice.after,
+        prev_cursor=feed_slice.before
+    ))
+
+
+@router.post("/likes/{user_id}", response_model=schemas.LikeResult, status_code=status.HTTP_201_CREATED)
+async def api_like(
+        user_id: int,
+        user: models.User = Depends(require_user),
+        db: Session = Depends(get_db)
+):
+    """Лайк: 201, если создан, 200 - если уже был; match_id при взаимном лайке"""
+    if user_id == user.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Нельзя лайкнуть себя")
+    other_user = crud.users.get_user_by_id(db, user_id)
+    if not other_user or not other_user.is_active:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Пользователь не найден")
+
+    like, is_match = record_like(db, user.id, user_id)
+    match = None
+    if is_match or like is None:
+        # Повторный лайк: матч мог случиться раньше
+        match = crud.likes.get_match_by_users(db, user.id, user_id)
+
+    return ModelJSONResponse(
+        schemas.LikeResult(created=like is not None, is_match=match is not None,
+                           match_id=match.id if match else None),
+        status_code=status.HTTP_201_CREATED if like is not None else status.HTTP_200_OK
+    )
+
+
+@router.post("/skips/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def api_skip(
+        user_id: int,
+        request: Request,
+        user: models.User = Depends(require_user),
+        db: Session = Depends(get_db)
+):
+    """Пропустить анкету (до сброса пропущенных)"""
+    if user_id == user.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Нельзя пропустить себя")
+    record_skip(request, db, user.id, user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/matches", response_model=List[schemas.MatchSummary])
+async def api_matches(
+        user: models.User = Depends(require_user),
+        db: Session = Depends(get_db)
+):
+    """Совпадения с собеседником, последним сообщением и числом непрочитанных"""
+    summaries = []
+    for row in crud.messages.get_chat_summaries(db, user.id):
+        last_message = None
+        if row.message_id is not None:
+            last_message = schemas.Message(
+                id=row.message_id,
+                text=row.text,
+                sender_id=row.sender_id,
+                created_at=row.message_created_at,
+                is_read=bool(row.is_read)
+            )
+        summaries.append(schemas.MatchSummary(
+            match_id=row.match_id,
+            created_at=row.created_at,
+            user=schemas.MatchUser(
+                id=row.user_id,
+                username=row.username,
+                specialization=row.specialization,
+                experience=row.experience,
+                avatar=avatar_url(row.user_id, row.avatar_url)
+            ),
+            last_message=last_message,
+            unread=row.unread
+        ))
+    return ModelJSONResponse(summaries)
+
+
+@router.get("/matches/{match_id}/messages", response_model=List[schemas.Message])
+async def api_messages(
+        match_id: int,
+        after_id: int = Query(0, ge=0),
+        limit: int = Query(MAX_MESSAGES, ge=1, le=MAX_MESSAGES),
+        user: models.User = Depends(require_user),
+        db: Session = Depends(get_db)
+):
+    """Сообщения чата по порядку; after_id - только новые (для опроса)"""
+    require_match(db, user, match_id)
+    messages = crud.messages.get_messages_after(db, match_id, after_id, limit)
+    return ModelJSONResponse([
+        schemas.Message(
+            id=row.id,
+            text=row.text,
+            sender_id=row.sender_id,
+            created_at=row.created_at,
+            is_read=bool(row.is_read)
+        )
+        for row in messages
+    ])
+
+
+@router.post("/matches/{match_id}/messages", response_model=schemas.Message,
+             status_code=status.HTTP_201_CREATED)
+async def api_send_message(
+        match_id: int,
+        message: schemas.MessageSend,
+        user: models.User = Depends(require_user),
+        db: Session = Depends(get_db)
+):
+    """Отправить сообщение в чат"""
+    require_match(db, user, match_id)
+    text = message.text.strip()
+    if not text:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Пустое сообщение")
+
+    db_message = crud.messages.create_message(db=db, match_id=match_id, sender_id=user.id, text=text)
+    return ModelJSONResponse(schemas.Message.model_validate(db_message), status_code=status.HTTP_201_CREATED)
+
+
+@router.post("/matches/{match_id}/read", status_code=status.HTTP_204_NO_CONTENT)
+async def api_mark_read(
+        match_id: int,
+        user: models.User = Depends(require_user),
+        db: Session = Depends(get_db)
+):
+    """Отметить входящие сообщения чата прочитанными"""
+    require_match(db, user, match_id)
+    crud.messages.mark_messages_as_read(db, match_id, user.id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from ..database import get_db
+from ..templating import templates
 from .. import crud, schemas
+from ..similarity import similarity_index
+from ..candidate_index import candidate_index
 from typing import Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/register")
@@ -43,6 +44,8 @@ async def register_user(
     )
 
     user = crud.create_user(db, user_data)
+    similarity_index.update(user.id, user.bio)
+    candidate_index.update_user(user)
 
     # Редирект на страницу входа после успешной регистрации
     return RedirectResponse(url="/login", status_code=status.HTTP_302_FOUND)
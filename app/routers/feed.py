@@ -1,15 +1,38 @@
+import re
+from dataclasses import dataclass
+
 from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from sqlalchemy import not_, and_
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import not_, exists, or_
 from ..database import get_db
-from .. import crud, models
+from ..templating import templates
+from .. import crud, models, scoring
+from ..candidate_index import candidate_index, select_bits, to_bitmap, PAGE_SLACK
+from ..facets import facet_cache, summarize
 from ..routers.auth import get_current_user
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+# Режимы сортировки ленты (по умолчанию - по id)
+FEED_MODES = ("recommended", "reciprocal", "scored", "shuffle")
+
+# Количество анкет на странице
+FEED_PER_PAGE = 10
+
+# Курсор ленты вперемешку: "перенос.shuffle_key.id"
+SHUFFLE_CURSOR = re.compile(r"[01]\.\d+\.\d+")
+
+
+@dataclass
+class FeedSlice:
+    """Страница ленты и общее число кандидатов"""
+    users: List[models.User]
+    total: int
+    # Только для ленты вперемешку: курсоры первой и последней анкеты страницы
+    before: Optional[str] = None
+    after: Optional[str] = None
 
 
 @router.get("/feed", response_class=HTMLResponse)
@@ -17,7 +40,10 @@ async def feed(
         request: Request,
         specialization: Optional[str] = Query(None),
         experience: Optional[str] = Query(None),
+        mode: Optional[str] = Query(None),
         page: int = Query(1, ge=1),
+        after: Optional[str] = Query(None),
+        before: Optional[str] = Query(None),
         db: Session = Depends(get_db)
 ):
     """Лента анкет пользователей"""
@@ -25,20 +51,67 @@ async def feed(
     if not user:
         return RedirectResponse(url="/login")
 
-    # Количество анкет на странице
-    per_page = 10
+    feed_slice = select_feed_page(
+        request, db, user, specialization, experience, mode, page, FEED_PER_PAGE,
+        after=after, before=before
+    )
+    users = feed_slice.users
+    total_pages = (feed_slice.total + FEED_PER_PAGE - 1) // FEED_PER_PAGE
+
+    # Счётчики для фильтров: один GROUP BY на пользователя, дальше - из кэша
+    skipped_users = request.session.get("skipped_users", [])
+    facets = summarize(facet_cache.get(db, user.id, skipped_users), specialization, experience)
+
+    return templates.TemplateResponse("feed.html", {
+        "request": request,
+        "users": users,
+        "user": user,
+        "facets": facets,
+        "filters": {
+            "specialization": specialization,
+            "experience": experience,
+            "mode": mode
+        },
+        "pagination": {
+            "page": page,
+            "total_pages": total_pages,
+            "has_prev": page > 1,
+            "has_next": page < total_pages,
+            # Курсоры текущей страницы (для форм) и соседних (для ссылок)
+            "after": after,
+            "before": before,
+            "prev_before": feed_slice.before,
+            "next_after": feed_slice.after
+        }
+    })
+
 
-    # Получаем ID пользователей, которых уже лайкнул текущий пользователь
-    liked_user_ids = [like.to_user_id for like in user.sent_likes]
+def select_feed_page(request: Request, db: Session, user: models.User,
+                     specialization: Optional[str], experience: Optional[str],
+                     mode: Optional[str], page: int, per_page: int,
+                     columns: Sequence = (), after: Optional[str] = None,
+                     before: Optional[str] = None) -> FeedSlice:
+    """
+    Анкеты страницы ленты и общее число кандидатов
 
+    Общая часть HTML-ленты и API. columns - загрузить только эти колонки
+    анкет (остальные подгрузятся при обращении). after/before - курсоры
+    ленты вперемешку из FeedSlice предыдущего запроса.
+    """
     # Получаем ID пользователей, которых пропустили
     skipped_users = request.session.get("skipped_users", [])
 
+    # Уже лайкнутых отсекает подзапрос: список их id в Python не нужен
+    already_liked = exists().where(
+        models.Like.from_user_id == user.id,
+        models.Like.to_user_id == models.User.id
+    )
+
     # Строим базовый запрос
     query = db.query(models.User).filter(
         models.User.id != user.id,
         models.User.is_active == True,
-        not_(models.User.id.in_(liked_user_ids)),
+        not_(already_liked),
         not_(models.User.id.in_(skipped_users))  # <-- ИСКЛЮЧАЕМ ПРОПУЩЕННЫХ
     )
 
@@ -49,27 +122,242 @@ async def feed(
     if experience:
         query = query.filter(models.User.experience == experience)
 
+    # Без колонок анкет - для проверки id по фильтрам
+    ids_query = query.with_entities(models.User.id)
+    if columns:
+        if mode == "shuffle":
+            # Ключ нужен для курсоров страницы
+            columns = (*columns, models.User.shuffle_key)
+        query = query.options(load_only(*columns))
+
+    # Умная сортировка оценивает кандидатов на numpy (scoring.py);
+    # без numpy - ближайший порядок, который умеет SQL
+    ranked = mode == "scored" and scoring.AVAILABLE
+    order_mode = "reciprocal" if mode == "scored" and not ranked else mode
+    offset = (page - 1) * per_page
+    page_before = page_after = None
+
     # Пагинация
+    if ranked:
+        # Снимок в памяти мог отстать: строки страницы берём обычным
+        # запросом с теми же фильтрами и лишнее отбрасываем
+        liked_user_ids = [
+            liked_id for liked_id, in db.query(models.Like.to_user_id).filter(
+                models.Like.from_user_id == user.id
+            )
+        ]
+        ranked_ids, total_users = scoring.rank_candidates(
+            db, user, liked_user_ids + skipped_users,
+            specialization=specialization,
+            experience=experience,
+            offset=offset,
+            limit=per_page + scoring.PAGE_SLACK
+        )
+        rows = {row.id: row for row in query.filter(models.User.id.in_(ranked_ids)).all()}
+        users = [rows[user_id] for user_id in ranked_ids if user_id in rows][:per_page]
+    elif order_mode in ("recommended", "reciprocal"):
+        # Предрасчитанные рекомендации (не больше TOP_K) по рангу, затем
+        # обычная лента по id - для новых пользователей без рекомендаций
+        # лента совпадает с обычной. Всю выборку при этом не сортируем
+        head_ids = [
+            candidate_id for candidate_id, in db.query(models.Recommendation.candidate_id).filter(
+                models.Recommendation.user_id == user.id
+            ).order_by(models.Recommendation.rank)
+        ]
+
+        if order_mode == "reciprocal":
+            # Выше всех - те, кто уже лайкнул текущего пользователя: лайк
+            # в ответ сразу даёт матч. Их не больше, чем ждущих ответа
+            # лайков, и выбираются они одним запросом по ix_likes_to_from
+            rank = {candidate_id: position for position, candidate_id in enumerate(head_ids)}
+            likers = sorted(
+                crud.likes.get_pending_liker_ids(db, user.id),
+                key=lambda liker_id: (rank.get(liker_id, len(rank)), liker_id)
+            )
+            liker_set = set(likers)
+            head_ids = likers + [candidate_id for candidate_id in head_ids if candidate_id not in liker_set]
+
+        users, total_users = _page_with_head(
+            db, query, ids_query, user, head_ids,
+            specialization, experience, skipped_users, offset, per_page
+        )
+    elif mode == "shuffle":
+        # Вперемешку: у анкеты постоянный случайный shuffle_key, у сессии -
+        # случайная точка старта. Идём по индексу от неё до конца ключей
+        # и продолжаем с начала: без ORDER BY RANDOM() и сортировки таблицы,
+        # а порядок и страницы в пределах сессии не меняются
+        seed = request.session.get("shuffle_seed")
+        if seed is None:
+            seed = request.session["shuffle_seed"] = models.random_shuffle_key()
+
+        users = _shuffle_page(query, seed, offset, per_page, after, before)
+        if users:
+            page_before = _shuffle_cursor(users[0], seed)
+            page_after = _shuffle_cursor(users[-1], seed)
+
+        if candidate_index.ready:
+            total_users = candidate_index.candidates(
+                db, user.id, specialization, experience, skipped_users
+            ).bit_count()
+        else:
+            total_users = query.count()
+    else:
+        users, total_users = _plain_page(
+            db, query, user, specialization, experience, skipped_users, offset, per_page
+        )
+
+    return FeedSlice(users, total_users, before=page_before, after=page_after)
+
+
+def _shuffle_cursor(user: models.User, seed: int) -> str:
+    return f"{int(user.shuffle_key < seed)}.{user.shuffle_key}.{user.id}"
+
+
+def _parse_shuffle_cursor(value: Optional[str], seed: int) -> Optional[Tuple[bool, int, int]]:
+    """(перенос, shuffle_key, id) или None, если курсор испорчен или от другой точки старта"""
+    if not value or not SHUFFLE_CURSOR.fullmatch(value):
+        return None
+    wrapped, key, user_id = (int(part) for part in value.split("."))
+    if bool(wrapped) != (key < seed):
+        return None
+    return bool(wrapped), key, user_id
+
+
+def _shuffle_page(query, seed: int, offset: int, per_page: int,
+                  after: Optional[str], before: Optional[str]) -> List[models.User]:
+    """
+    Страница ленты вперемешку
+
+    Порядок - (shuffle_key, id) от seed до конца ключей, затем с начала
+    (перенос). Соседние страницы ищутся по индексу от курсора крайней
+    анкеты - без OFFSET и подсчёта анкет до переноса. OFFSET остаётся
+    только для перехода на страницу без курсора.
+    """
+    head = query.filter(models.User.shuffle_key >= seed)
+    tail = query.filter(models.User.shuffle_key < seed)
+
+    cursor = _parse_shuffle_cursor(before, seed)
+    if cursor is not None:
+        wrapped, key, user_id = cursor
+        users = _seek(tail if wrapped else head, key, user_id, per_page, backward=True)
+        if wrapped:
+            users += _seek(head, None, None, per_page - len(users), backward=True)
+        if len(users) == per_page:
+            return users[::-1]
+        # Дошли до начала ленты - показываем первую страницу
+        offset = 0
+
+    cursor = _parse_shuffle_cursor(after, seed)
+    if cursor is not None:
+        wrapped, key, user_id = cursor
+        if wrapped:
+            return _seek(tail, key, user_id, per_page)
+        users = _seek(head, key, user_id, per_page)
+        return users + _seek(tail, None, None, per_page - len(users))
+
+    if offset == 0:
+        users = _seek(head, None, None, per_page)
+        return users + _seek(tail, None, None, per_page - len(users))
+
+    # Переход на страницу по номеру: один запрос в порядке ленты
+    return query.order_by(
+        models.User.shuffle_key < seed, models.User.shuffle_key, models.User.id
+    ).offset(offset).limit(per_page).all()
+
+
+def _seek(query, key: Optional[int], user_id: Optional[int], limit: int,
+          backward: bool = False) -> List[models.User]:
+    """До limit анкет строго после (или до) позиции (key, user_id) в порядке (shuffle_key, id)"""
+    if limit <= 0:
+        return []
+    shuffle_key = models.User.shuffle_key
+    if key is not None:
+        if backward:
+            query = query.filter(shuffle_key <= key, or_(shuffle_key < key, models.User.id < user_id))
+        else:
+            query = query.filter(shuffle_key >= key, or_(shuffle_key > key, models.User.id > user_id))
+    order = (shuffle_key.desc(), models.User.id.desc()) if backward else (shuffle_key, models.User.id)
+    return query.order_by(*order).limit(limit).all()
+
+
+def _plain_page(db: Session, query, user: models.User,
+                specialization: Optional[str], experience: Optional[str], skipped_users: list,
+                offset: int, limit: int, exclude_ids: Sequence[int] = ()) -> Tuple[List[models.User], int]:
+    """
+    Страница обычной ленты (по id) и число всех кандидатов
+
+    С готовым индексом кандидатов - операции над битовыми масками, из базы
+    читаются только строки страницы (с проверкой фильтров); иначе OFFSET и
+    COUNT. exclude_ids - анкеты, уже показанные в начале ленты: они есть
+    в общем числе, но не на страницах.
+    """
+    if candidate_index.ready:
+        for attempt in range(2):
+            candidates = candidate_index.candidates(db, user.id, specialization, experience, skipped_users)
+            total_users = candidates.bit_count()
+            if limit <= 0:
+                return [], total_users
+            page_ids = select_bits(candidates & ~to_bitmap(exclude_ids), offset, limit + PAGE_SLACK)
+            users = query.filter(models.User.id.in_(page_ids)).order_by(models.User.id).limit(limit).all()
+            if attempt or len(users) >= min(limit, len(page_ids)):
+                return users, total_users
+            # База отсеяла больше запаса: маска лайкнутых устарела (лайки из
+            # другого воркера) - перечитываем её один раз
+            candidate_index.forget_seen(user.id)
+
     total_users = query.count()
-    total_pages = (total_users + per_page - 1) // per_page
+    if limit <= 0:
+        return [], total_users
+    if exclude_ids:
+        query = query.filter(not_(models.User.id.in_(exclude_ids)))
+    users = query.order_by(models.User.id).offset(offset).limit(limit).all()
+    return users, total_users
+
+
+def _page_with_head(db: Session, query, ids_query, user: models.User, head_ids: List[int],
+                    specialization: Optional[str], experience: Optional[str], skipped_users: list,
+                    offset: int, per_page: int) -> Tuple[List[models.User], int]:
+    """Сначала анкеты head_ids в их порядке (только подходящие под фильтры), затем обычная лента"""
+    if head_ids:
+        allowed = {user_id for user_id, in ids_query.filter(models.User.id.in_(head_ids))}
+        head_ids = [user_id for user_id in head_ids if user_id in allowed]
+
+    page_head = head_ids[offset:offset + per_page]
+    users = []
+    if page_head:
+        rows = {row.id: row for row in query.filter(models.User.id.in_(page_head))}
+        users = [rows[user_id] for user_id in page_head if user_id in rows]
+
+    tail, total_users = _plain_page(
+        db, query, user, specialization, experience, skipped_users,
+        max(offset - len(head_ids), 0), per_page - len(users), exclude_ids=head_ids
+    )
+    return users + tail, total_users
 
-    users = query.offset((page - 1) * per_page).limit(per_page).all()
 
-    return templates.TemplateResponse("feed.html", {
-        "request": request,
-        "users": users,
-        "user": user,
-        "filters": {
-            "specialization": specialization,
-            "experience": experience
-        },
-        "pagination": {
-            "page": page,
-            "total_pages": total_pages,
-            "has_prev": page > 1,
-            "has_next": page < total_pages
-        }
-    })
+def require_profile(db: Session, user_id: int):
+    """Анкета, которую лайкают или пропускают, должна существовать - иначе 404"""
+    if not db.query(exists().where(models.User.id == user_id)).scalar():
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+
+
+def record_like(db: Session, user_id: int, other_id: int):
+    """Лайк с обновлением кэшей ленты; (лайк или None, если уже был, матч)"""
+    require_profile(db, other_id)
+    like, is_match = crud.likes.create_like(db, user_id, other_id)
+    candidate_index.mark_seen(user_id, other_id)
+    facet_cache.invalidate(user_id)
+    return like, is_match
+
+
+def record_skip(request: Request, db: Session, user_id: int, other_id: int):
+    """Запомнить пропущенную анкету в сессии"""
+    require_profile(db, other_id)
+    skipped_users = request.session.get("skipped_users", [])
+    if other_id not in skipped_users:
+        skipped_users.append(other_id)
+        request.session["skipped_users"] = skipped_users
+        facet_cache.invalidate(user_id)
 
 
 @router.post("/like/{user_id}")
@@ -94,17 +382,20 @@ async def like_user(
 
         specialization = form_data.get("specialization", "")
         experience = form_data.get("experience", "")
+        mode = form_data.get("mode", "")
         page = form_data.get("page", "1")
+        after = form_data.get("after")
+        before = form_data.get("before")
 
         try:
             page = int(page)
         except:
             page = 1
 
-        return build_redirect_url("/feed", specialization, experience, page)
+        return build_redirect_url("/feed", specialization, experience, page, mode, after, before)
 
     # Создаём лайк
-    like, is_match = crud.likes.create_like(db, current_user.id, user_id)
+    like, is_match = record_like(db, current_user.id, user_id)
 
     # Получаем параметры из запроса
     form_data = {}
@@ -116,7 +407,10 @@ async def like_user(
 
     specialization = form_data.get("specialization", "")
     experience = form_data.get("experience", "")
+    mode = form_data.get("mode", "")
     page = form_data.get("page", "1")
+    after = form_data.get("after")
+    before = form_data.get("before")
 
     try:
         page = int(page)
@@ -129,15 +423,18 @@ async def like_user(
             return RedirectResponse(url="/matches", status_code=303)
         else:
             # Возвращаем на ленту с сохранением фильтров
-            return build_redirect_url("/feed", specialization, experience, page)
+            return build_redirect_url("/feed", specialization, experience, page, mode, after, before)
     else:
-        return build_redirect_url("/feed", specialization, experience, page)
+        return build_redirect_url("/feed", specialization, experience, page, mode, after, before)
 
 
-def build_redirect_url(base_url, specialization, experience, page):
+def build_redirect_url(base_url, specialization, experience, page, mode=None, after=None, before=None):
     """Построить URL с параметрами фильтров (игнорирует None и пустые значения)"""
     params = []
 
+    if mode in FEED_MODES:
+        params.append(f"mode={mode}")
+
     if specialization and specialization != "None" and specialization.strip():
         params.append(f"specialization={specialization}")
 
@@ -147,6 +444,12 @@ def build_redirect_url(base_url, specialization, experience, page):
     if page and page > 1:
         params.append(f"page={page}")
 
+    # Курсор ленты вперемешку: та же страница после лайка или пропуска
+    if after and SHUFFLE_CURSOR.fullmatch(after):
+        params.append(f"after={after}")
+    elif before and SHUFFLE_CURSOR.fullmatch(before):
+        params.append(f"before={before}")
+
     if params:
         return RedirectResponse(url=f"{base_url}?{'&'.join(params)}", status_code=303)
     else:
@@ -174,7 +477,10 @@ async def skip_user(
 
     specialization = form_data.get("specialization", "")
     experience = form_data.get("experience", "")
+    mode = form_data.get("mode", "")
     page = form_data.get("page", "1")
+    after = form_data.get("after")
+    before = form_data.get("before")
 
     try:
         page = int(page)
@@ -182,13 +488,10 @@ async def skip_user(
         page = 1
 
     # Сохраняем пропущенного пользователя в сессии
-    skipped_users = request.session.get("skipped_users", [])
-    if user_id not in skipped_users:
-        skipped_users.append(user_id)
-        request.session["skipped_users"] = skipped_users
+    record_skip(request, db, current_user.id, user_id)
 
     # Возвращаем с сохранением фильтров
-    return build_redirect_url("/feed", specialization, experience, page)
+    return build_redirect_url("/feed", specialization, experience, page, mode, after, before)
 
 
 @router.get("/matches", response_class=HTMLResponse)
@@ -227,6 +530,20 @@ async def view_matches(
     })
 
 
+@router.get("/feed/reshuffle")
+async def reshuffle_feed(
+        request: Request,
+        db: Session = Depends(get_db)
+):
+    """Новый случайный порядок ленты вперемешку"""
+    user = get_current_user(request, db)
+    if not user:
+        return RedirectResponse(url="/login")
+
+    request.session.pop("shuffle_seed", None)
+    return RedirectResponse(url="/feed?mode=shuffle", status_code=303)
+
+
 @router.get("/feed/reset")
 async def reset_skipped(
         request: Request,
@@ -240,5 +557,6 @@ async def reset_skipped(
     # Очищаем пропущенных пользователей из сессии
     if "skipped_users" in request.session:
         del request.session["skipped_users"]
+        facet_cache.invalidate(user.id)
 
     return RedirectResponse(url="/feed", status_code=303)
\ No newline at end of file
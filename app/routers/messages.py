@@ -1,15 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Form
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from ..database import get_db
+from ..templating import templates
 from .. import crud
 from ..routers.auth import get_current_user
 from typing import List, Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 # Главная страница сообщений - редирект на список чатов
 @router.get("/messages")
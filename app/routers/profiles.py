@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File, Form
-from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File, Form, Query
+from fastapi.responses import RedirectResponse, HTMLResponse, Response, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
-import shutil
+import re
+import uuid
 from ..database import get_db
+from ..templating import templates
 from .. import crud, schemas
 from ..routers.auth import get_current_user
+from ..scoring import snapshot as candidate_snapshot
+from ..candidate_index import candidate_index
+from ..similarity import similarity_index, similar_users, SimilarityUnavailable, DEFAULT_LIMIT, MAX_LIMIT
+from ..avatars import AvatarError, store_avatar, delete_avatar, is_processed, AVATAR_SIZES, DEFAULT_AVATAR_URL
+from ..storage import storage, StorageError
+from ..uploads import UploadError, read_upload, detect_image_format, IMAGE_EXTENSIONS
+from ..identicons import GENERATED_URL, GENERATED_CACHE_CONTROL, GENERATION_AVAILABLE, generated_avatar
 from typing import Optional
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 # Настройки для загрузки файлов
-UPLOAD_DIR = "app/static/uploads"
-ALLOWED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
 
@@ -31,6 +37,7 @@ async def view_profile(
     # Получаем статистику пользователя
     sent_likes, received_likes = crud.likes.get_user_likes(db, user.id)
     matches = crud.likes.get_user_matches(db, user.id)
+    liked_you = crud.likes.count_pending_likes(db, user.id)
 
     return templates.TemplateResponse("profile.html", {
         "request": request,
@@ -38,15 +45,55 @@ async def view_profile(
         "stats": {
             "sent_likes": len(sent_likes),
             "received_likes": len(received_likes),
-            "matches": len(matches)
+            "matches": len(matches),
+            "liked_you": liked_you
         }
     })
 
 
+async def release_avatar(db: Session, avatar_url: str, new_avatar_url: str = None):
+    """
+    Удалить файл старой аватарки, если она больше ни у кого не используется
+
+    Сразу удаляются только старые загрузки со случайным именем. Миниатюры
+    с ключом-хэшем может в этот момент заново загрузить другой пользователь
+    (store_avatar лишь обновит их время) - их убирает collect_garbage
+    (gc_avatars.py) после ITMATCH_AVATAR_GC_GRACE.
+    """
+    if avatar_url == new_avatar_url or is_processed(avatar_url):
+        return
+    if crud.count_users_with_avatar(db, avatar_url) == 0:
+        await run_in_threadpool(delete_avatar, avatar_url)
+
+
+@router.get(GENERATED_URL + "/{user_id}/{size}.png")
+def get_generated_avatar(
+        user_id: int,
+        size: int,
+        request: Request,
+        db: Session = Depends(get_db)
+):
+    """Сгенерированная аватарка с инициалами (для пользователей без загрузки)"""
+    if size not in AVATAR_SIZES:
+        raise HTTPException(status_code=404, detail="Неподдерживаемый размер")
+
+    user = crud.get_user_by_id(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+    if not GENERATION_AVAILABLE:
+        return RedirectResponse(url=DEFAULT_AVATAR_URL)
+
+    etag, content = generated_avatar(user.id, user.username, size)
+    headers = {"ETag": etag, "Cache-Control": GENERATED_CACHE_CONTROL}
+
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type="image/png", headers=headers)
+
+
 @router.post("/profile/upload-avatar")
 async def upload_avatar(
         request: Request,
-        file: UploadFile = File(...),
         db: Session = Depends(get_db)
 ):
     """Загрузка аватарки"""
@@ -54,46 +101,36 @@ async def upload_avatar(
     if not user:
         return RedirectResponse(url="/login")
 
-    # Проверяем размер файла
-    file.file.seek(0, 2)  # Перемещаемся в конец файла
-    file_size = file.file.tell()
-    file.file.seek(0)  # Возвращаемся в начало
-
-    if file_size > MAX_FILE_SIZE:
+    # Читаем файл потоком: лимит размера и формат по сигнатуре проверяются
+    # по мере поступления байтов, слишком большой файл не дочитываем
+    try:
+        upload = await read_upload(request, field="file", max_size=MAX_FILE_SIZE)
+    except UploadError as e:
         return templates.TemplateResponse("edit_profile.html", {
             "request": request,
             "user": user,
-            "error": "Файл слишком большой. Максимальный размер: 5MB"
-        })
-
-    # Проверяем расширение файла
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
+            "error": str(e)
+        }, status_code=e.status_code)
+
+    # Пережимаем в миниатюры в пуле процессов (EXIF отбрасывается);
+    # имя файла - хэш содержимого, одинаковые картинки хранятся один раз
+    try:
+        key = await store_avatar(upload.data, upload.extension)
+    except AvatarError:
         return templates.TemplateResponse("edit_profile.html", {
             "request": request,
             "user": user,
-            "error": "Недопустимый формат файла. Разрешены: .png, .jpg, .jpeg, .gif"
-        })
-
-    # Удаляем старую аватарку если она не дефолтная
-    if user.avatar_url and user.avatar_url != "default_avatar.png":
-        old_avatar_path = os.path.join(UPLOAD_DIR, user.avatar_url)
-        if os.path.exists(old_avatar_path):
-            os.remove(old_avatar_path)
-
-    # Создаём уникальное имя файла
-    import uuid
-    filename = f"{uuid.uuid4()}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    # Сохраняем файл
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+            "error": "Не удалось прочитать изображение. Загрузите другой файл"
+        }, status_code=400)
 
     # Обновляем профиль пользователя
-    update_data = {"avatar_url": filename}
+    old_avatar = user.avatar_url
+    update_data = {"avatar_url": key}
     crud.update_user_profile(db, user.id, update_data)
 
+    # Файлы старой аватарки удалит release_avatar или сборщик мусора
+    await release_avatar(db, old_avatar, key)
+
     return RedirectResponse(url="/profile", status_code=status.HTTP_302_FOUND)
 
 
@@ -107,19 +144,81 @@ async def remove_avatar(
     if not user:
         return RedirectResponse(url="/login")
 
-    # Удаляем файл аватарки если она не дефолтная
-    if user.avatar_url and user.avatar_url != "default_avatar.png":
-        avatar_path = os.path.join(UPLOAD_DIR, user.avatar_url)
-        if os.path.exists(avatar_path):
-            os.remove(avatar_path)
-
     # Устанавливаем дефолтную аватарку
+    old_avatar = user.avatar_url
     update_data = {"avatar_url": "default_avatar.png"}
     crud.update_user_profile(db, user.id, update_data)
 
+    # Файлы старой аватарки удалит release_avatar или сборщик мусора
+    await release_avatar(db, old_avatar)
+
     return RedirectResponse(url="/profile", status_code=status.HTTP_302_FOUND)
 
 
+def _incoming_name(user_id: int, upload_id: str) -> str:
+    # Имя привязано к пользователю: завершить чужую загрузку нельзя
+    return f"incoming/{user_id}_{upload_id}"
+
+
+@router.post("/profile/avatar/direct-upload")
+async def start_direct_upload(
+        request: Request,
+        db: Session = Depends(get_db)
+):
+    """Подписанная форма для загрузки аватарки браузером прямо в хранилище"""
+    user = get_current_user(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    if not storage.supports_direct_upload:
+        # Локальное хранилище: браузер отправит обычную форму
+        raise HTTPException(status_code=404, detail="Прямая загрузка не поддерживается")
+
+    upload_id = uuid.uuid4().hex
+    form = await run_in_threadpool(
+        storage.presigned_upload, _incoming_name(user.id, upload_id), MAX_FILE_SIZE
+    )
+    return {"upload_id": upload_id, "url": form["url"], "fields": form["fields"]}
+
+
+@router.post("/profile/avatar/direct-upload/{upload_id}/complete")
+async def complete_direct_upload(
+        upload_id: str,
+        request: Request,
+        db: Session = Depends(get_db)
+):
+    """Обработать аватарку, которую браузер загрузил напрямую в хранилище"""
+    user = get_current_user(request, db)
+    if not user:
+        raise HTTPException(status_code=401, detail="Требуется авторизация")
+    if not storage.supports_direct_upload or not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+
+    incoming = _incoming_name(user.id, upload_id)
+    try:
+        data = await run_in_threadpool(storage.read, incoming)
+    except StorageError:
+        raise HTTPException(status_code=404, detail="Загрузка не найдена")
+
+    try:
+        # Хранилище уже проверило размер, но не содержимое
+        image_format = detect_image_format(data[:12])
+        if len(data) > MAX_FILE_SIZE or image_format is None:
+            return JSONResponse({"error": "Недопустимый файл"}, status_code=400)
+
+        try:
+            key = await store_avatar(data, IMAGE_EXTENSIONS[image_format])
+        except AvatarError:
+            return JSONResponse({"error": "Не удалось прочитать изображение"}, status_code=400)
+    finally:
+        await run_in_threadpool(storage.delete, incoming)
+
+    old_avatar = user.avatar_url
+    crud.update_user_profile(db, user.id, {"avatar_url": key})
+    await release_avatar(db, old_avatar, key)
+
+    return {"avatar_url": key}
+
+
 @router.get("/profile/edit", response_class=HTMLResponse)
 async def edit_profile_page(
         request: Request,
@@ -160,6 +259,11 @@ async def update_profile(
 
     if update_data:
         crud.users.update_user_profile(db, user.id, update_data)
+        # Специализация и уровень участвуют в сортировке ленты
+        candidate_snapshot.mark_changed([user.id])
+        candidate_index.update_user(user)
+        if "bio" in update_data:
+            similarity_index.update(user.id, update_data["bio"])
 
     return RedirectResponse(url="/profile", status_code=status.HTTP_302_FOUND)
 
@@ -229,9 +333,54 @@ async def view_other_profile(
     # Проверяем, есть ли матч между пользователями
     match = crud.likes.get_match_by_users(db, current_user.id, user_id)
 
+    # Похожие анкеты (если индекс построен)
+    similar = []
+    if similarity_index.available:
+        try:
+            similar = similar_users(db, user, exclude_ids=[current_user.id])
+        except SimilarityUnavailable:
+            pass
+
     return templates.TemplateResponse("view_profile.html", {
         "request": request,
         "user": user,
         "current_user": current_user,
-        "is_match": match is not None
-    })
\ No newline at end of file
+        "is_match": match is not None,
+        "similar": similar
+    })
+
+
+@router.get("/user/{user_id}/similar")
+async def similar_profiles(
+        user_id: int,
+        request: Request,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        db: Session = Depends(get_db)
+):
+    """Активные пользователи с похожим описанием "О себе" (JSON)"""
+    current_user = get_current_user(request, db)
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Требуется авторизация")
+
+    user = crud.users.get_user_by_id(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+
+    try:
+        similar = similar_users(db, user, limit, exclude_ids=[current_user.id])
+    except SimilarityUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {
+        "user_id": user.id,
+        "similar": [
+            {
+                "id": other.id,
+                "username": other.username,
+                "specialization": other.specialization,
+                "experience": other.experience,
+                "score": round(score, 4)
+            }
+            for other, score in similar
+        ]
+    }
\ No newline at end of file
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 # Схемы для пользователей
@@ -21,8 +21,7 @@ class User(UserBase):
     avatar_url: str
     created_at: datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Схема для аутентификации
@@ -57,5 +56,60 @@ class Message(BaseModel):
     created_at: datetime
     is_read: bool
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MessageSend(BaseModel):
+    text: str = Field(min_length=1)
+
+
+# Компактные схемы JSON API: только поля, которые нужны клиенту
+class FeedUser(BaseModel):
+    id: int
+    username: str
+    specialization: str
+    experience: str
+    bio: Optional[str] = None
+    avatar: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class FeedFacets(BaseModel):
+    specialization: Dict[str, int]
+    experience: Dict[str, int]
+    all_specializations: int
+    all_experiences: int
+
+
+class FeedPage(BaseModel):
+    users: List[FeedUser]
+    page: int
+    total_pages: int
+    total: int
+    facets: FeedFacets
+    # Лента вперемешку: передать в after (следующая) или before (предыдущая)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+class LikeResult(BaseModel):
+    created: bool
+    is_match: bool
+    match_id: Optional[int] = None
+
+
+class MatchUser(BaseModel):
+    id: int
+    username: str
+    specialization: str
+    experience: str
+    avatar: str
+
+
+class MatchSummary(BaseModel):
+    match_id: int
+    created_at: Optional[datetime] = None
+    user: MatchUser
+    last_message: Optional[Message] = None
+    unread: int = 0
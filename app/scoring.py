@@ -0,0 +1,466 @@
+"""
+Умная сортировка ленты: оценка кандидатов пачкой на numpy
+
+Каждый воркер держит в памяти колоночный снимок активных анкет:
+специализация и уровень (коды), дата регистрации, последняя активность
+(лайк или сообщение), число полученных лайков. Лента отбирает кандидатов
+маской по этим массивам, оценивает всех разом и забирает из базы только
+строки нужной страницы.
+
+Оценка кандидата для пользователя:
+  - совместимость специализаций и уровней (матрицы ниже);
+  - бонус новым анкетам и недавно активным;
+  - деление на log числа полученных лайков - популярные анкеты
+    не забирают себе все показы;
+  - большой бонус тем, кто уже лайкнул пользователя: ответ - сразу матч.
+
+Снимок догружается инкрементально (новые анкеты, лайки, сообщения по id)
+не чаще раза в ITMATCH_SCORING_REFRESH секунд и целиком перечитывается
+в фоне раз в ITMATCH_SCORING_FULL_REFRESH. Правки профиля в этом же
+воркере подхватываются сразу через mark_changed, в остальных - при полном
+перечитывании. Без numpy лента сортируется обычным SQL-запросом.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .database import engine
+from .models import Like, Message, User
+
+logger = logging.getLogger(__name__)
+
+AVAILABLE = np is not None
+
+# Как часто догружать новые анкеты, лайки и сообщения (секунды)
+REFRESH_SECONDS = int(os.getenv("ITMATCH_SCORING_REFRESH", "30"))
+
+# Как часто перечитывать снимок целиком (правки профилей в других воркерах)
+FULL_REFRESH_SECONDS = int(os.getenv("ITMATCH_SCORING_FULL_REFRESH", "600"))
+
+# Сколько лишних анкет брать на страницу: часть могла устареть в снимке
+PAGE_SLACK = 5
+
+SPECIALIZATIONS = ("Backend", "Frontend", "Fullstack", "Data Science", "DevOps", "Mobile")
+EXPERIENCES = ("Junior", "Middle", "Senior")
+
+# Совместимость специализаций: строка - кто смотрит, столбец - кандидат.
+# Выше всего - те, кто закрывает другую часть продукта. Последняя строка
+# и столбец - любые другие значения
+SPECIALIZATION_COMPAT = (
+    (0.6, 1.0, 0.8, 0.7, 0.9, 0.9, 0.5),
+    (1.0, 0.6, 0.8, 0.5, 0.6, 0.7, 0.5),
+    (0.8, 0.8, 0.6, 0.7, 0.9, 0.8, 0.5),
+    (0.9, 0.6, 0.7, 0.6, 0.8, 0.5, 0.5),
+    (0.9, 0.6, 0.9, 0.8, 0.5, 0.6, 0.5),
+    (0.9, 0.7, 0.8, 0.5, 0.6, 0.6, 0.5),
+    (0.5, 0.5, 0.5, 0.5, 0.5, 0.5, 0.5),
+)
+
+# Совместимость уровней: чем ближе, тем лучше
+EXPERIENCE_COMPAT = (
+    (1.0, 0.75, 0.5, 0.5),
+    (0.75, 1.0, 0.75, 0.5),
+    (0.5, 0.75, 1.0, 0.5),
+    (0.5, 0.5, 0.5, 0.5),
+)
+
+NEW_USER_BONUS = 0.3
+NEW_USER_DAYS = 14
+ACTIVITY_BONUS = 0.5
+ACTIVITY_DAYS = 7
+POPULARITY_DAMPING = 0.2
+LIKED_YOU_BONUS = 2.0
+
+DAY = 86400.0
+
+USER_COLUMNS = (User.id, User.specialization, User.experience, User.created_at, User.is_active)
+
+
+def _timestamp(value) -> float:
+    """Время из базы в секунды UTC (SQLite отдаёт наивное время в UTC)"""
+    if value is None:
+        return 0.0
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _Vocabulary:
+    """Коды строковых значений; известные значения - в порядке матрицы"""
+
+    def __init__(self, known: Tuple[str, ...]):
+        # Код len(known) - "другие" в матрицах совместимости
+        self.codes = {value: code for code, value in enumerate(known)}
+        self._lock = threading.Lock()
+
+    def code(self, value: Optional[str]) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            # Новые значения получают свой код (для фильтра), а в матрице
+            # совместимости считаются "другими"
+            with self._lock:
+                code = self.codes.setdefault(value, len(self.codes) + 1)
+        return code
+
+    def find(self, value: str) -> Optional[int]:
+        return self.codes.get(value)
+
+
+class _Columns:
+    """Колонки снимка; позиция в массивах - по возрастанию id"""
+
+    def __init__(self, ids, specialization, experience, created, active_at, popularity, active,
+                 last_user_id: int, last_like_id: int, last_message_id: int):
+        self.ids = ids
+        self.specialization = specialization
+        self.experience = experience
+        self.created = created
+        self.active_at = active_at
+        self.popularity = popularity
+        self.active = active
+        self.last_user_id = last_user_id
+        self.last_like_id = last_like_id
+        self.last_message_id = last_message_id
+        # Момент, от которого считаются возраст и давность активности:
+        # между обновлениями порядок ленты не "плывёт"
+        self.as_of = time.time()
+
+    def copy(self) -> "_Columns":
+        """Копия для обновления: читатели старых колонок не видят изменений на полпути"""
+        columns = _Columns(
+            self.ids, self.specialization.copy(), self.experience.copy(), self.created,
+            self.active_at.copy(), self.popularity.copy(), self.active.copy(),
+            self.last_user_id, self.last_like_id, self.last_message_id,
+        )
+        columns.as_of = self.as_of
+        return columns
+
+    def lookup(self, user_ids):
+        """Позиции id в массивах и маска найденных"""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, user_ids)
+        found = positions < len(self.ids)
+        found[found] = self.ids[positions[found]] == user_ids[found]
+        return positions, found
+
+    def positions(self, user_ids) -> "np.ndarray":
+        """Позиции известных снимку id (неизвестные отбрасываются)"""
+        positions, found = self.lookup(user_ids)
+        return positions[found]
+
+
+class CandidateSnapshot:
+    """Колоночный снимок анкет для ранжирования ленты (свой в каждом воркере)"""
+
+    def __init__(self, refresh_seconds: int = REFRESH_SECONDS, full_refresh_seconds: int = FULL_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self.specializations = _Vocabulary(SPECIALIZATIONS)
+        self.experiences = _Vocabulary(EXPERIENCES)
+        self._columns = None
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        self._changed = set()
+        # Изменения, применённые к старым колонкам во время полного перечитывания
+        self._changed_during_reload = set()
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._refreshing = False
+
+    def mark_changed(self, user_ids: Iterable[int]):
+        """Анкеты изменились (профиль, активность) - перечитать при следующем запросе"""
+        with self._lock:
+            self._changed.update(user_ids)
+
+    def columns(self) -> _Columns:
+        """Актуальные колонки: догружает изменения, при необходимости запускает полное перечитывание"""
+        if self._columns is None:
+            self.reload()
+        elif time.monotonic() - self._loaded_at > self.full_refresh_seconds:
+            with self._lock:
+                start_reload = not self._reloading
+                self._reloading = True
+            if start_reload:
+                threading.Thread(target=self.reload, name="itmatch-scoring", daemon=True).start()
+
+        if self._changed or time.monotonic() - self._refreshed_at > self.refresh_seconds:
+            self.refresh()
+        return self._columns
+
+    def _user_arrays(self, rows):
+        count = len(rows)
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        specialization = np.fromiter(
+            (self.specializations.code(row[1]) for row in rows), dtype=np.int16, count=count
+        )
+        experience = np.fromiter(
+            (self.experiences.code(row[2]) for row in rows), dtype=np.int16, count=count
+        )
+        created = np.fromiter((_timestamp(row[3]) for row in rows), dtype=np.float64, count=count)
+        active = np.fromiter((bool(row[4]) for row in rows), dtype=bool, count=count)
+        return ids, specialization, experience, created, active
+
+    def reload(self):
+        """Перечитать снимок целиком"""
+        started = time.perf_counter()
+        with self._lock:
+            self._changed_during_reload = set()
+        try:
+            with engine.connect() as conn:
+                # Сначала границы: всё, что появится позже, догрузит refresh
+                last_like_id = conn.execute(select(func.max(Like.id))).scalar() or 0
+                last_message_id = conn.execute(select(func.max(Message.id))).scalar() or 0
+                users = conn.execute(select(*USER_COLUMNS).order_by(User.id)).all()
+                received = conn.execute(
+                    select(Like.to_user_id, func.count())
+                    .where(Like.id <= last_like_id)
+                    .group_by(Like.to_user_id)
+                ).all()
+                liked_at = conn.execute(
+                    select(Like.from_user_id, func.max(Like.created_at))
+                    .where(Like.id <= last_like_id)
+                    .group_by(Like.from_user_id)
+                ).all()
+                wrote_at = conn.execute(
+                    select(Message.sender_id, func.max(Message.created_at))
+                    .where(Message.id <= last_message_id)
+                    .group_by(Message.sender_id)
+                ).all()
+
+            ids, specialization, experience, created, active = self._user_arrays(users)
+            columns = _Columns(
+                ids, specialization, experience, created,
+                active_at=created.copy(),
+                popularity=np.zeros(len(ids), dtype=np.int32),
+                active=active,
+                last_user_id=int(ids[-1]) if len(ids) else 0,
+                last_like_id=last_like_id,
+                last_message_id=last_message_id,
+            )
+            if received:
+                user_ids, counts = zip(*received)
+                positions, found = columns.lookup(user_ids)
+                columns.popularity[positions[found]] = np.asarray(counts, dtype=np.int32)[found]
+            for rows in (liked_at, wrote_at):
+                self._apply_activity(columns, [row[0] for row in rows], [_timestamp(row[1]) for row in rows])
+
+            with self._lock:
+                self._columns = columns
+                # Такие анкеты могли быть прочитаны до правки - перечитаем их
+                self._changed |= self._changed_during_reload
+                self._loaded_at = self._refreshed_at = time.monotonic()
+            logger.info(
+                f"✅ Снимок анкет для ленты: {len(ids)} анкет "
+                f"за {(time.perf_counter() - started) * 1000:.0f} мс"
+            )
+        except Exception as e:
+            logger.error(f"🔥 Ошибка при загрузке снимка анкет: {e}", exc_info=True)
+            if self._columns is None:
+                raise
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    @staticmethod
+    def _apply_activity(columns: _Columns, user_ids, timestamps):
+        if not user_ids:
+            return
+        positions, found = columns.lookup(user_ids)
+        np.maximum.at(columns.active_at, positions[found], np.asarray(timestamps, dtype=np.float64)[found])
+
+    def refresh(self):
+        """
+        Догрузить новые анкеты, лайки, сообщения и перечитать изменённые анкеты
+
+        Запросы и расчёт идут без блокировки над копией колонок, под
+        блокировкой - только подмена. Пока один поток обновляет снимок,
+        остальные ранжируют по текущему.
+        """
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            current = self._columns
+            changed, self._changed = self._changed, set()
+            if self._reloading:
+                self._changed_during_reload |= changed
+
+        try:
+            columns = self._refreshed(current, changed)
+        except Exception:
+            with self._lock:
+                self._changed |= changed
+                self._refreshing = False
+            raise
+
+        with self._lock:
+            if self._columns is current:
+                self._columns = columns
+                self._refreshed_at = time.monotonic()
+            else:
+                # Полное перечитывание успело подменить колонки - изменённые
+                # анкеты перечитаем поверх новых
+                self._changed |= changed
+            self._refreshing = False
+
+    def _refreshed(self, current: _Columns, changed: set) -> _Columns:
+        """Новые колонки: current плюс всё, что появилось в базе после него"""
+        with engine.connect() as conn:
+            new_users = conn.execute(
+                select(*USER_COLUMNS).where(User.id > current.last_user_id).order_by(User.id)
+            ).all()
+            changed_users = conn.execute(
+                select(*USER_COLUMNS).where(User.id.in_(changed))
+            ).all() if changed else []
+            # Лайки и сообщения только добавляются, поэтому хватает id;
+            # строки, закоммиченные не по порядку id, подхватит полное перечитывание
+            likes = conn.execute(
+                select(Like.id, Like.from_user_id, Like.to_user_id, Like.created_at)
+                .where(Like.id > current.last_like_id)
+            ).all()
+            messages = conn.execute(
+                select(Message.id, Message.sender_id, Message.created_at)
+                .where(Message.id > current.last_message_id)
+            ).all()
+
+        columns = current.copy()
+        if new_users:
+            ids, specialization, experience, created, active = self._user_arrays(new_users)
+            columns.ids = np.concatenate([columns.ids, ids])
+            columns.specialization = np.concatenate([columns.specialization, specialization])
+            columns.experience = np.concatenate([columns.experience, experience])
+            columns.created = np.concatenate([columns.created, created])
+            columns.active_at = np.concatenate([columns.active_at, created])
+            columns.popularity = np.concatenate([columns.popularity, np.zeros(len(ids), dtype=np.int32)])
+            columns.active = np.concatenate([columns.active, active])
+            columns.last_user_id = int(ids[-1])
+
+        if changed:
+            # Удалённых анкет в выборке нет - выключаем их
+            columns.active[columns.positions(list(changed))] = False
+            if changed_users:
+                ids, specialization, experience, _, active = self._user_arrays(changed_users)
+                positions = columns.positions(ids)
+                columns.specialization[positions] = specialization
+                columns.experience[positions] = experience
+                columns.active[positions] = active
+
+        if likes:
+            np.add.at(columns.popularity, columns.positions([row[2] for row in likes]), 1)
+            self._apply_activity(columns, [row[1] for row in likes], [_timestamp(row[3]) for row in likes])
+            columns.last_like_id = max(row[0] for row in likes)
+
+        if messages:
+            self._apply_activity(columns, [row[1] for row in messages], [_timestamp(row[2]) for row in messages])
+            columns.last_message_id = max(row[0] for row in messages)
+
+        columns.as_of = time.time()
+        return columns
+
+    def specialization_code(self, value: str) -> Optional[int]:
+        return self.specializations.find(value)
+
+    def experience_code(self, value: str) -> Optional[int]:
+        return self.experiences.find(value)
+
+
+def _compat_matrix(rows, size: int) -> "np.ndarray":
+    """Матрица совместимости, расширенная до size кодов (новые - как "другие")"""
+    known = np.asarray(rows, dtype=np.float32)
+    other = len(known) - 1
+    index = np.minimum(np.arange(size), other)
+    return known[np.ix_(index, index)]
+
+
+def score_candidates(columns: _Columns, candidates, viewer_specialization: int, viewer_experience: int,
+                     liked_you) -> "np.ndarray":
+    """Оценки кандидатов (позиции в снимке) для одного пользователя"""
+    specialization = columns.specialization[candidates]
+    experience = columns.experience[candidates]
+    spec_compat = _compat_matrix(SPECIALIZATION_COMPAT, max(int(specialization.max()), viewer_specialization) + 1)
+    exp_compat = _compat_matrix(EXPERIENCE_COMPAT, max(int(experience.max()), viewer_experience) + 1)
+
+    score = spec_compat[viewer_specialization][specialization] * exp_compat[viewer_experience][experience]
+
+    age_days = (columns.as_of - columns.created[candidates]) / DAY
+    idle_days = (columns.as_of - columns.active_at[candidates]) / DAY
+    score += NEW_USER_BONUS * np.exp(-np.maximum(age_days, 0) / NEW_USER_DAYS, dtype=np.float32)
+    score += ACTIVITY_BONUS * np.exp(-np.maximum(idle_days, 0) / ACTIVITY_DAYS, dtype=np.float32)
+
+    score /= 1 + POPULARITY_DAMPING * np.log1p(columns.popularity[candidates], dtype=np.float32)
+    score += LIKED_YOU_BONUS * liked_you
+    return score
+
+
+def rank_candidates(db: Session, viewer: User, exclude_ids: Iterable[int],
+                    specialization: str = None, experience: str = None,
+                    offset: int = 0, limit: int = 10) -> Tuple[List[int], int]:
+    """
+    id анкет для страницы ленты по убыванию оценки и число всех кандидатов
+
+    exclude_ids - уже лайкнутые и пропущенные. Снимок может отставать
+    на REFRESH_SECONDS, поэтому строки страницы надо брать из базы с теми же
+    фильтрами, что и обычная лента (отсюда запас PAGE_SLACK).
+    """
+    columns = snapshot.columns()
+    ids = columns.ids
+
+    # Отбор кандидатов - маска по колонкам
+    mask = columns.active.copy()
+    if specialization:
+        code = snapshot.specialization_code(specialization)
+        if code is None:
+            return [], 0
+        mask &= columns.specialization == code
+    if experience:
+        code = snapshot.experience_code(experience)
+        if code is None:
+            return [], 0
+        mask &= columns.experience == code
+    mask[columns.positions([viewer.id, *exclude_ids])] = False
+
+    candidates = np.flatnonzero(mask)
+    total = len(candidates)
+    if not total:
+        return [], 0
+
+    # Кто уже лайкнул пользователя (индекс ix_likes_to_from)
+    liked_you_ids = [row[0] for row in db.query(Like.from_user_id).filter(Like.to_user_id == viewer.id)]
+    liked_you = np.zeros(len(ids), dtype=bool)
+    liked_you[columns.positions(liked_you_ids)] = True
+
+    scores = score_candidates(
+        columns, candidates,
+        snapshot.specializations.code(viewer.specialization),
+        snapshot.experiences.code(viewer.experience),
+        liked_you[candidates],
+    )
+
+    # Полная сортировка не нужна: только лучшие offset + limit
+    wanted = min(offset + limit, total)
+    if wanted <= offset:
+        return [], total
+    if wanted < total:
+        best = np.argpartition(-scores, wanted - 1)[:wanted]
+    else:
+        best = np.arange(total)
+    # По убыванию оценки, при равенстве - по id
+    best = best[np.lexsort((ids[candidates[best]], -scores[best]))]
+    return ids[candidates[best[offset:wanted]]].tolist(), total
+
+
+# Снимок текущего воркера
+snapshot = CandidateSnapshot()
@@ -0,0 +1,165 @@
+"""
+Полнотекстовый поиск по сообщениям и пользователям
+
+SQLite: виртуальные таблицы FTS5 (external content), синхронизируются триггерами.
+PostgreSQL: GIN-индексы по to_tsvector(), отдельная синхронизация не нужна.
+"""
+import logging
+import re
+
+from sqlalchemy import text, select, func, literal_column
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger(__name__)
+
+# Таблица -> (имя FTS-индекса, индексируемые колонки)
+SEARCH_INDEXES = {
+    "messages": ("messages_fts", ["text"]),
+    "users": ("users_fts", ["username", "email", "bio"]),
+}
+
+# Проставляется в ensure_search_index(); без индекса админка ищет через LIKE
+_search_dialect = None
+
+
+def _sqlite_statements(table: str, fts_table: str, columns: list) -> list:
+    """DDL виртуальной таблицы FTS5 и триггеров синхронизации"""
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5({cols}, content='{table}', content_rowid='id')",
+        f"""CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+        END""",
+        # Обновление только индексируемых колонок, чтобы пометка прочитанным не трогала индекс
+        f"""CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values});
+        END""",
+        # Индексируем уже существующие строки
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def _postgres_document(columns: list) -> str:
+    return " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+
+
+def _index_exists(conn, dialect: str, fts_table: str) -> bool:
+    if dialect == "sqlite":
+        query = "SELECT name FROM sqlite_master WHERE type='table' AND name=:name"
+    else:
+        query = "SELECT indexname FROM pg_indexes WHERE indexname=:name"
+        fts_table = f"ix_{fts_table}"
+    return conn.execute(text(query), {"name": fts_table}).first() is not None
+
+
+def create_sqlite_search_index(engine: Engine):
+    """Создать таблицы FTS5 и триггеры, если их ещё нет (вызывается из миграции)"""
+    with engine.begin() as conn:
+        for table, (fts_table, columns) in SEARCH_INDEXES.items():
+            if not _index_exists(conn, "sqlite", fts_table):
+                for statement in _sqlite_statements(table, fts_table, columns):
+                    conn.execute(text(statement))
+                logger.info(f"✅ Создан поисковый индекс {fts_table}")
+
+
+def postgres_search_index(table: str) -> tuple:
+    """Имя и выражение GIN-индекса PostgreSQL для таблицы (строится миграцией)"""
+    fts_table, columns = SEARCH_INDEXES[table]
+    return f"ix_{fts_table}", f"gin (to_tsvector('simple', {_postgres_document(columns)}))"
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """Включить полнотекстовый поиск, если индексы созданы миграцией"""
+    global _search_dialect
+
+    dialect = engine.dialect.name
+    if dialect not in ("sqlite", "postgresql"):
+        return False
+
+    try:
+        with engine.connect() as conn:
+            for fts_table, _ in SEARCH_INDEXES.values():
+                if not _index_exists(conn, dialect, fts_table):
+                    logger.warning(f"⚠️  Нет поискового индекса {fts_table}, используется LIKE")
+                    return False
+    except Exception as e:
+        logger.warning(f"⚠️  Полнотекстовый поиск недоступен, используется LIKE: {e}")
+        return False
+
+    _search_dialect = dialect
+    return True
+
+
+def _terms(term: str) -> list:
+    return [token for token in term.split() if token]
+
+
+def _indexable(term: str) -> bool:
+    """Слова только из букв и цифр: остальное токенизатор выбрасывает (c++ -> c, c# -> c)"""
+    return all(token.isalnum() for token in _terms(term))
+
+
+def _sqlite_match_expression(term: str) -> str:
+    """Каждое слово - фраза с поиском по префиксу: "сло"* "ещё"* (одна буква - целиком)"""
+    return " ".join(
+        '"' + token.replace('"', '""') + '"' + ("*" if len(token) > 1 else "")
+        for token in _terms(term)
+    )
+
+
+def _postgres_tsquery(term: str) -> str:
+    tokens = [re.sub(r"[^\w]+", " ", token).split() for token in _terms(term)]
+    return " & ".join(
+        f"{word}:*" if len(word) > 1 else word
+        for group in tokens for word in group
+    )
+
+
+def full_text_search(stmt: Select, model, term: str):
+    """
+    Ограничить выборку совпадениями из индекса и отсортировать по релевантности
+
+    Возвращает None, если индекса нет или в запросе есть символы, которые
+    индекс не различает (c++, c#, .net) - тогда нужно использовать обычный поиск.
+    """
+    table = model.__tablename__
+    if _search_dialect is None or table not in SEARCH_INDEXES or not _indexable(term):
+        return None
+
+    fts_table, columns = SEARCH_INDEXES[table]
+
+    if _search_dialect == "sqlite":
+        expression = _sqlite_match_expression(term)
+        if not expression:
+            return stmt
+        matches = select(
+            literal_column("rowid").label("id"),
+            literal_column(f"bm25({fts_table})").label("rank")
+        ).select_from(text(fts_table)).where(
+            text(f"{fts_table} MATCH :fts_term").bindparams(fts_term=expression)
+        ).subquery()
+    else:
+        query = _postgres_tsquery(term)
+        if not query:
+            return stmt
+        # Конфигурация литералом, чтобы выражение совпало с выражением GIN-индекса
+        config = literal_column("'simple'")
+        document = func.to_tsvector(config, literal_column(_postgres_document(columns)))
+        tsquery = func.to_tsquery(config, query)
+        matches = select(
+            model.id.label("id"),
+            (-func.ts_rank(document, tsquery)).label("rank")
+        ).where(document.op("@@")(tsquery)).subquery()
+
+    # Меньший rank - более релевантный результат (bm25 отрицательный)
+    return stmt.join(matches, matches.c.id == model.id).order_by(None).order_by(
+        matches.c.rank, model.id
+    )
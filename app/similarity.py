@@ -0,0 +1,254 @@
+"""
+Похожие анкеты по тексту "О себе"
+
+Каждое описание превращается в вектор фиксированной длины: символьные
+триграммы слов и сами слова хэшируются в dim ячеек (со знаком, чтобы
+коллизии гасили друг друга), веса - log(1 + tf) * idf, вектор нормирован.
+Все векторы лежат в одной матрице float32, похожесть - скалярное
+произведение, поиск по всей матрице - одно умножение на numpy.
+
+Индекс строится офлайн (python build_similarity.py, по cron) в файл
+ITMATCH_SIMILARITY_PATH. Воркер загружает его при первом запросе и
+перечитывает, когда файл обновился. Правки "О себе" и новые анкеты сразу
+попадают в индекс своего воркера, остальные увидят их после пересборки.
+
+Память под матрицу ограничена ITMATCH_SIMILARITY_MEMORY_MB: под неё
+подбирается размерность векторов при сборке, а новые анкеты сверх
+ёмкости ждут следующей пересборки.
+"""
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+INDEX_PATH = os.getenv("ITMATCH_SIMILARITY_PATH", "similarity_index.npz")
+
+# Бюджет памяти под матрицу векторов одного воркера
+MEMORY_BUDGET_MB = int(os.getenv("ITMATCH_SIMILARITY_MEMORY_MB", "64"))
+
+# Размерность векторов: не больше MAX_DIM и не меньше MIN_DIM
+MAX_DIM = 1024
+MIN_DIM = 64
+
+# Запас строк под новые анкеты между пересборками
+GROWTH = 1.25
+
+# Сколько похожих анкет отдавать по умолчанию и максимум
+DEFAULT_LIMIT = 6
+MAX_LIMIT = 50
+
+# Ниже этого анкеты считаются непохожими
+MIN_SCORE = 0.05
+
+_word_re = re.compile(r"\w+")
+
+
+class SimilarityUnavailable(RuntimeError):
+    pass
+
+
+def _features(text: str) -> Iterable[str]:
+    """Слова и символьные триграммы слов (устойчивы к окончаниям и опечаткам)"""
+    for word in _word_re.findall((text or "").lower()):
+        yield word
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def hash_counts(text: str, dim: int) -> "np.ndarray":
+    """Вектор сырых частот признаков, захэшированных в dim ячеек"""
+    # crc32, а не hash(): хэш строк в Python свой в каждом процессе
+    hashes = np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) for feature in _features(text)), dtype=np.uint32
+    )
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+    return np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+
+
+def weigh(counts: "np.ndarray", idf: "np.ndarray") -> "np.ndarray":
+    """log(1 + tf) * idf с нормировкой строк (матрица или один вектор)"""
+    weighted = np.sign(counts) * np.log1p(np.abs(counts)) * idf
+    norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+    return np.divide(weighted, norms, out=np.zeros_like(weighted), where=norms > 0)
+
+
+def choose_dim(rows: int, budget_mb: int = MEMORY_BUDGET_MB) -> int:
+    """Наибольшая степень двойки, при которой матрица с запасом влезает в бюджет"""
+    budget = budget_mb * 1024 * 1024
+    capacity = int(rows * GROWTH) + 1
+    dim = MAX_DIM
+    while dim > MIN_DIM and capacity * dim * 4 > budget:
+        dim //= 2
+    return dim
+
+
+def build_index(engine: Engine, path: str = INDEX_PATH, budget_mb: int = MEMORY_BUDGET_MB) -> dict:
+    """Построить индекс по всем анкетам и записать в файл; возвращает статистику"""
+    if np is None:
+        raise SimilarityUnavailable("Для похожих анкет нужен numpy: pip install numpy")
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        rows = conn.execute(select(User.id, User.bio).order_by(User.id)).all()
+
+    dim = choose_dim(len(rows), budget_mb)
+    capacity = budget_mb * 1024 * 1024 // (dim * 4)
+    if len(rows) > capacity:
+        # Даже минимальная размерность не влезает - берём самые новые анкеты
+        logger.warning(f"⚠️ В бюджет {budget_mb} МБ влезает {capacity} анкет из {len(rows)}")
+        rows = rows[-capacity:]
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    counts = np.zeros((len(rows), dim), dtype=np.float32)
+    for i, (_, bio) in enumerate(rows):
+        counts[i] = hash_counts(bio, dim)
+
+    # Редкие признаки весят больше; idf хранится в индексе для новых анкет
+    document_freq = np.count_nonzero(counts, axis=0)
+    idf = (np.log((1 + len(rows)) / (1 + document_freq)) + 1).astype(np.float32)
+    vectors = weigh(counts, idf)
+
+    # Через временный файл: воркеры не должны прочитать недописанный индекс
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, ids=ids, vectors=vectors, idf=idf)
+    os.replace(tmp_path, path)
+
+    return {
+        "users": len(rows),
+        "dim": dim,
+        "megabytes": vectors.nbytes / 1024 / 1024,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+class SimilarityIndex:
+    """Матрица векторов анкет в памяти воркера"""
+
+    def __init__(self, path: str = INDEX_PATH, budget_mb: int = MEMORY_BUDGET_MB):
+        self.path = path
+        self.budget_mb = budget_mb
+        self.vectors = None
+        self.idf = None
+        self.ids = None
+        self.rows = {}
+        self.size = 0
+        self._mtime = None
+        self._full_warned = False
+
+    @property
+    def available(self) -> bool:
+        return np is not None and os.path.exists(self.path)
+
+    def _load_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            raise SimilarityUnavailable("Индекс похожих анкет не построен: python build_similarity.py")
+        if mtime == self._mtime:
+            return
+
+        with np.load(self.path) as data:
+            ids, vectors, idf = data["ids"], data["vectors"], data["idf"]
+
+        dim = vectors.shape[1]
+        capacity = max(self.budget_mb * 1024 * 1024 // (dim * 4), len(ids))
+        # np.zeros не трогает память заранее: свободные строки почти ничего не стоят
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.vectors[:len(ids)] = vectors
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.ids[:len(ids)] = ids
+        self.idf = idf
+        self.rows = {int(user_id): row for row, user_id in enumerate(ids)}
+        self.size = len(ids)
+        self._mtime = mtime
+        self._full_warned = False
+        logger.info(f"✅ Индекс похожих анкет загружен: {self.size} анкет, размерность {dim}")
+
+    def vectorize(self, bio: str) -> "np.ndarray":
+        return weigh(hash_counts(bio, len(self.idf)), self.idf)
+
+    def update(self, user_id: int, bio: Optional[str]):
+        """Обновить вектор анкеты после правки "О себе" (или добавить новую)"""
+        if not self.available:
+            return
+        try:
+            self._load_if_changed()
+        except SimilarityUnavailable:
+            return
+
+        row = self.rows.get(user_id)
+        if row is None:
+            if self.size == len(self.vectors):
+                if not self._full_warned:
+                    logger.warning("⚠️ Индекс похожих анкет заполнен, новые анкеты появятся после пересборки")
+                    self._full_warned = True
+                return
+            row = self.size
+            self.size += 1
+            self.ids[row] = user_id
+            self.rows[user_id] = row
+        self.vectors[row] = self.vectorize(bio)
+
+    def similar(self, user_id: int, bio: Optional[str], limit: int) -> List[Tuple[int, float]]:
+        """(id, похожесть) анкет, похожих на данную, по убыванию похожести"""
+        if np is None:
+            raise SimilarityUnavailable("Для похожих анкет нужен numpy: pip install numpy")
+        self._load_if_changed()
+
+        # Вектор запроса - по текущему тексту: индекс мог ещё не знать правку
+        query = self.vectorize(bio)
+        if not query.any():
+            return []
+        scores = self.vectors[:self.size] @ query
+
+        own_row = self.rows.get(user_id)
+        if own_row is not None:
+            scores[own_row] = -1
+
+        wanted = min(limit, self.size)
+        if wanted <= 0:
+            return []
+        best = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < self.size else np.arange(self.size)
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [
+            (int(self.ids[row]), float(scores[row]))
+            for row in best if scores[row] >= MIN_SCORE
+        ]
+
+
+# Индекс текущего воркера
+similarity_index = SimilarityIndex()
+
+
+def similar_users(db: Session, user: User, limit: int = DEFAULT_LIMIT,
+                  exclude_ids: Iterable[int] = ()) -> List[Tuple[User, float]]:
+    """Активные пользователи, похожие на user: (пользователь, похожесть)"""
+    exclude_ids = set(exclude_ids)
+    # С запасом: часть анкет неактивна или исключена
+    found = similarity_index.similar(user.id, user.bio, (limit + len(exclude_ids)) * 2 + 10)
+    candidate_ids = [user_id for user_id, _ in found if user_id not in exclude_ids]
+    if not candidate_ids:
+        return []
+
+    users = {
+        row.id: row
+        for row in db.query(User).filter(User.id.in_(candidate_ids), User.is_active == True)
+    }
+    scores = dict(found)
+    return [(users[user_id], scores[user_id]) for user_id in candidate_ids if user_id in users][:limit]
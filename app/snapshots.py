@@ -0,0 +1,182 @@
+"""
+Снимки базы данных для тестов и бенчмарков
+
+SQLite: снимок - копия базы через online backup API (sqlite3.Connection.backup),
+восстановление - backup в обратную сторону, в том числе в базу в памяти.
+PostgreSQL: снимок - отдельная база, созданная с TEMPLATE от текущей,
+восстановление - пересоздание текущей базы из этого шаблона.
+"""
+import logging
+import os
+import re
+import sqlite3
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Куда складываются снимки SQLite
+SNAPSHOT_DIR = os.getenv("ITMATCH_SNAPSHOT_DIR", "./snapshots")
+
+SNAPSHOT_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def _check_name(name: str):
+    if not SNAPSHOT_NAME_RE.match(name):
+        raise ValueError(f"Недопустимое имя снимка: {name}")
+
+
+def _sqlite_snapshot_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{name}.sqlite3")
+
+
+def _postgres_snapshot_db(engine: Engine, name: str) -> str:
+    return f"{engine.url.database}_snap_{name}"
+
+
+def _postgres_admin_engine(engine: Engine) -> Engine:
+    """Подключение к служебной базе: с текущей нельзя делать DROP/TEMPLATE"""
+    return create_engine(engine.url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+
+
+def _postgres_disconnect(conn, database: str):
+    conn.execute(
+        text("SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+             "WHERE datname = :database AND pid <> pg_backend_pid()"),
+        {"database": database}
+    )
+
+
+def _sqlite_backup(source: sqlite3.Connection, target: sqlite3.Connection):
+    # pages=-1: копируем всю базу за один шаг, так быстрее всего
+    source.backup(target, pages=-1)
+
+
+def create_snapshot(engine: Engine, name: str) -> float:
+    """Сохранить текущее состояние базы под именем name; вернуть время в секундах"""
+    _check_name(name)
+    started = time.perf_counter()
+    dialect = engine.dialect.name
+
+    if dialect == "sqlite":
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        path = _sqlite_snapshot_path(name)
+        raw = engine.raw_connection()
+        try:
+            target = sqlite3.connect(path)
+            try:
+                _sqlite_backup(raw.driver_connection, target)
+            finally:
+                target.close()
+        finally:
+            raw.close()
+    elif dialect == "postgresql":
+        database = engine.url.database
+        snapshot_db = _postgres_snapshot_db(engine, name)
+        engine.dispose()
+        admin = _postgres_admin_engine(engine)
+        try:
+            with admin.connect() as conn:
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{snapshot_db}"'))
+                # Шаблон копируется только без активных подключений к нему
+                _postgres_disconnect(conn, database)
+                conn.execute(text(f'CREATE DATABASE "{snapshot_db}" TEMPLATE "{database}"'))
+        finally:
+            admin.dispose()
+    else:
+        raise RuntimeError(f"Снимки не поддерживаются для {dialect}")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"📸 Снимок {name} сохранён за {elapsed:.3f} сек")
+    return elapsed
+
+
+def restore_snapshot(engine: Engine, name: str) -> float:
+    """Заменить содержимое базы снимком name; вернуть время в секундах"""
+    _check_name(name)
+    started = time.perf_counter()
+    dialect = engine.dialect.name
+
+    if dialect == "sqlite":
+        path = _sqlite_snapshot_path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Снимок не найден: {path}")
+        # Открытые соединения пула не должны держать блокировки во время записи
+        engine.dispose()
+        raw = engine.raw_connection()
+        try:
+            source = sqlite3.connect(path)
+            try:
+                _sqlite_backup(source, raw.driver_connection)
+            finally:
+                source.close()
+        finally:
+            raw.close()
+    elif dialect == "postgresql":
+        database = engine.url.database
+        snapshot_db = _postgres_snapshot_db(engine, name)
+        engine.dispose()
+        admin = _postgres_admin_engine(engine)
+        try:
+            with admin.connect() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                    {"name": snapshot_db}
+                ).first()
+                if not exists:
+                    raise FileNotFoundError(f"Снимок не найден: {snapshot_db}")
+                _postgres_disconnect(conn, database)
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{database}"'))
+                conn.execute(text(f'CREATE DATABASE "{database}" TEMPLATE "{snapshot_db}"'))
+        finally:
+            admin.dispose()
+    else:
+        raise RuntimeError(f"Снимки не поддерживаются для {dialect}")
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"♻️  Снимок {name} восстановлен за {elapsed:.3f} сек")
+    return elapsed
+
+
+def list_snapshots(engine: Engine) -> list:
+    """Имена сохранённых снимков"""
+    if engine.dialect.name == "postgresql":
+        prefix = f"{engine.url.database}_snap_"
+        admin = _postgres_admin_engine(engine)
+        try:
+            with admin.connect() as conn:
+                names = conn.execute(
+                    text("SELECT datname FROM pg_database WHERE datname LIKE :prefix ORDER BY datname"),
+                    {"prefix": prefix.replace("_", r"\_") + "%"}
+                ).scalars().all()
+        finally:
+            admin.dispose()
+        return [name[len(prefix):] for name in names]
+
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    return sorted(
+        filename[:-len(".sqlite3")]
+        for filename in os.listdir(SNAPSHOT_DIR)
+        if filename.endswith(".sqlite3")
+    )
+
+
+def delete_snapshot(engine: Engine, name: str):
+    """Удалить снимок"""
+    _check_name(name)
+
+    if engine.dialect.name == "postgresql":
+        admin = _postgres_admin_engine(engine)
+        try:
+            with admin.connect() as conn:
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{_postgres_snapshot_db(engine, name)}"'))
+        finally:
+            admin.dispose()
+        return
+
+    path = _sqlite_snapshot_path(name)
+    if os.path.exists(path):
+        os.remove(path)
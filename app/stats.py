@@ -0,0 +1,122 @@
+"""
+Снимок статистики для админ-панели с кэшированием
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, case, select
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import User, Like, Match, Message
+
+logger = logging.getLogger(__name__)
+
+# Время жизни снимка статистики (секунды)
+STATS_CACHE_TTL = int(os.getenv("ITMATCH_STATS_TTL", "300"))
+
+
+def compute_stats_snapshot(db: Session) -> dict:
+    """Посчитать статистику несколькими агрегирующими запросами"""
+    week_ago = datetime.utcnow() - timedelta(days=7)
+
+    # Запрос 1: все счётчики по пользователям одним GROUP BY
+    user_rows = db.query(
+        User.specialization,
+        User.experience,
+        func.count(User.id),
+        func.sum(case((User.is_active == True, 1), else_=0)),
+        func.sum(case((User.is_admin == True, 1), else_=0)),
+        func.sum(case((User.created_at >= week_ago, 1), else_=0))
+    ).group_by(User.specialization, User.experience).all()
+
+    # Запрос 2: лайки, совпадения и сообщения одной выборкой из подзапросов
+    totals = db.query(
+        select(func.count(Like.id)).scalar_subquery(),
+        select(func.count(Like.id)).where(Like.created_at >= week_ago).scalar_subquery(),
+        select(func.count(Match.id)).scalar_subquery(),
+        select(func.count(Match.id)).where(Match.created_at >= week_ago).scalar_subquery(),
+        select(func.count(Message.id)).scalar_subquery()
+    ).one()
+
+    specializations = {}
+    experiences = {}
+    total_users = active_users = admin_users = new_users_week = 0
+    for specialization, experience, count, active, admins, new_week in user_rows:
+        total_users += count
+        active_users += active or 0
+        admin_users += admins or 0
+        new_users_week += new_week or 0
+        specializations[specialization] = specializations.get(specialization, 0) + count
+        experiences[experience] = experiences.get(experience, 0) + count
+
+    return {
+        "total_users": total_users,
+        "active_users": active_users,
+        "admin_users": admin_users,
+        "new_users_week": new_users_week,
+        "total_likes": totals[0] or 0,
+        "new_likes_week": totals[1] or 0,
+        "total_matches": totals[2] or 0,
+        "new_matches_week": totals[3] or 0,
+        "total_messages": totals[4] or 0,
+        "specializations": sorted(specializations.items()),
+        "experiences": sorted(experiences.items()),
+        "computed_at": datetime.now()
+    }
+
+
+class StatsCache:
+    """Кэш снимка статистики, обновляемый в фоне по истечении TTL"""
+
+    def __init__(self, ttl: int = STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._snapshot = None
+        self._computed_at = 0.0
+        self._lock = threading.Lock()
+        # Первый расчёт: отдельная блокировка, т.к. refresh() берёт _lock сам
+        self._first_lock = threading.Lock()
+        self._refreshing = False
+
+    def get(self) -> dict:
+        """Вернуть снимок; устаревший снимок отдаётся сразу, а обновляется в фоне"""
+        if self._snapshot is None:
+            # Холодный воркер: считает один поток, остальные ждут его снимок
+            with self._first_lock:
+                if self._snapshot is None:
+                    self.refresh()
+        elif time.monotonic() - self._computed_at > self.ttl:
+            with self._lock:
+                start_refresh = not self._refreshing
+                self._refreshing = True
+            if start_refresh:
+                threading.Thread(target=self.refresh, name="itmatch-stats", daemon=True).start()
+        return self._snapshot
+
+    def age(self) -> float:
+        """Возраст текущего снимка в секундах"""
+        return time.monotonic() - self._computed_at
+
+    def refresh(self):
+        """Пересчитать снимок статистики"""
+        db = SessionLocal()
+        try:
+            snapshot = compute_stats_snapshot(db)
+            with self._lock:
+                self._snapshot = snapshot
+                self._computed_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"🔥 Ошибка при обновлении статистики: {e}", exc_info=True)
+            if self._snapshot is None:
+                raise
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing = False
+
+
+# Общий кэш статистики для текущего воркера
+stats_cache = StatsCache()
@@ -0,0 +1,255 @@
+"""
+Хранилище загруженных файлов
+
+  - LocalStorage - каталог на диске; файлы раздаёт само приложение
+    (AvatarFiles). Подходит для одного узла и для разработки.
+  - S3Storage - S3-совместимое хранилище (AWS S3, MinIO, ...). Все узлы
+    видят одни и те же файлы, раздаются они из бакета или CDN, а браузер
+    может загружать в бакет напрямую по подписанной ссылке.
+
+Выбирается через ITMATCH_STORAGE=local|s3. Для проверки без AWS достаточно
+локального MinIO: ITMATCH_S3_ENDPOINT_URL=http://localhost:9000.
+"""
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional, Tuple
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+STORAGE_BACKEND = os.getenv("ITMATCH_STORAGE", "local")
+
+LOCAL_UPLOAD_DIR = os.getenv("ITMATCH_UPLOAD_DIR", "app/static/uploads")
+LOCAL_UPLOAD_URL = "/static/uploads"
+
+S3_BUCKET = os.getenv("ITMATCH_S3_BUCKET", "")
+S3_PREFIX = os.getenv("ITMATCH_S3_PREFIX", "avatars/")
+S3_REGION = os.getenv("ITMATCH_S3_REGION") or None
+# Свой адрес API для S3-совместимых хранилищ (MinIO и т.п.)
+S3_ENDPOINT_URL = os.getenv("ITMATCH_S3_ENDPOINT_URL") or None
+# Откуда браузер забирает файлы (обычно CDN перед бакетом)
+S3_PUBLIC_URL = os.getenv("ITMATCH_S3_PUBLIC_URL", "")
+
+# Время жизни подписанной ссылки на прямую загрузку, секунд
+PRESIGN_EXPIRES = int(os.getenv("ITMATCH_PRESIGN_EXPIRES", "600"))
+
+# Имена файлов: одна вложенность ("incoming/...") и никаких ".."
+_name_re = re.compile(r"^(?:[A-Za-z0-9_-]+/)?[A-Za-z0-9_-][A-Za-z0-9_.-]*$")
+
+
+class StorageError(Exception):
+    pass
+
+
+def check_name(name: str) -> str:
+    if not _name_re.match(name) or ".." in name:
+        raise StorageError(f"Недопустимое имя файла: {name!r}")
+    return name
+
+
+class Storage(ABC):
+    """Общий интерфейс хранилищ; имена файлов - относительные"""
+
+    # Умеет ли хранилище принимать файлы напрямую от браузера
+    supports_direct_upload = False
+
+    @abstractmethod
+    def exists(self, name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def read(self, name: str) -> bytes:
+        pass
+
+    @abstractmethod
+    def save(self, name: str, data: bytes, content_type: str = None, cache_control: str = None):
+        pass
+
+    @abstractmethod
+    def delete(self, name: str):
+        pass
+
+    @abstractmethod
+    def touch(self, name: str):
+        """Обновить время изменения (его смотрит сборщик мусора)"""
+
+    @abstractmethod
+    def list(self) -> Iterator[Tuple[str, float]]:
+        """Все файлы: (имя, время изменения)"""
+
+    @abstractmethod
+    def url(self, name: str) -> str:
+        pass
+
+    def presigned_upload(self, name: str, max_size: int, expires: int = PRESIGN_EXPIRES) -> Optional[dict]:
+        """Параметры формы для загрузки браузером напрямую ({"url", "fields"}) или None"""
+        return None
+
+
+class LocalStorage(Storage):
+
+    def __init__(self, directory: str = LOCAL_UPLOAD_DIR, base_url: str = LOCAL_UPLOAD_URL):
+        self.directory = directory
+        self.base_url = base_url
+
+    def __str__(self):
+        return self.directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, check_name(name))
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def read(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise StorageError(f"Файл не найден: {name}")
+
+    def save(self, name, data, content_type=None, cache_control=None):
+        # Заголовки кэширования для локальных файлов выставляет AvatarFiles
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Через временный файл: недописанный файл под постоянным именем
+        # закэшировался бы у клиентов навсегда
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def delete(self, name):
+        path = self._path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def touch(self, name):
+        os.utime(self._path(name))
+
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                yield name, os.stat(path).st_mtime
+
+    def url(self, name):
+        return f"{self.base_url}/{name}"
+
+
+class S3Storage(Storage):
+
+    supports_direct_upload = True
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url: str = S3_ENDPOINT_URL,
+                 region: str = S3_REGION, public_url: str = S3_PUBLIC_URL):
+        if boto3 is None:
+            raise StorageError("Для ITMATCH_STORAGE=s3 нужен boto3: pip install boto3")
+        if not bucket:
+            raise StorageError("Не задан ITMATCH_S3_BUCKET")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+        if public_url:
+            self.public_url = public_url.rstrip("/")
+        elif endpoint_url:
+            self.public_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.public_url = f"https://{bucket}.s3.amazonaws.com"
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.prefix}"
+
+    def _key(self, name: str) -> str:
+        return self.prefix + check_name(name)
+
+    def _head(self, name: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, name):
+        return self._head(name) is not None
+
+    def read(self, name):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as e:
+            raise StorageError(f"Файл не найден: {name} ({e})")
+        return response["Body"].read()
+
+    def save(self, name, data, content_type=None, cache_control=None):
+        params = {"Bucket": self.bucket, "Key": self._key(name), "Body": data}
+        if content_type:
+            params["ContentType"] = content_type
+        if cache_control:
+            params["CacheControl"] = cache_control
+        self.client.put_object(**params)
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def touch(self, name):
+        # LastModified обновляется только копированием объекта в самого себя;
+        # при REPLACE метаданные надо передать заново
+        head = self._head(name)
+        if head is None:
+            return
+        params = {}
+        if head.get("ContentType"):
+            params["ContentType"] = head["ContentType"]
+        if head.get("CacheControl"):
+            params["CacheControl"] = head["CacheControl"]
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=self._key(name),
+            CopySource={"Bucket": self.bucket, "Key": self._key(name)},
+            MetadataDirective="REPLACE",
+            Metadata=head.get("Metadata", {}),
+            **params,
+        )
+
+    def list(self):
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):], item["LastModified"].timestamp()
+
+    def url(self, name):
+        return f"{self.public_url}/{self._key(name)}"
+
+    def presigned_upload(self, name, max_size, expires=PRESIGN_EXPIRES):
+        # Ограничения проверяет само хранилище: размер и тип из формы
+        return self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=self._key(name),
+            Conditions=[
+                ["content-length-range", 1, max_size],
+                ["starts-with", "$Content-Type", "image/"],
+            ],
+            ExpiresIn=expires,
+        )
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    if backend == "local":
+        return LocalStorage()
+    if backend == "s3":
+        return S3Storage()
+    raise StorageError(f"Неизвестное хранилище ITMATCH_STORAGE={backend!r} (local или s3)")
+
+
+storage = create_storage()
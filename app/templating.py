@@ -0,0 +1,22 @@
+"""
+Общий экземпляр шаблонов для всех роутеров
+
+Здесь же регистрируются помощники, нужные нескольким шаблонам (аватарки).
+"""
+from fastapi.templating import Jinja2Templates
+
+from .avatars import avatar_src, avatar_srcset, is_processed, DEFAULT_AVATAR
+from .identicons import generated_avatar_src, generated_avatar_srcset
+from .storage import storage
+
+templates = Jinja2Templates(directory="app/templates")
+
+templates.env.globals.update(
+    avatar_src=avatar_src,
+    avatar_srcset=avatar_srcset,
+    avatar_is_processed=is_processed,
+    generated_avatar_src=generated_avatar_src,
+    generated_avatar_srcset=generated_avatar_srcset,
+    DEFAULT_AVATAR=DEFAULT_AVATAR,
+    DIRECT_UPLOAD=storage.supports_direct_upload,
+)
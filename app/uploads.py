@@ -0,0 +1,164 @@
+"""
+Потоковый приём загружаемых файлов
+
+Тело multipart-запроса разбирается по мере чтения из request.stream(),
+без промежуточного временного файла. Лимит размера проверяется на каждом
+куске, так что слишком большой файл отклоняется, не дочитывая его до
+конца. Формат определяется по сигнатуре в первых байтах, а не по
+расширению из имени файла.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request
+from multipart.multipart import MultipartParser, parse_options_header
+
+# Сигнатура в начале файла -> формат
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+IMAGE_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "gif": ".gif", "webp": ".webp"}
+
+# Столько байтов нужно, чтобы распознать любой из форматов
+SIGNATURE_LENGTH = 12
+
+# Запас на заголовки multipart и прочие поля формы сверх размера файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadError(ValueError):
+    """Загрузка отклонена; текст ошибки можно показать пользователю"""
+
+    status_code = 400
+
+
+class UploadTooLarge(UploadError):
+    status_code = 413
+
+
+@dataclass
+class UploadedFile:
+    filename: str
+    format: str
+    extension: str
+    data: bytes
+
+
+def detect_image_format(head: bytes) -> Optional[str]:
+    """Формат изображения по первым байтам файла (None - не изображение)"""
+    # WebP: RIFF-контейнер с типом WEBP
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, fmt in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    return None
+
+
+async def read_upload(request: Request, field: str, max_size: int,
+                      allowed_formats=tuple(IMAGE_EXTENSIONS)) -> UploadedFile:
+    """
+    Прочитать из multipart-запроса файл из поля field
+
+    Бросает UploadTooLarge, как только файл превысил max_size байт,
+    и UploadError, если первые байты не похожи на разрешённый формат.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Ожидается файл в форме multipart/form-data")
+
+    max_body = max_size + MULTIPART_OVERHEAD
+    limit_message = f"Файл слишком большой. Максимальный размер: {max_size // (1024 * 1024)}MB"
+
+    # Честный клиент заранее сообщает размер - отказываем, не читая тела
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body:
+        raise UploadTooLarge(limit_message)
+
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "in_field": False, "filename": None}
+    chunks = []
+    size = 0
+    detected = None
+
+    def on_part_begin():
+        state["headers"] = {}
+        state["in_field"] = False
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if options.get(b"name", b"").decode("latin-1") == field and b"filename" in options and state["filename"] is None:
+            state["in_field"] = True
+            state["filename"] = options[b"filename"].decode("utf-8", errors="replace")
+
+    def on_part_data(data, start, end):
+        nonlocal size, detected
+        if not state["in_field"]:
+            return
+        size += end - start
+        if size > max_size:
+            raise UploadTooLarge(limit_message)
+        chunks.append(data[start:end])
+
+        # Формат проверяем, как только пришли первые байты
+        if detected is None and (size >= SIGNATURE_LENGTH):
+            detected = detect_image_format(b"".join(chunks)[:SIGNATURE_LENGTH])
+            if detected not in allowed_formats:
+                raise UploadError(_format_message(allowed_formats))
+
+    def on_part_end():
+        state["in_field"] = False
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_body:
+            raise UploadTooLarge(limit_message)
+        parser.write(chunk)
+    parser.finalize()
+
+    if state["filename"] is None or size == 0:
+        raise UploadError("Файл не выбран")
+
+    data = b"".join(chunks)
+    if detected is None:
+        # Файл короче SIGNATURE_LENGTH байт
+        detected = detect_image_format(data)
+        if detected not in allowed_formats:
+            raise UploadError(_format_message(allowed_formats))
+
+    return UploadedFile(
+        filename=state["filename"],
+        format=detected,
+        extension=IMAGE_EXTENSIONS[detected],
+        data=data,
+    )
+
+
+def _format_message(allowed_formats) -> str:
+    names = ", ".join(fmt.upper() for fmt in allowed_formats)
+    return f"Недопустимый формат файла. Разрешены: {names}"
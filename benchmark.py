@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарки горячих путей ITmatch
+
+Для каждого размера набора данных генерируется отдельная база
+(generate_load_data.py, в следующих прогонах - из снимка), затем
+замеряются CRUD-функции, маршруты ленты и чата, рендеринг шаблонов и
+хэширование пароля. Результаты сохраняются в JSON; при передаче
+--baseline прогон сравнивается с прошлым и падает, если медиана
+выросла больше порога.
+
+    python benchmark.py --sizes 1000,10000 --save bench.json
+    python benchmark.py --sizes 1000,10000 --baseline bench.json --threshold 0.25
+"""
+import sys
+import os
+import io
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import statistics
+import tempfile
+import contextlib
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Приложение при импорте создаёт таблицы в своей базе - не трогаем рабочую
+os.environ.setdefault("ITMATCH_DATABASE_URL", "sqlite://")
+
+import sqlalchemy
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.main import app
+from app.database import get_db
+from app.models import User, Match, Message
+from app.migrations import migrate
+from app.snapshots import create_snapshot, restore_snapshot, list_snapshots
+from app.crud import likes, messages, users
+from app.routers.feed import templates
+from app.candidate_index import candidate_index
+from generate_load_data import LoadDataGenerator, SCHEMA_BEFORE_SEARCH
+
+# main.py включает DEBUG для всего приложения - в замерах он только мешает
+logging.getLogger().setLevel(logging.WARNING)
+
+# Минимальная длительность одного раунда замера, сек
+MIN_ROUND_TIME = 0.05
+# Сколько пользователей/чатов берём из набора для замеров
+SAMPLE_SIZE = 50
+
+
+def build_dataset(path: str, size: int, seed: int, fresh: bool = False):
+    """
+    Набор данных размером size в отдельном файле SQLite
+
+    Сгенерированный набор сохраняется снимком, и следующие прогоны
+    восстанавливают его за миллисекунды - с теми же самыми данными.
+    """
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    snapshot = f"bench_{size}_{seed}"
+
+    if not fresh and snapshot in list_snapshots(engine):
+        restore_snapshot(engine, snapshot)
+        return engine
+
+    migrate(engine, target=SCHEMA_BEFORE_SEARCH)
+
+    with engine.begin() as conn:
+        generator = LoadDataGenerator(conn, size, seed, mean_likes=20, batch_size=10000, days=365)
+        generator.generate_users()
+        generator.generate_likes_and_matches()
+
+    migrate(engine)
+    with engine.begin() as conn:
+        generator.apply_shuffle_keys(conn)
+    create_snapshot(engine, snapshot)
+    return engine
+
+
+def _fake_request(path: str) -> Request:
+    """Request для рендеринга шаблонов вне HTTP-запроса (нужен для url_for)"""
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "path": path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "app": app,
+        "router": app.router,
+    })
+
+
+class Dataset:
+    """Набор данных и выборка пользователей/чатов для замеров"""
+
+    def __init__(self, engine, size: int, seed: int):
+        self.size = size
+        self.engine = engine
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.rng = random.Random(seed)
+
+        with self.SessionLocal() as db:
+            # Активные пользователи с совпадениями - для них чаты и непрочитанные не пустые
+            participants = select(Match.user1_id).union(select(Match.user2_id))
+            matched = db.execute(
+                select(User.id).where(User.is_active == True, User.id.in_(participants))
+            ).scalars().all()
+            active_user1 = select(User.id).where(User.is_active == True)
+            chats = db.execute(
+                select(Message.match_id).join(Match, Match.id == Message.match_id)
+                .where(Match.user1_id.in_(active_user1)).distinct()
+            ).scalars().all()
+            self.user_ids = db.execute(select(User.id)).scalars().all()
+
+        self.users = self.rng.sample(matched, min(SAMPLE_SIZE, len(matched)))
+        self.chats = self.rng.sample(chats, min(SAMPLE_SIZE, len(chats)))
+
+    def user(self, i: int) -> int:
+        return self.users[i % len(self.users)]
+
+    def chat(self, i: int) -> int:
+        return self.chats[i % len(self.chats)]
+
+
+def make_benchmarks(data: Dataset):
+    """Имя -> функция одного вызова (аргумент - номер итерации)"""
+    SessionLocal = data.SessionLocal
+
+    def with_session(operation):
+        # Как в приложении: одна сессия на запрос
+        def call(i):
+            db = SessionLocal()
+            try:
+                return operation(db, i)
+            finally:
+                db.close()
+        return call
+
+    def create_like(db, i):
+        from_user = data.rng.choice(data.user_ids)
+        to_user = data.rng.choice(data.user_ids)
+        if from_user != to_user:
+            likes.create_like(db, from_user, to_user)
+
+    def render_feed(db, i):
+        user = users.get_user_by_id(db, data.user(i))
+        feed_users = db.query(User).filter(User.id != user.id).limit(10).all()
+        start = time.perf_counter()
+        templates.get_template("feed.html").render({
+            "request": _fake_request("/feed"),
+            "users": feed_users,
+            "user": user,
+            "filters": {"specialization": None, "experience": None},
+            "pagination": {"page": 1, "total_pages": 10, "has_prev": False, "has_next": True},
+        })
+        return time.perf_counter() - start
+
+    def render_chat(db, i):
+        match = db.get(Match, data.chat(i))
+        user = users.get_user_by_id(db, match.user1_id)
+        other_user = users.get_user_by_id(db, match.user2_id)
+        chat_messages = messages.get_messages_by_match(db, match.id, limit=50)
+        start = time.perf_counter()
+        templates.get_template("chat_detail.html").render({
+            "request": _fake_request(f"/messages/{match.id}"),
+            "user": user,
+            "other_user": other_user,
+            "match": match,
+            "messages": chat_messages,
+        })
+        return time.perf_counter() - start
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    client = TestClient(app)
+
+    def route(path_for):
+        def call(i):
+            user_id, path = path_for(i)
+            # Сессия приоритетнее cookie, поэтому каждый раз входим заново
+            client.cookies.clear()
+            client.cookies.set("user_id", str(user_id))
+            response = client.get(path, follow_redirects=False)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path}: статус {response.status_code}")
+        return call
+
+    def chat_path(i):
+        with SessionLocal() as db:
+            match = db.get(Match, data.chat(i))
+        return match.user1_id, f"/messages/{match.id}"
+
+    # Замеры маршрутов идут через приложение, подключённое к этому набору
+    app.dependency_overrides[get_db] = override_get_db
+
+    # Lifespan приложения не запускается, а индекс кандидатов нужен для
+    # основного пути /feed - строим его по этому набору сами
+    candidate_index.bind = data.engine
+    candidate_index.rebuild()
+
+    password_hash = users.pwd_context.hash("benchmark", scheme="pbkdf2_sha256")
+
+    return {
+        "crud.create_like": with_session(create_like),
+        "crud.get_user_matches": with_session(lambda db, i: likes.get_user_matches(db, data.user(i))),
+        "crud.get_user_chats": with_session(lambda db, i: messages.get_user_chats(db, data.user(i))),
+        "crud.get_messages_by_match": with_session(
+            lambda db, i: messages.get_messages_by_match(db, data.chat(i))
+        ),
+        "crud.get_unread_count": with_session(lambda db, i: messages.get_unread_count(db, data.user(i))),
+        "route.feed": route(lambda i: (data.user(i), "/feed")),
+        "route.chat_detail": route(chat_path),
+        "render.feed_html": with_session(render_feed),
+        "render.chat_detail_html": with_session(render_chat),
+        "auth.hash_password": lambda i: users.pwd_context.hash("benchmark", scheme="pbkdf2_sha256"),
+        "auth.verify_password": lambda i: users.verify_password("benchmark", password_hash),
+    }
+
+
+def measure(call, rounds: int):
+    """
+    Время одного вызова в раундах, сек
+
+    Если функция сама возвращает время (рендеринг без подготовки данных),
+    учитывается оно, иначе - полное время вызова.
+    """
+    # Прогрев и подбор числа вызовов в раунде, как timeit.autorange
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(number):
+            call(i)
+        if time.perf_counter() - start >= MIN_ROUND_TIME or number >= 1000:
+            break
+        number *= 2
+
+    timings = []
+    iteration = number
+    for _ in range(rounds):
+        total = 0.0
+        for _ in range(number):
+            start = time.perf_counter()
+            result = call(iteration)
+            elapsed = time.perf_counter() - start
+            total += result if isinstance(result, float) else elapsed
+            iteration += 1
+        timings.append(total / number)
+
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "max_ms": max(timings) * 1000,
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def run(sizes, rounds, seed, only=None, fresh=False):
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            print(f"\n🔄 Набор данных: {size} пользователей...")
+            started = time.perf_counter()
+            engine = build_dataset(os.path.join(tmp, f"bench_{size}.db"), size, seed, fresh)
+            data = Dataset(engine, size, seed)
+            print(f"   готово за {time.perf_counter() - started:.1f} сек")
+
+            results[str(size)] = {}
+            for name, call in make_benchmarks(data).items():
+                if only and not any(part in name for part in only):
+                    continue
+                # Приложение печатает лог каждого запроса - не смешиваем его с отчётом
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = measure(call, rounds)
+                results[str(size)][name] = result
+                print(f"   {name:<28}{result['median_ms']:>10.3f} мс  (min {result['min_ms']:.3f}, x{result['number']})")
+
+            app.dependency_overrides.clear()
+            engine.dispose()
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+            "rounds": rounds,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Сравнить медианы с прошлым прогоном; вернуть список регрессий"""
+    regressions = []
+    print(f"\n{'=' * 72}")
+    print(f"{'Размер':<8}{'Замер':<30}{'Было мс':>11}{'Стало мс':>11}{'Δ':>10}")
+    print("-" * 72)
+
+    for size, benchmarks in current["results"].items():
+        for name, result in benchmarks.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if not old:
+                continue
+            change = result["median_ms"] / old["median_ms"] - 1 if old["median_ms"] else 0.0
+            mark = ""
+            if change > threshold:
+                mark = " ❌"
+                regressions.append((size, name, change))
+            print(f"{size:<8}{name:<30}{old['median_ms']:>11.3f}{result['median_ms']:>11.3f}{change:>+9.0%}{mark}")
+
+    print("=" * 72)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Микробенчмарки ITmatch")
+    parser.add_argument("--sizes", default="1000,10000",
+                        help="размеры наборов данных через запятую")
+    parser.add_argument("--rounds", type=int, default=5, help="раундов замера на функцию")
+    parser.add_argument("--seed", type=int, default=42, help="seed генерации данных")
+    parser.add_argument("--fresh", action="store_true",
+                        help="сгенерировать наборы заново, не используя сохранённые снимки")
+    parser.add_argument("--only", help="замерять только имена, содержащие подстроки (через запятую)")
+    parser.add_argument("--save", help="сохранить результаты в JSON")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="допустимый рост медианы относительно baseline (0.25 = 25%%)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    print("=" * 50)
+    print("Микробенчмарки ITmatch")
+    print("=" * 50)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = args.only.split(",") if args.only else None
+    current = run(sizes, args.rounds, args.seed, only, args.fresh)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Результаты сохранены в {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"❌ Регрессий: {len(regressions)} (порог {args.threshold:.0%})")
+            for size, name, change in regressions:
+                print(f"   {size} {name}: {change:+.0%}")
+            sys.exit(1)
+        print(f"✅ Регрессий нет (порог {args.threshold:.0%})")
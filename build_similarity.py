@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Сборка индекса похожих анкет по тексту "О себе" (для запуска по cron)
+
+    python build_similarity.py
+    python build_similarity.py --memory-mb 128
+"""
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import engine
+from app.similarity import build_index, SimilarityUnavailable, INDEX_PATH, MEMORY_BUDGET_MB
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка индекса похожих анкет")
+    parser.add_argument("--path", default=INDEX_PATH, help=f"файл индекса (по умолчанию {INDEX_PATH})")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET_MB,
+                        help=f"бюджет памяти под матрицу в воркере, МБ (по умолчанию {MEMORY_BUDGET_MB})")
+    args = parser.parse_args()
+
+    try:
+        stats = build_index(engine, path=args.path, budget_mb=args.memory_mb)
+    except SimilarityUnavailable as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ Индекс похожих анкет: {stats['users']} анкет, размерность {stats['dim']}, "
+          f"{stats['megabytes']:.1f} МБ -> {args.path}")
+    print(f"   Сборка: {stats['seconds']:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
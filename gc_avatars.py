@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Удаление файлов аватарок, на которые не ссылается ни один пользователь
+
+    python gc_avatars.py             - удалить неиспользуемые файлы
+    python gc_avatars.py --dry-run   - только показать, что будет удалено
+"""
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app import crud
+from app.avatars import collect_garbage, AVATAR_GC_GRACE
+from app.storage import storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка мусора в загруженных аватарках")
+    parser.add_argument("--dry-run", action="store_true", help="ничего не удалять, только показать")
+    parser.add_argument("--grace", type=int, default=AVATAR_GC_GRACE,
+                        help=f"не трогать файлы моложе N секунд (по умолчанию {AVATAR_GC_GRACE})")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        referenced = crud.get_avatar_urls(db)
+    finally:
+        db.close()
+
+    removed = collect_garbage(referenced, grace_seconds=args.grace, dry_run=args.dry_run)
+
+    for name in removed:
+        print(f"  🗑️  {name}")
+    if args.dry_run:
+        print(f"ℹ️  Будет удалено файлов: {len(removed)} из {storage}")
+    else:
+        print(f"✅ Удалено файлов: {len(removed)} из {storage}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Генератор больших объёмов данных для нагрузочного тестирования ITmatch
+
+Пользователи, лайки, совпадения и сообщения вставляются пачками через
+executemany, пароль хэшируется один раз на всех, а случайность задаётся
+seed, поэтому один и тот же набор параметров даёт одинаковые данные.
+
+Распределения:
+  - число лайков у пользователя - степенной закон (мало «активных лайкеров»)
+  - популярность получателей - тоже степенной закон
+  - вероятность взаимного лайка зависит от специализации получателя
+  - длина переписки - логнормальная, у части совпадений сообщений нет
+"""
+import sys
+import os
+import time
+import random
+import argparse
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import MetaData, Table, bindparam, insert, func, select, text, update
+from app.database import engine
+from app.models import User, Like, Match, Message, SHUFFLE_KEY_RANGE
+from app.migrations import migrate
+from app.crud.users import pwd_context
+from seed_users import NAMES, SURNAMES, BIOS, TECHNOLOGIES
+
+# Доли специализаций и уровней опыта среди пользователей
+SPECIALIZATION_WEIGHTS = {
+    "Backend": 30,
+    "Frontend": 25,
+    "Fullstack": 15,
+    "Data Science": 12,
+    "DevOps": 10,
+    "Mobile": 8,
+}
+EXPERIENCE_WEIGHTS = {"Junior": 40, "Middle": 35, "Senior": 25}
+
+# Вероятность, что получатель лайка ответит взаимностью (по его специализации)
+RECIPROCAL_RATES = {
+    "Backend": 0.12,
+    "Frontend": 0.18,
+    "Fullstack": 0.15,
+    "Data Science": 0.10,
+    "DevOps": 0.08,
+    "Mobile": 0.20,
+}
+
+# Доля совпадений без единого сообщения
+SILENT_MATCH_RATE = 0.4
+
+MESSAGE_TEXTS = [
+    "Привет! Как дела?",
+    "Привет! Увидел твой профиль, интересный опыт.",
+    "Над каким проектом сейчас работаешь?",
+    "Давай созвонимся на этой неделе?",
+    "Я как раз ищу человека в команду.",
+    "Какой стек используешь?",
+    "Звучит интересно, расскажи подробнее.",
+    "Отлично, договорились!",
+    "Скинь ссылку на GitHub, посмотрю.",
+    "Спасибо, было приятно пообщаться.",
+]
+
+PASSWORD = "loadtest123"
+
+# Последняя миграция перед созданием поискового индекса
+SCHEMA_BEFORE_SEARCH = "0004"
+
+
+def _table_start_id(conn, model):
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _cumulative(weights):
+    total = 0.0
+    result = []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+
+class LoadDataGenerator:
+    """Генерирует связанный набор данных и пишет его пачками"""
+
+    def __init__(self, conn, users: int, seed: int, mean_likes: float, batch_size: int, days: int):
+        self.conn = conn
+        self.user_count = users
+        self.rng = random.Random(seed)
+        self.mean_likes = mean_likes
+        self.batch_size = batch_size
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.start_time = self.now - timedelta(days=days)
+        self.days = days
+
+        self.first_user_id = _table_start_id(conn, User)
+        self.next_like_id = _table_start_id(conn, Like)
+        self.next_match_id = _table_start_id(conn, Match)
+        self.next_message_id = _table_start_id(conn, Message)
+
+        # Таблицы как они есть в базе сейчас: до поисковой миграции схема
+        # отстаёт от моделей, а Python-умолчания моделей (shuffle_key)
+        # добавили бы в INSERT колонки, которых ещё нет
+        metadata = MetaData()
+        self.tables = {
+            model: Table(model.__tablename__, metadata, autoload_with=conn)
+            for model in (User, Like, Match, Message)
+        }
+
+        self.buffers = {User: [], Like: [], Match: [], Message: []}
+        self.counts = {User: 0, Like: 0, Match: 0, Message: 0}
+
+    # --- запись пачками ---
+
+    def _add(self, model, row):
+        buffer = self.buffers[model]
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self._flush(model)
+
+    def _flush(self, model):
+        buffer = self.buffers[model]
+        if buffer:
+            self.conn.execute(insert(self.tables[model]), buffer)
+            self.counts[model] += len(buffer)
+            buffer.clear()
+
+    def flush_all(self):
+        for model in (User, Like, Match, Message):
+            self._flush(model)
+
+    # --- генерация ---
+
+    def _user_created_at(self, index):
+        # Регистрации равномерно растут со временем, id идут по порядку
+        offset = self.days * 86400 * index / max(self.user_count, 1)
+        return self.start_time + timedelta(seconds=int(offset))
+
+    def generate_users(self):
+        """Пользователи: один общий хэш пароля на всех"""
+        hashed_password = pwd_context.hash(PASSWORD, scheme="pbkdf2_sha256")
+        specializations = list(SPECIALIZATION_WEIGHTS)
+        spec_cum = _cumulative(SPECIALIZATION_WEIGHTS.values())
+        experiences = list(EXPERIENCE_WEIGHTS)
+        exp_cum = _cumulative(EXPERIENCE_WEIGHTS.values())
+
+        self.user_specializations = []
+        self.user_created = []
+        # Ключи ленты вперемешку тоже из seed; если колонки ещё нет (её
+        # добавит миграция), они проставляются после неё - apply_shuffle_keys
+        self.user_shuffle_keys = array("q")
+        has_shuffle_key = "shuffle_key" in self.tables[User].c
+
+        for index in range(self.user_count):
+            user_id = self.first_user_id + index
+            specialization = self.rng.choices(specializations, cum_weights=spec_cum)[0]
+            experience = self.rng.choices(experiences, cum_weights=exp_cum)[0]
+            created_at = self._user_created_at(index)
+            technology = self.rng.choice(TECHNOLOGIES)
+
+            self.user_specializations.append(specialization)
+            self.user_created.append(created_at)
+            self.user_shuffle_keys.append(self.rng.randrange(SHUFFLE_KEY_RANGE))
+
+            row = {
+                "id": user_id,
+                "email": f"user{user_id}@load.example.com",
+                "username": f"{self.rng.choice(NAMES)} {self.rng.choice(SURNAMES)}",
+                "hashed_password": hashed_password,
+                "specialization": specialization,
+                "experience": experience,
+                "bio": f"{experience} {specialization}, {technology}. {self.rng.choice(BIOS)}",
+                "avatar_url": "default_avatar.png",
+                "is_active": self.rng.random() > 0.03,
+                "is_admin": False,
+                "created_at": created_at,
+            }
+            if has_shuffle_key:
+                row["shuffle_key"] = self.user_shuffle_keys[-1]
+            self._add(User, row)
+
+        self._flush(User)
+
+    def apply_shuffle_keys(self, conn):
+        """Проставить сгенерированные ключи ленты вперемешку (после миграции 0008)"""
+        users = Table(User.__tablename__, MetaData(), autoload_with=conn)
+        statement = update(users).where(users.c.id == bindparam("user_id")).values(
+            shuffle_key=bindparam("key")
+        )
+        for start in range(0, len(self.user_shuffle_keys), self.batch_size):
+            conn.execute(statement, [
+                {"user_id": self.first_user_id + index, "key": self.user_shuffle_keys[index]}
+                for index in range(start, min(start + self.batch_size, len(self.user_shuffle_keys)))
+            ])
+
+    def _likes_for_user(self):
+        # Степенной закон: большинство лайкает немного, единицы - сотни анкет
+        count = int(self.rng.paretovariate(1.5) * self.mean_likes / 3)
+        return min(count, self.user_count - 1, 1000)
+
+    def _event_time(self, *after):
+        start = max(after)
+        span = max((self.now - start).total_seconds(), 1)
+        return start + timedelta(seconds=int(span * self.rng.random() ** 3))
+
+    def generate_likes_and_matches(self):
+        """
+        Лайки, совпадения и переписка
+
+        Граф лайков хранится компактно (CSR: offsets + отсортированные
+        targets), чтобы проверять «лайкал ли t пользователя a» без
+        множества пар в памяти.
+        """
+        n = self.user_count
+        first = self.first_user_id
+        popularity = _cumulative(self.rng.paretovariate(1.2) for _ in range(n))
+        indexes = range(n)
+
+        offsets = array("q", [0])
+        targets = array("l")
+        pending = {}  # индекс пользователя -> индексы тех, кому он ответит взаимностью
+
+        for a in range(n):
+            chosen = set(self.rng.choices(indexes, cum_weights=popularity, k=self._likes_for_user()))
+            chosen.update(pending.pop(a, ()))
+            chosen.discard(a)
+
+            ordered = sorted(chosen)
+            for t in ordered:
+                like_time = self._event_time(self.user_created[a], self.user_created[t])
+                self._add(Like, {
+                    "id": self._next_like_id(),
+                    "from_user_id": first + a,
+                    "to_user_id": first + t,
+                    "created_at": like_time,
+                })
+
+                if t < a:
+                    start, end = offsets[t], offsets[t + 1]
+                    position = bisect_left(targets, a, start, end)
+                    if position < end and targets[position] == a:
+                        self._add_match(t, a, like_time)
+                    elif self.rng.random() < RECIPROCAL_RATES[self.user_specializations[t]]:
+                        # t отвечает взаимностью уже после своей «очереди»
+                        self._add(Like, {
+                            "id": self._next_like_id(),
+                            "from_user_id": first + t,
+                            "to_user_id": first + a,
+                            "created_at": like_time,
+                        })
+                        self._add_match(t, a, like_time)
+                elif self.rng.random() < RECIPROCAL_RATES[self.user_specializations[t]]:
+                    pending.setdefault(t, []).append(a)
+
+            targets.extend(ordered)
+            offsets.append(len(targets))
+
+            if (a + 1) % 100000 == 0:
+                print(f"   ... обработано {a + 1}/{n} пользователей")
+
+        self.flush_all()
+
+    def _next_like_id(self):
+        like_id = self.next_like_id
+        self.next_like_id += 1
+        return like_id
+
+    def _add_match(self, a, b, created_at):
+        match_id = self.next_match_id
+        self.next_match_id += 1
+        user1_id = self.first_user_id + min(a, b)
+        user2_id = self.first_user_id + max(a, b)
+
+        self._add(Match, {
+            "id": match_id,
+            "user1_id": user1_id,
+            "user2_id": user2_id,
+            "created_at": created_at,
+        })
+
+        if self.rng.random() < SILENT_MATCH_RATE:
+            return
+
+        length = min(int(self.rng.lognormvariate(1.5, 1.0)) + 1, 200)
+        sender = self.rng.choice((user1_id, user2_id))
+        sent_at = created_at
+        for position in range(length):
+            sent_at += timedelta(seconds=int(self.rng.expovariate(1 / 900)))
+            if sent_at > self.now:
+                break
+            self._add(Message, {
+                "id": self.next_message_id,
+                "match_id": match_id,
+                "sender_id": sender,
+                "text": self.rng.choice(MESSAGE_TEXTS),
+                "created_at": sent_at,
+                "is_read": position < length - 2 or self.rng.random() < 0.5,
+            })
+            self.next_message_id += 1
+            # Чаще отвечает собеседник, иногда пишут несколько сообщений подряд
+            if self.rng.random() < 0.7:
+                sender = user2_id if sender == user1_id else user1_id
+
+
+def generate(users, seed, mean_likes, batch_size, days):
+    """Сгенерировать набор данных в текущей базе"""
+    # Схема без поискового индекса: его триггеры замедляют массовую вставку
+    migrate(engine, target=SCHEMA_BEFORE_SEARCH)
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "sqlite":
+            # Для массовой вставки жертвуем надёжностью записи
+            conn.execute(text("PRAGMA synchronous = OFF"))
+
+        generator = LoadDataGenerator(conn, users, seed, mean_likes, batch_size, days)
+
+        print(f"🔄 Создание {users} пользователей...")
+        generator.generate_users()
+        print(f"✅ Пользователи: {generator.counts[User]} ({time.perf_counter() - started:.1f} сек)")
+
+        print("🔄 Создание лайков, совпадений и сообщений...")
+        generator.generate_likes_and_matches()
+
+    # Поисковый индекс строим одним rebuild после загрузки, а не триггером на каждую строку
+    migrate(engine)
+    with engine.begin() as conn:
+        generator.apply_shuffle_keys(conn)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Лайки: {generator.counts[Like]}")
+    print(f"✅ Совпадения: {generator.counts[Match]}")
+    print(f"✅ Сообщения: {generator.counts[Message]}")
+    print(f"\n🎉 Готово за {elapsed:.1f} сек. Пароль всех пользователей: {PASSWORD}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Генератор нагрузочных данных ITmatch")
+    parser.add_argument("users", type=int, nargs="?", default=10000, help="количество пользователей")
+    parser.add_argument("--seed", type=int, default=42, help="seed генератора случайных чисел")
+    parser.add_argument("--mean-likes", type=float, default=20, help="среднее число лайков на пользователя")
+    parser.add_argument("--batch-size", type=int, default=10000, help="размер пачки для вставки")
+    parser.add_argument("--days", type=int, default=365, help="за сколько дней распределить активность")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("Генерация нагрузочных данных ITmatch")
+    print("=" * 50)
+
+    generate(args.users, args.seed, args.mean_likes, args.batch_size, args.days)
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Нагрузочное тестирование ITmatch
+
+Сессии пользователей приходят пуассоновским потоком с заданной
+интенсивностью, каждая входит (или регистрируется) и выполняет случайные
+действия по заданной смеси: лента, лайк, пропуск, чаты, сообщения.
+По каждому маршруту выводятся пропускная способность и задержки p50/p95/p99.
+
+Запуск против локального сервера:
+    python load_test.py --base-url http://127.0.0.1:8000 --rate 5 --duration 60
+
+Или в том же процессе через ASGI, без uvicorn:
+    python load_test.py --asgi --rate 20 --duration 30
+
+Для входа существующими пользователями используются аккаунты из
+generate_load_data.py (userN@load.example.com), см. --login-users.
+"""
+import sys
+import os
+import re
+import json
+import time
+import math
+import random
+import asyncio
+import argparse
+import contextlib
+from collections import defaultdict
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Действие -> вес по умолчанию
+DEFAULT_MIX = {
+    "feed": 5,
+    "like": 3,
+    "skip": 2,
+    "matches": 1,
+    "chats": 2,
+    "open_chat": 2,
+    "send": 1,
+}
+
+SPECIALIZATIONS = ["Backend", "Frontend", "Fullstack", "Data Science", "DevOps", "Mobile"]
+EXPERIENCES = ["Junior", "Middle", "Senior"]
+
+LOAD_PASSWORD = "loadtest123"
+
+FEED_USER_RE = re.compile(r'action="/like/(\d+)"')
+CHAT_RE = re.compile(r'href="/messages/(\d+)"')
+
+
+def percentile(sorted_values, p):
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def parse_mix(value):
+    """Строка вида feed=5,like=3 -> словарь весов"""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"неизвестное действие: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+class Stats:
+    """Задержки и ошибки по маршрутам"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.sessions_started = 0
+        self.sessions_finished = 0
+        self.sessions_dropped = 0
+
+    def record(self, route, elapsed, ok):
+        self.latencies[route].append(elapsed)
+        if not ok:
+            self.errors[route] += 1
+
+    def summary(self, wall_time):
+        """Сводка по маршрутам: число запросов, RPS, ошибки, перцентили в мс"""
+        routes = {}
+        for route in sorted(self.latencies):
+            values = sorted(self.latencies[route])
+            routes[route] = {
+                "requests": len(values),
+                "rps": len(values) / wall_time if wall_time else 0.0,
+                "errors": self.errors[route],
+                "p50": percentile(values, 50) * 1000,
+                "p95": percentile(values, 95) * 1000,
+                "p99": percentile(values, 99) * 1000,
+                "max": values[-1] * 1000,
+            }
+        total = sum(route["requests"] for route in routes.values())
+        return {
+            "wall_time": wall_time,
+            "requests": total,
+            "rps": total / wall_time if wall_time else 0.0,
+            "errors": sum(self.errors.values()),
+            "sessions": {
+                "started": self.sessions_started,
+                "finished": self.sessions_finished,
+                "dropped": self.sessions_dropped,
+            },
+            "routes": routes,
+        }
+
+
+class UserSession:
+    """Один виртуальный пользователь со своими cookies"""
+
+    def __init__(self, runner, client, rng):
+        self.runner = runner
+        self.client = client
+        self.rng = rng
+        self.feed_users = []
+        self.chat_ids = []
+
+    async def request(self, route, method, url, **kwargs):
+        """Запрос с замером; route - шаблон маршрута для группировки"""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.runner.stats.record(route, time.perf_counter() - started, False)
+            return None
+        self.runner.stats.record(route, time.perf_counter() - started, response.status_code < 400)
+        return response
+
+    async def register(self, number):
+        email = f"load{self.runner.run_id}-{number}@load.example.com"
+        await self.request("POST /register", "POST", "/register", data={
+            "email": email,
+            "username": f"Нагрузка {number}",
+            "password": LOAD_PASSWORD,
+            "specialization": self.rng.choice(SPECIALIZATIONS),
+            "experience": self.rng.choice(EXPERIENCES),
+            "bio": "Тестовый пользователь нагрузочного прогона",
+        })
+        return email
+
+    async def login(self, email):
+        response = await self.request("POST /login", "POST", "/login", data={
+            "email": email,
+            "password": LOAD_PASSWORD,
+        })
+        return response is not None and response.status_code == 302
+
+    async def feed(self):
+        params = {}
+        if self.rng.random() < 0.3:
+            params["specialization"] = self.rng.choice(SPECIALIZATIONS)
+        response = await self.request("GET /feed", "GET", "/feed", params=params)
+        if response is not None and response.status_code == 200:
+            self.feed_users = [int(user_id) for user_id in FEED_USER_RE.findall(response.text)]
+
+    async def _swipe(self, action):
+        if not self.feed_users:
+            await self.feed()
+        if self.feed_users:
+            user_id = self.feed_users.pop(self.rng.randrange(len(self.feed_users)))
+            await self.request(f"POST /{action}/{{id}}", "POST", f"/{action}/{user_id}")
+
+    async def like(self):
+        await self._swipe("like")
+
+    async def skip(self):
+        await self._swipe("skip")
+
+    async def matches(self):
+        await self.request("GET /matches", "GET", "/matches")
+
+    async def chats(self):
+        response = await self.request("GET /messages/list", "GET", "/messages/list")
+        if response is not None and response.status_code == 200:
+            self.chat_ids = sorted(set(int(match_id) for match_id in CHAT_RE.findall(response.text)))
+
+    async def open_chat(self):
+        if not self.chat_ids:
+            await self.chats()
+        if self.chat_ids:
+            match_id = self.rng.choice(self.chat_ids)
+            await self.request("GET /messages/{id}", "GET", f"/messages/{match_id}")
+
+    async def send(self):
+        if not self.chat_ids:
+            await self.chats()
+        if self.chat_ids:
+            match_id = self.rng.choice(self.chat_ids)
+            await self.request("POST /messages/{id}/send", "POST", f"/messages/{match_id}/send", data={
+                "message": f"Нагрузочное сообщение {self.rng.randrange(10 ** 6)}",
+            })
+
+    async def run(self, number):
+        """Вход, затем случайные действия с паузами между ними"""
+        runner = self.runner
+        pool = runner.login_users
+
+        if pool and self.rng.random() >= runner.register_share:
+            email = f"user{self.rng.randint(pool[0], pool[1])}@load.example.com"
+        else:
+            email = await self.register(number)
+
+        if not await self.login(email):
+            return
+
+        actions = list(runner.mix)
+        weights = list(runner.mix.values())
+
+        for _ in range(runner.actions):
+            action = self.rng.choices(actions, weights=weights)[0]
+            await getattr(self, action)()
+            if runner.think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / runner.think_time))
+
+
+class LoadRunner:
+    """Генерирует поток сессий и собирает статистику"""
+
+    def __init__(self, args):
+        self.args = args
+        self.mix = args.mix
+        self.actions = args.actions
+        self.think_time = args.think_time
+        self.login_users = args.login_users
+        self.register_share = args.register_share
+        self.rng = random.Random(args.seed)
+        self.run_id = f"{int(time.time())}{self.rng.randrange(1000):03d}"
+        self.stats = Stats()
+        self.app = None
+
+        if args.asgi:
+            from app.main import app
+            self.app = app
+
+    def make_client(self):
+        """Клиент одной сессии: свой cookie jar и соединение"""
+        if self.app is not None:
+            return httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=self.app, raise_app_exceptions=False),
+                base_url="http://testserver",
+                timeout=self.args.timeout,
+            )
+        return httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout)
+
+    async def session(self, number, semaphore):
+        try:
+            async with self.make_client() as client:
+                await UserSession(self, client, random.Random(self.rng.random())).run(number)
+        except Exception as e:
+            print(f"   ⚠️  Сессия {number} упала: {e}", file=sys.stderr)
+        finally:
+            self.stats.sessions_finished += 1
+            semaphore.release()
+
+    async def run(self):
+        """Открытая модель: сессии приходят с интенсивностью rate в секунду"""
+        semaphore = asyncio.Semaphore(self.args.max_sessions)
+        tasks = []
+        started = time.perf_counter()
+        deadline = started + self.args.duration
+        number = 0
+
+        while time.perf_counter() < deadline:
+            if semaphore.locked():
+                # Сервер не успевает - новые сессии не копим бесконечно
+                self.stats.sessions_dropped += 1
+            else:
+                await semaphore.acquire()
+                number += 1
+                self.stats.sessions_started += 1
+                tasks.append(asyncio.create_task(self.session(number, semaphore)))
+            await asyncio.sleep(self.rng.expovariate(self.args.rate))
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        return self.stats.summary(time.perf_counter() - started)
+
+
+def print_report(summary):
+    print(f"\n{'=' * 96}")
+    print(f"{'Маршрут':<28}{'Запросов':>10}{'RPS':>9}{'Ошибок':>8}"
+          f"{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'max мс':>10}")
+    print("-" * 96)
+    for route, data in summary["routes"].items():
+        print(f"{route:<28}{data['requests']:>10}{data['rps']:>9.1f}{data['errors']:>8}"
+              f"{data['p50']:>10.1f}{data['p95']:>10.1f}{data['p99']:>10.1f}{data['max']:>10.1f}")
+    print("=" * 96)
+
+    sessions = summary["sessions"]
+    print(f"📊 Всего: {summary['requests']} запросов за {summary['wall_time']:.1f} сек "
+          f"({summary['rps']:.1f} RPS), ошибок: {summary['errors']}")
+    print(f"👥 Сессии: начато {sessions['started']}, завершено {sessions['finished']}, "
+          f"отброшено {sessions['dropped']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование ITmatch")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="адрес запущенного сервера")
+    parser.add_argument("--asgi", action="store_true", help="гонять приложение в этом же процессе")
+    parser.add_argument("--rate", type=float, default=2.0, help="новых сессий в секунду")
+    parser.add_argument("--duration", type=float, default=30.0, help="сколько секунд запускать новые сессии")
+    parser.add_argument("--actions", type=int, default=20, help="действий за сессию")
+    parser.add_argument("--think-time", type=float, default=0.5, help="средняя пауза между действиями, сек")
+    parser.add_argument("--max-sessions", type=int, default=200, help="предел одновременных сессий")
+    parser.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                        help="веса действий, например feed=5,like=3,skip=2,chats=2,open_chat=2,send=1")
+    parser.add_argument("--login-users", type=lambda value: tuple(int(x) for x in value.split("-")),
+                        help="диапазон id из generate_load_data.py, например 1-100000")
+    parser.add_argument("--register-share", type=float, default=0.1,
+                        help="доля новых регистраций при заданном --login-users")
+    parser.add_argument("--timeout", type=float, default=30.0, help="таймаут запроса, сек")
+    parser.add_argument("--seed", type=int, default=None, help="seed генератора случайных чисел")
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    if httpx is None:
+        print("❌ Для нагрузочного теста нужен httpx: pip install httpx")
+        sys.exit(1)
+
+    args = parse_args()
+
+    print("=" * 50)
+    print("Нагрузочное тестирование ITmatch")
+    print("=" * 50)
+    target = "ASGI (в процессе)" if args.asgi else args.base_url
+    print(f"🎯 {target}: {args.rate} сессий/сек, {args.duration:.0f} сек, {args.actions} действий на сессию")
+
+    runner = LoadRunner(args)
+    # В режиме ASGI приложение печатает лог каждого запроса в stdout - прячем его
+    with contextlib.redirect_stdout(open(os.devnull, "w")) if args.asgi else contextlib.nullcontext():
+        summary = asyncio.run(runner.run())
+    print_report(summary)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены в {args.output}")
+
+    sys.exit(1 if summary["errors"] else 0)
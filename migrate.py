@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Миграции схемы базы данных ITmatch
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import engine
+from app.migrations import MIGRATIONS, migrate, applied_versions
+
+
+def show_status():
+    """Показать применённые и ожидающие миграции"""
+    applied = applied_versions(engine)
+
+    print("📋 Миграции:")
+    print("-" * 60)
+    for item in MIGRATIONS:
+        record = applied.get(item.version)
+        if record:
+            print(f"  ✅ {item.version}_{item.name:<28} {record['applied_at']}  {record['duration_ms']} мс")
+        else:
+            print(f"  ⏳ {item.version}_{item.name:<28} не применена")
+    print("-" * 60)
+
+    pending = len(MIGRATIONS) - len([m for m in MIGRATIONS if m.version in applied])
+    if pending:
+        print(f"⚠️  Ожидают применения: {pending}")
+    else:
+        print("✅ Схема актуальна")
+
+
+def upgrade(target=None):
+    """Применить миграции (до версии target включительно)"""
+    def progress(item, duration_ms):
+        print(f"  ✅ {item.version}_{item.name} - {duration_ms} мс")
+
+    try:
+        done = migrate(engine, target=target, progress=progress)
+        if done:
+            total = sum(duration_ms for _, duration_ms in done)
+            print(f"\n🎉 Применено миграций: {len(done)} за {total} мс")
+        else:
+            print("ℹ️  Нечего применять, схема актуальна")
+    except Exception as e:
+        print(f"❌ Ошибка миграции: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Миграции базы данных ITmatch")
+    print("=" * 50)
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+
+    if command == "upgrade":
+        upgrade(sys.argv[2] if len(sys.argv) > 2 else None)
+    elif command == "status":
+        show_status()
+    else:
+        print("\nИспользование:")
+        print("  python migrate.py                  - применить все миграции")
+        print("  python migrate.py upgrade [версия] - применить миграции до версии")
+        print("  python migrate.py status           - показать состояние миграций")
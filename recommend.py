@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Пересчёт рекомендаций для ленты (для запуска по cron)
+
+    python recommend.py
+    python recommend.py --top-k 100 --neighbors 30
+"""
+import argparse
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import engine
+from app.recommender import rebuild_recommendations, RecommenderUnavailable, TOP_K, NEIGHBORS
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пересчёт рекомендаций по графу лайков")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help=f"кандидатов на пользователя (по умолчанию {TOP_K})")
+    parser.add_argument("--neighbors", type=int, default=NEIGHBORS,
+                        help=f"похожих анкет на анкету (по умолчанию {NEIGHBORS})")
+    args = parser.parse_args()
+
+    try:
+        stats = rebuild_recommendations(engine, top_k=args.top_k, neighbors=args.neighbors)
+    except RecommenderUnavailable as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    print(f"✅ Рекомендации пересчитаны для {stats['users']} пользователей "
+          f"({stats['rows']} строк, лайков в графе: {stats['likes']})")
+    print(f"   Загрузка: {stats['load_seconds']:.2f} с, расчёт: {stats['compute_seconds']:.2f} с, "
+          f"всего: {stats['total_seconds']:.2f} с")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,11 +25,11 @@ def reset_database():
                 # Создаём новую пустую базу
                 print("🔄 Создание новой базы данных...")
 
-                # Импортируем и создаём таблицы
-                from app.database import engine, Base
-                from app.models import User, Like, Match, Message
+                # Импортируем и создаём таблицы миграциями
+                from app.database import engine
+                from app.migrations import migrate
 
-                Base.metadata.create_all(bind=engine)
+                migrate(engine)
                 print("✅ Таблицы созданы успешно")
 
                 print("\n📋 Дальнейшие действия:")
@@ -46,10 +46,10 @@ def reset_database():
         print("   Создаю новую базу...")
 
         try:
-            from app.database import engine, Base
-            from app.models import User, Like, Match, Message
+            from app.database import engine
+            from app.migrations import migrate
 
-            Base.metadata.create_all(bind=engine)
+            migrate(engine)
             print("✅ База данных создана успешно")
 
         except Exception as e:
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Обновление дневных агрегатов для аналитики (для запуска по cron)
+"""
+import sys
+import os
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.rollups import rollup_day, rollup_pending
+
+
+def update_rollups():
+    """Досчитать агрегаты с последнего обработанного дня"""
+    db = SessionLocal()
+
+    try:
+        days = rollup_pending(db)
+        if days:
+            print(f"✅ Агрегаты обновлены: {days[0]} - {days[-1]} ({len(days)} дн.)")
+        else:
+            print("ℹ️  Нет данных для агрегации")
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        db.close()
+
+
+def rebuild_day(day):
+    """Пересчитать агрегаты за конкретный день"""
+    db = SessionLocal()
+
+    try:
+        stats = rollup_day(db, day)
+        print(f"✅ {day}: пользователей +{stats.new_users}, лайков {stats.likes}, "
+              f"совпадений {stats.matches}, сообщений {stats.messages}")
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        update_rollups()
+    elif len(sys.argv) == 2:
+        try:
+            day = date.fromisoformat(sys.argv[1])
+        except ValueError:
+            print("❌ Дата должна быть в формате ГГГГ-ММ-ДД")
+            sys.exit(1)
+        rebuild_day(day)
+    else:
+        print("Использование:")
+        print("  python rollup_stats.py              - досчитать агрегаты с последнего дня")
+        print("  python rollup_stats.py 2024-01-31   - пересчитать агрегаты за день")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Снимки базы данных: сохранить набор данных один раз и быстро восстанавливать
+
+    python generate_load_data.py 100000
+    python snapshot.py save large
+    ... тесты / бенчмарки портят данные ...
+    python snapshot.py restore large
+
+Сервер можно сразу поднять из снимка в базе в памяти:
+    ITMATCH_DATABASE_URL=memory ITMATCH_SNAPSHOT=large python run.py
+"""
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import engine
+from app.snapshots import create_snapshot, restore_snapshot, list_snapshots, delete_snapshot
+
+
+def save(name):
+    """Сохранить текущую базу в снимок"""
+    try:
+        elapsed = create_snapshot(engine, name)
+        print(f"✅ Снимок {name} сохранён за {elapsed * 1000:.0f} мс")
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+
+
+def restore(name):
+    """Восстановить базу из снимка"""
+    try:
+        elapsed = restore_snapshot(engine, name)
+        print(f"✅ Снимок {name} восстановлен за {elapsed * 1000:.0f} мс")
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+
+
+def show_snapshots():
+    """Показать сохранённые снимки"""
+    names = list_snapshots(engine)
+    if not names:
+        print("ℹ️  Снимков нет")
+        return
+
+    print("📸 Снимки:")
+    for name in names:
+        print(f"  - {name}")
+
+
+def remove(name):
+    """Удалить снимок"""
+    try:
+        delete_snapshot(engine, name)
+        print(f"✅ Снимок {name} удалён")
+    except Exception as e:
+        print(f"❌ Ошибка: {e}")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Снимки базы данных ITmatch")
+    print("=" * 50)
+
+    if len(sys.argv) < 2:
+        print("\nИспользование:")
+        print("  python snapshot.py save <имя>     - сохранить снимок текущей базы")
+        print("  python snapshot.py restore <имя>  - восстановить базу из снимка")
+        print("  python snapshot.py list           - список снимков")
+        print("  python snapshot.py delete <имя>   - удалить снимок")
+    else:
+        command = sys.argv[1]
+
+        if command == "list":
+            show_snapshots()
+        elif command in ("save", "restore", "delete") and len(sys.argv) < 3:
+            print("❌ Укажите имя снимка")
+        elif command == "save":
+            save(sys.argv[2])
+        elif command == "restore":
+            restore(sys.argv[2])
+        elif command == "delete":
+            remove(sys.argv[2])
+        else:
+            print(f"❌ Неизвестная команда: {command}")